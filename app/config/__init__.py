@@ -6,12 +6,24 @@ class Config:
     def __init__(self):
         self.env = os.getenv('FLASK_ENV', 'development')
         self.config = self._load_config()
+        self.project_root = Path(__file__).parent.parent.parent.resolve()
+        self._paths = {}
 
     def _load_config(self):
         config_path = Path(__file__).parent / f'{self.env}.yml'
         with open(config_path) as f:
             return yaml.safe_load(f)
 
+    def _path(self, section, key, default=None):
+        """Resolve a project-relative path setting once; later lookups reuse it."""
+        if (section, key) not in self._paths:
+            if default is None:
+                rel_path = self.config[section][key]
+            else:
+                rel_path = self.config.get(section, {}).get(key, default)
+            self._paths[(section, key)] = str(self.project_root / rel_path)
+        return self._paths[(section, key)]
+
     @property
     def api_port(self):
         return self.config['server']['port']
@@ -24,32 +36,176 @@ class Config:
     def debug(self):
         return self.config['server']['debug']
 
+    @property
+    def server_workers(self):
+        return self.config['server'].get('workers', 4)
+
+    @property
+    def server_threads(self):
+        return self.config['server'].get('threads', 8)
+
     @property
     def cors_origins(self):
         return self.config['cors']['origins']
 
     @property
     def faiss_index_path(self):
-        project_root = Path(__file__).parent.parent.parent.resolve()
-        rel_path = self.config['rag_data']['faiss_index']
-        return str(project_root / rel_path)
+        return self._path('rag_data', 'faiss_index')
+
+    @property
+    def faiss_mmap_index(self):
+        return self.config.get('rag_data', {}).get('mmap_index', True)
 
     @property
     def faiss_metadata_path(self):
-        project_root = Path(__file__).parent.parent.parent.resolve()
-        rel_path = self.config['rag_data']['metadata']
-        return str(project_root / rel_path)
+        return self._path('rag_data', 'metadata')
+
+    @property
+    def sections_path(self):
+        return self._path('rag_data', 'sections', 'rag_data/sections')
+
+    @property
+    def entity_index_path(self):
+        return self._path('rag_data', 'entity_index', 'rag_data/entity_index.json')
+
+    @property
+    def search_entity_min_hits(self):
+        return self.config.get('search', {}).get('entity_min_hits', 3)
+
+    @property
+    def fact_store_path(self):
+        return self._path('rag_data', 'fact_store', 'rag_data/facts.sqlite')
+
+    @property
+    def search_fact_min_confidence(self):
+        return self.config.get('search', {}).get('fact_min_confidence', 0.8)
 
     @property
     def docs_data_path(self):
-        project_root = Path(__file__).parent.parent.parent.resolve()
-        rel_path = self.config['docs_data']['path']
-        return str(project_root / rel_path)
+        return self._path('docs_data', 'path')
 
     @property
     def build_faiss_output_folder(self):
-        project_root = Path(__file__).parent.parent.parent.resolve()
-        rel_path = self.config['build_faiss']['output_folder']
-        return str(project_root / rel_path)
+        return self._path('build_faiss', 'output_folder')
+
+    @property
+    def embedding_model(self):
+        return self.config.get('build_faiss', {}).get('embedding_model', 'text-embedding-ada-002')
+
+    @property
+    def embedding_dimension(self):
+        return self.config.get('build_faiss', {}).get('embedding_dimension', 1536)
+
+    @property
+    def embedding_pca_dim(self):
+        return self.config.get('build_faiss', {}).get('pca_dim')
+
+    @property
+    def embedding_max_workers(self):
+        return self.config.get('build_faiss', {}).get('max_workers', 4)
+
+    @property
+    def embedding_requests_per_minute(self):
+        return self.config.get('build_faiss', {}).get('requests_per_minute', 3000)
+
+    @property
+    def embedding_tokens_per_minute(self):
+        return self.config.get('build_faiss', {}).get('tokens_per_minute', 1000000)
+
+    @property
+    def embedding_max_retries(self):
+        return self.config.get('build_faiss', {}).get('max_retries', 6)
+
+    @property
+    def build_cache_dir(self):
+        return self._path('build', 'cache_dir', 'rag_data/build_cache')
+
+    @property
+    def build_runs_dir(self):
+        return self._path('build', 'runs_dir', 'rag_data/build_runs')
+
+    @property
+    def build_workers(self):
+        return self.config.get('build', {}).get('workers', 4)
+
+    @property
+    def build_dedupe_chunks(self):
+        return self.config.get('build', {}).get('dedupe_chunks', True)
+
+    @property
+    def summarizer_model(self):
+        return self.config.get('summarizer', {}).get('model', 'gpt-4-turbo')
+
+    @property
+    def summarizer_max_workers(self):
+        return self.config.get('summarizer', {}).get('max_workers', 8)
+
+    @property
+    def summarizer_requests_per_minute(self):
+        return self.config.get('summarizer', {}).get('requests_per_minute', 500)
+
+    @property
+    def summarizer_tokens_per_minute(self):
+        return self.config.get('summarizer', {}).get('tokens_per_minute', 300000)
+
+    @property
+    def summarizer_max_retries(self):
+        return self.config.get('summarizer', {}).get('max_retries', 6)
+
+    @property
+    def summarizer_pack_token_budget(self):
+        return self.config.get('summarizer', {}).get('pack_token_budget', 6000)
+
+    @property
+    def summarizer_pack_max_chunks(self):
+        return self.config.get('summarizer', {}).get('pack_max_chunks', 8)
+
+    @property
+    def summarizer_final_token_budget(self):
+        return self.config.get('summarizer', {}).get('final_token_budget', 60000)
+
+    @property
+    def summarizer_reduce_group_token_budget(self):
+        return self.config.get('summarizer', {}).get('reduce_group_token_budget', 12000)
+
+    @property
+    def summarizer_preselect(self):
+        return self.config.get('summarizer', {}).get('preselect', True)
+
+    @property
+    def summarizer_preselect_per_topic(self):
+        return self.config.get('summarizer', {}).get('preselect_per_topic', 20)
+
+    @property
+    def summarizer_preselect_max_chunks(self):
+        return self.config.get('summarizer', {}).get('preselect_max_chunks', 150)
+
+    @property
+    def summarizer_job_workers(self):
+        return self.config.get('summarizer', {}).get('job_workers', 2)
+
+    @property
+    def summarizer_job_lease_seconds(self):
+        return self.config.get('summarizer', {}).get('job_lease_seconds', 120)
+
+    @property
+    def summarizer_stream_keepalive_seconds(self):
+        return self.config.get('summarizer', {}).get('stream_keepalive_seconds', 15)
+
+    @property
+    def summarizer_jobs_db_path(self):
+        return self._path('summarizer', 'jobs_db', 'rag_data/summary_jobs.sqlite')
+
+    @property
+    def summarizer_precompute_reports(self):
+        return self.config.get('summarizer', {}).get('precompute_reports', True)
+
+    @property
+    def report_store_path(self):
+        return self._path('summarizer', 'report_store', 'rag_data/reports.sqlite')
+
+    @property
+    def summarizer_cache_path(self):
+        return self._path('summarizer', 'cache_path', 'rag_data/summary_cache.sqlite')
 
 config = Config()
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+atomic_io.py
+
+Write-then-rename helpers for build artifacts. Readers (the server, a
+resumed build) only ever see the previous file or the complete new one,
+never a truncated write.
+"""
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Tuple
+
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """
+    Temporary path next to `path` to write to; renamed over `path` when the
+    block succeeds, removed when it fails.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json(path: str, data: Any, indent: Optional[int] = None,
+               separators: Optional[Tuple[str, str]] = None) -> None:
+    """Write JSON through a temporary file renamed into place."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=indent, separators=separators)
+
+
+def read_json(path: str) -> Any:
+    with open(path, "r") as f:
+        return json.load(f)
@@ -0,0 +1,258 @@
+"""
+backend.py
+
+Services behind the Flask API (FAISS index, chunk metadata, report store and
+summary jobs), loaded off the request path so the server can bind its port
+and answer liveness checks before the index is in memory.
+"""
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+# Startup states
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+# Interval at which a forced report stream polls its job's progress
+JOB_POLL_SECONDS = 1.0
+
+
+class Backend:
+    """
+    Holds the loaded services and tracks how far startup has got.
+
+    Loading is split in two: load_index() reads the index and metadata
+    (read-only data that can be shared between processes), and
+    start_services() opens the databases and worker pools each serving
+    process needs for itself.
+
+    Attributes:
+        status (str): STARTING, READY or FAILED
+        phase (str): Startup phase in progress (or last reached)
+        timings (Dict[str, float]): Seconds spent in each finished phase
+        error (str): Why startup failed, if it did
+    """
+
+    def __init__(self, api_key: str):
+        """
+        Initialize Backend without loading anything yet.
+
+        Args:
+            api_key: OpenAI API key used by the search service
+        """
+        self.api_key = api_key
+        self.status = STARTING
+        self.phase = None
+        self.timings: Dict[str, float] = {}
+        self.error = None
+        self.chat_service = None
+        self.chunks_by_source_file: Dict[str, list] = {}
+        self.chunk_set_hashes: Dict[str, str] = {}
+        self.report_store = None
+        self.job_queue = None
+        self._summarizer = None
+        self._ready = threading.Event()
+
+    @contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        self.phase = name
+        started = time.perf_counter()
+        yield
+        self.timings[name] = round(time.perf_counter() - started, 3)
+        logger.info(f"Startup phase '{name}' took {self.timings[name]:.2f}s")
+
+    @property
+    def ready(self) -> bool:
+        """True once every service is loaded."""
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until loading finished (or failed); returns whether the backend is ready."""
+        self._ready.wait(timeout)
+        return self.ready
+
+    def status_info(self) -> Dict[str, Any]:
+        """Startup state for the readiness endpoint."""
+        info = {"status": self.status, "phase": self.phase, "timings": self.timings}
+        if self.error:
+            info["error"] = self.error
+        return info
+
+    def load_index(self) -> None:
+        """Load the FAISS index and chunk metadata, and group chunks by document."""
+        with self._phase("import"):
+            from .search import ChatSearchService
+            from . import summarizer
+            self._summarizer = summarizer
+        with self._phase("load_index"):
+            self.chat_service = ChatSearchService(
+                openai_api_key=self.api_key,
+                faiss_index_path=config.faiss_index_path,
+                metadata_path=config.faiss_metadata_path,
+                mmap_index=config.faiss_mmap_index,
+                sections_dir=config.sections_path,
+                entity_index_path=config.entity_index_path,
+                entity_min_hits=config.search_entity_min_hits,
+                fact_min_confidence=config.search_fact_min_confidence,
+                embedding_model=config.embedding_model
+            )
+        with self._phase("group_chunks"):
+            self.chunks_by_source_file = summarizer.group_chunks_by_source_file(self.chat_service.all_chunks)
+            self.chunk_set_hashes = {
+                source_file: summarizer.chunk_set_hash(chunks)
+                for source_file, chunks in self.chunks_by_source_file.items()
+            }
+
+    def start_services(self, resume_jobs: bool = True) -> None:
+        """
+        Open the report store and facts table, and start the summary job workers.
+
+        Args:
+            resume_jobs: Re-queue jobs interrupted by a restart; with several
+                serving processes only one of them should do this (jobs of a
+                process that dies later are taken over when their lease expires)
+        """
+        from .report_store import ReportStore
+        from .summary_jobs import SummaryJobQueue
+
+        with self._phase("start_services"):
+            self.report_store = ReportStore(config.report_store_path)
+            self.chat_service.open_fact_store(config.fact_store_path)
+            self.job_queue = SummaryJobQueue(
+                config.summarizer_jobs_db_path, self.run_report,
+                max_workers=config.summarizer_job_workers, resume_interrupted=resume_jobs,
+                lease_seconds=config.summarizer_job_lease_seconds
+            )
+        self.status = READY
+        self._ready.set()
+        logger.info(f"Backend ready in {sum(self.timings.values()):.2f}s")
+
+    def load(self) -> None:
+        """Run every startup phase, recording a failure instead of raising."""
+        try:
+            self.load_index()
+            self.start_services()
+        except Exception as e:
+            logger.error(f"Backend failed to start during '{self.phase}': {e}")
+            self.error = str(e)
+            self.status = FAILED
+            self._ready.set()
+
+    def start(self) -> threading.Thread:
+        """Load the backend on a background thread and return the thread."""
+        thread = threading.Thread(target=self.load, name="backend-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def stored_report(self, source_file: str) -> Optional[Dict[str, Any]]:
+        """Return a document's current precomputed report, or None."""
+        return self.report_store.get(
+            source_file, self._summarizer.REPORT_PROMPT_VERSION, self.chunk_set_hashes[source_file]
+        )
+
+    def _store_report(self, source_file: str, report: str) -> None:
+        self.report_store.put(
+            source_file, self._summarizer.REPORT_PROMPT_VERSION, self.chunk_set_hashes[source_file], report
+        )
+
+    def run_report(self, source_file: str, progress) -> str:
+        """Generate and store a document's report; raises RuntimeError if none could be produced."""
+        report = self._summarizer.generate_report(
+            self.chunks_by_source_file[source_file], source_file,
+            faiss_index=self.chat_service.faiss_index, progress=progress
+        )
+        if self._summarizer.is_failed_report(report):
+            raise RuntimeError(report.splitlines()[0])
+        self._store_report(source_file, report)
+        return report
+
+    def report_events(self, source_file: str, force: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream a document's report as (event, data) pairs.
+
+        Events are "progress", "section", "done", "error", and "keepalive"
+        while nothing else is due. A forced stream regenerates the report
+        through the job queue, so it joins a job already in flight for the
+        document (from any process) instead of starting a second one.
+        """
+        summarizer = self._summarizer
+
+        if force:
+            yield from self._job_events(self.job_queue.submit(source_file, force=True))
+            return
+
+        # A current stored report is replayed section by section straight away
+        stored = None if force else self.stored_report(source_file)
+        if stored:
+            for section in summarizer.split_report_sections([stored["report"]]):
+                yield "section", {"title": summarizer.section_title(section), "markdown": section}
+            yield "done", {"precomputed": True, "created_at": stored["created_at"]}
+            return
+
+        # Otherwise generate on a background thread, so progress and sections
+        # can be relayed as they happen and a dropped client doesn't lose the report
+        events: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue()
+
+        def produce() -> None:
+            sections = []
+            try:
+                for section in summarizer.stream_report(
+                    self.chunks_by_source_file[source_file], source_file, faiss_index=self.chat_service.faiss_index,
+                    progress=lambda done, total: events.put(("progress", {"done": done, "total": total}))
+                ):
+                    sections.append(section)
+                    if not summarizer.is_failed_report(section):
+                        events.put(("section", {"title": summarizer.section_title(section), "markdown": section}))
+                report = summarizer.assemble_report(sections)
+                if summarizer.is_failed_report(report):
+                    events.put(("error", {"error": report.splitlines()[0]}))
+                    return
+                self._store_report(source_file, report)
+                events.put(("done", {"precomputed": False}))
+            except Exception as e:
+                logger.error(f"Streaming report for {source_file} failed: {e}")
+                events.put(("error", {"error": str(e)}))
+
+        threading.Thread(target=produce, name="summary-stream", daemon=True).start()
+        while True:
+            try:
+                event, data = events.get(timeout=config.summarizer_stream_keepalive_seconds)
+            except queue.Empty:
+                yield "keepalive", {}
+                continue
+            yield event, data
+            if event in ("done", "error"):
+                return
+
+    def _job_events(self, job: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Relay a summary job's progress as events, then its report section by section."""
+        from .summary_jobs import DONE, FAILED as JOB_FAILED
+
+        summarizer = self._summarizer
+        progress = None
+        last_event = time.monotonic()
+        while True:
+            if job["status"] == DONE:
+                for section in summarizer.split_report_sections([job["report"]]):
+                    yield "section", {"title": summarizer.section_title(section), "markdown": section}
+                yield "done", {"precomputed": False}
+                return
+            if job["status"] == JOB_FAILED:
+                yield "error", {"error": job["error"]}
+                return
+            if job["progress_total"] and (job["progress_done"], job["progress_total"]) != progress:
+                progress = (job["progress_done"], job["progress_total"])
+                yield "progress", {"done": progress[0], "total": progress[1]}
+                last_event = time.monotonic()
+            elif time.monotonic() - last_event >= config.summarizer_stream_keepalive_seconds:
+                yield "keepalive", {}
+                last_event = time.monotonic()
+            time.sleep(JOB_POLL_SECONDS)
+            job = self.job_queue.get(job["id"])
@@ -1,120 +1,494 @@
+"""
+build_faiss.py
+
+Embed preprocessed chunks with OpenAI and build the FAISS index plus metadata.
+
+Usage (from the repository root):
+    python -m app.core.build_faiss [--mode full|incremental] [--resume] [--pca-dim 256] [--benchmark] [--skip-reports]
+"""
+import argparse
+import hashlib
 import json
 import os
 import numpy as np
 import faiss
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from dotenv import load_dotenv
 import openai
 import tiktoken
-from config import config
-
-
-
-# Estimate token count for a string
-def count_tokens(text):
-    return len(encoding.encode(text))
-
-# Split a long text into smaller parts by sentence
-def split_into_chunks(text, max_tokens):
-    sentences = text.split('. ')
-    chunks = []
-    current = ""
-    for sentence in sentences:
-        if count_tokens(current + sentence) < max_tokens - SAFETY_MARGIN:
-            current += sentence + '. '
-        else:
-            chunks.append(current.strip())
-            current = sentence + '. '
-    if current:
-        chunks.append(current.strip())
-    return chunks
-
-# Embedding with token-aware batching and long chunk splitting
-def get_openai_embeddings(texts, model="text-embedding-ada-002"):
-    embeddings = []
+from ..config import config
+from .rate_limit import RateLimiter, retry_with_backoff
+from .report_store import ReportStore
+from .atomic_io import atomic_path, write_json
+from .entity_index import build_entity_index, extract_entities, save_entity_index
+from .fact_store import FactStore, extract_all_facts
+
+
+
+# Tokenizer limits for ada-002
+MAX_TOKENS_PER_BATCH = 8191
+MAX_TOKENS_PER_CHUNK = 8191
+SAFETY_MARGIN = 50  # leave headroom
+
+# Build artifacts written next to chunks.json
+EMBEDDINGS_FILE = "embeddings.f32"
+CHECKPOINT_FILE = "embedding_checkpoint.json"
+INCREMENTAL_EMBEDDINGS_FILE = "embeddings_incremental.f32"
+INCREMENTAL_CHECKPOINT_FILE = "embedding_checkpoint_incremental.json"
+
+_encoding = None
+
+# Tokenizer for the embedding model, created once per process
+def get_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.encoding_for_model("text-embedding-ada-002")
+    return _encoding
+
+# Split a token id sequence into windows, cutting after a sentence end when possible
+def split_token_ids(token_ids, max_tokens):
+    encoding = get_encoding()
+    windows = []
+    start = 0
+    while start < len(token_ids):
+        end = min(start + max_tokens, len(token_ids))
+        if end < len(token_ids):
+            # Look back over the second half of the window for a token ending a sentence
+            for cut in range(end, start + max_tokens // 2, -1):
+                if encoding.decode_single_token_bytes(token_ids[cut - 1]).endswith(b"."):
+                    end = cut
+                    break
+        windows.append((start, end))
+        start = end
+    return windows
+
+# Encode every chunk exactly once and expand it into embeddable sub-chunks.
+# Each item carries its token count and its position in the parent chunk, so
+# embedding, metadata and cost accounting all work off the same list.
+def prepare_items(chunks):
+    encoding = get_encoding()
+    max_tokens = MAX_TOKENS_PER_CHUNK - SAFETY_MARGIN
+    items = []
+    for chunk_pos, chunk in enumerate(tqdm(chunks, desc="Preparing chunks", unit="chunk")):
+        text = chunk.get("text")
+        if not isinstance(text, str) or not text.strip():
+            continue
+        token_ids = encoding.encode(text)
+        windows = split_token_ids(token_ids, max_tokens)
+        for sub_index, (start, end) in enumerate(windows):
+            sub_text = text if len(windows) == 1 else encoding.decode(token_ids[start:end]).strip()
+            if not sub_text:
+                continue
+            items.append({
+                "text": sub_text,
+                "token_count": end - start,
+                "chunk_pos": chunk_pos,
+                "sub_chunk": sub_index,
+                "token_span": [start, end]
+            })
+    return items
+
+# Group chunks into token-budgeted batches, preserving input order
+def plan_batches(chunks, token_counts):
+    batches = []
     batch = []
     batch_token_count = 0
-    total_tokens = 0
-    
-    # First pass: count total chunks after splitting
-    print("🔍 Analyzing text chunks and counting tokens...")
-    all_chunks = []
-    for text in tqdm(texts, desc="Preparing chunks", unit="chunk"):
-        if count_tokens(text) > MAX_TOKENS_PER_CHUNK - SAFETY_MARGIN:
-            sub_chunks = split_into_chunks(text, MAX_TOKENS_PER_CHUNK)
-        else:
-            sub_chunks = [text]
-        
-        for chunk in sub_chunks:
-            if isinstance(chunk, str) and chunk.strip():
-                tokens = count_tokens(chunk)
-                if tokens > MAX_TOKENS_PER_CHUNK - SAFETY_MARGIN:
-                    encoded = encoding.encode(chunk)
-                    chunk = encoding.decode(encoded[:MAX_TOKENS_PER_CHUNK - SAFETY_MARGIN])
-                    tokens = count_tokens(chunk)
-                all_chunks.append(chunk)
-                total_tokens += tokens
-    
-    print(f"📊 Total chunks to process: {len(all_chunks)}")
+    for chunk, tokens in zip(chunks, token_counts):
+        if batch and batch_token_count + tokens > MAX_TOKENS_PER_BATCH - SAFETY_MARGIN:
+            batches.append((batch, batch_token_count))
+            batch = []
+            batch_token_count = 0
+        batch.append(chunk)
+        batch_token_count += tokens
+    if batch:
+        batches.append((batch, batch_token_count))
+    return batches
+
+# Embed one batch, paced by the rate limiter and retried on transient errors
+def embed_batch(client, batch, batch_tokens, model, limiter, max_retries):
+    def request():
+        limiter.acquire(batch_tokens)
+        return client.embeddings.create(input=batch, model=model)
+
+    response = retry_with_backoff(request, max_retries=max_retries)
+    return [r.embedding for r in sorted(response.data, key=lambda r: r.index)]
+
+# Keep several batches in flight; on_result(i, vectors) runs on the calling
+# thread as each batch completes, so results can be written in place
+def embed_batches(client, batches, model, max_workers, limiter, max_retries, on_result, batch_ids=None):
+    batch_ids = list(range(len(batches))) if batch_ids is None else batch_ids
+    total_chunks = sum(len(batches[i][0]) for i in batch_ids)
+
+    with tqdm(total=total_chunks, desc="Generating embeddings", unit="chunk") as pbar, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(embed_batch, client, batches[i][0], batches[i][1], model, limiter, max_retries): i
+            for i in batch_ids
+        }
+        # Keep recording finished batches after a failure so a resumed build
+        # only has to redo the batches that actually failed
+        first_error = None
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                on_result(i, future.result())
+            except Exception as e:
+                print(f"❌ Batch {i} failed: {e}")
+                first_error = first_error or e
+                continue
+            pbar.update(len(batches[i][0]))
+            pbar.set_postfix({'batches_done': done})
+
+    if first_error:
+        raise first_error
+
+# Fingerprint of the embedding plan; a checkpoint is only reusable for the same
+# plan and the same matrix layout (vector dimension and dtype)
+def plan_fingerprint(items, model, dimension, dtype="float32"):
+    digest = hashlib.sha256(f"{model}:{dimension}:{dtype}".encode())
+    for item in items:
+        digest.update(hashlib.sha256(item["text"].encode()).digest())
+    return digest.hexdigest()
+
+def load_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, "r") as f:
+        return json.load(f)
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    # Write-then-rename so a crash never leaves a truncated checkpoint
+    write_json(checkpoint_path, checkpoint)
+
+# Embed prepared items with token-aware batching, streaming each batch into a
+# preallocated float32 memmap and checkpointing after every completed batch
+def get_openai_embeddings(client, items, matrix_path, checkpoint_path, model=None, resume=False):
+    model = model or config.embedding_model
+    dimension = config.embedding_dimension
+    total_tokens = sum(item["token_count"] for item in items)
+    print(f"📊 Total chunks to process: {len(items)}")
     print(f"📊 Total tokens to embed: {total_tokens}")
-    
-    # Second pass: generate embeddings with progress bar
-    processed_chunks = 0
-    batch_count = 0
-    
-    with tqdm(total=len(all_chunks), desc="Generating embeddings", unit="chunk") as pbar:
-        for chunk in all_chunks:
-            tokens = count_tokens(chunk)
-            
-            # Check if we need to process current batch
-            if batch_token_count + tokens > MAX_TOKENS_PER_BATCH - SAFETY_MARGIN:
-                if batch:  # Process current batch
-                    batch_count += 1
-                    pbar.set_postfix({
-                        'batch': batch_count,
-                        'batch_size': len(batch),
-                        'tokens': batch_token_count
-                    })
-                    
-                    response = client.embeddings.create(input=batch, model=model)
-                    embeddings.extend([r.embedding for r in response.data])
-                    processed_chunks += len(batch)
-                    pbar.update(len(batch))
-                    
-                    # Reset batch
-                    batch = []
-                    batch_token_count = 0
-            
-            batch.append(chunk)
-            batch_token_count += tokens
-        
-        # Process final batch
-        if batch:
-            batch_count += 1
-            pbar.set_postfix({
-                'batch': batch_count,
-                'batch_size': len(batch),
-                'tokens': batch_token_count
-            })
-            
-            response = client.embeddings.create(input=batch, model=model)
-            embeddings.extend([r.embedding for r in response.data])
-            processed_chunks += len(batch)
-            pbar.update(len(batch))
+
+    batches = plan_batches([item["text"] for item in items], [item["token_count"] for item in items])
+    offsets = np.cumsum([0] + [len(batch) for batch, _ in batches])
+    fingerprint = plan_fingerprint(items, model, dimension)
+    matrix_bytes = len(items) * dimension * np.dtype("float32").itemsize
+
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if (checkpoint and checkpoint.get("fingerprint") == fingerprint and os.path.exists(matrix_path)
+            and os.path.getsize(matrix_path) == matrix_bytes):
+        embedding_matrix = np.memmap(matrix_path, dtype="float32", mode="r+", shape=(len(items), dimension))
+        print(f"♻️ Resuming: {len(checkpoint['completed_batches'])}/{len(batches)} batches already embedded")
+    else:
+        if resume:
+            print("⚠️ No matching checkpoint found, starting a fresh build")
+        embedding_matrix = np.memmap(matrix_path, dtype="float32", mode="w+", shape=(len(items), dimension))
+        checkpoint = {
+            "fingerprint": fingerprint,
+            "model": model,
+            "rows": len(items),
+            "dimension": dimension,
+            "num_batches": len(batches),
+            "completed_batches": []
+        }
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    completed = set(checkpoint["completed_batches"])
+    pending = [i for i in range(len(batches)) if i not in completed]
+
+    def write_batch(i, vectors):
+        block = np.asarray(vectors, dtype="float32")
+        if block.shape[1] != dimension:
+            raise ValueError(f"Model returned {block.shape[1]}-d vectors, expected {dimension}")
+        embedding_matrix[offsets[i]:offsets[i + 1]] = block
+        embedding_matrix.flush()
+        completed.add(i)
+        checkpoint["completed_batches"] = sorted(completed)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    # Generate embeddings concurrently, paced against the account's rate limits
+    limiter = RateLimiter(
+        requests_per_minute=config.embedding_requests_per_minute,
+        tokens_per_minute=config.embedding_tokens_per_minute
+    )
+    print(f"🚀 Embedding {len(pending)} batches with {config.embedding_max_workers} concurrent workers...")
+    embed_batches(
+        client, batches, model,
+        max_workers=config.embedding_max_workers,
+        limiter=limiter,
+        max_retries=config.embedding_max_retries,
+        on_result=write_batch,
+        batch_ids=pending
+    )
 
     estimated_cost = total_tokens / 1000 * 0.0001
-    print(f"\n✅ Embedding generation complete!")
-    print(f"📊 Total batches processed: {batch_count}")
-    print(f"📊 Total chunks embedded: {len(embeddings)}")
+    print("\n✅ Embedding generation complete!")
+    print(f"📊 Total batches processed: {len(batches)}")
+    print(f"📊 Total chunks embedded: {len(items)}")
     print(f"📊 Total tokens embedded: {total_tokens}")
     print(f"💰 Estimated cost: ${estimated_cost:.4f}")
 
-    return embeddings, total_tokens
+    return embedding_matrix, total_tokens
 
+# Stable 63-bit id for a sub-chunk, derived from its document and content so
+# re-chunking an unchanged document reproduces the same ids
+def chunk_id(chunk, sub_chunk):
+    key = f"{chunk['metadata'].get('source_file', 'unknown')}:{chunk.get('chunk_index', '')}:{chunk.get('hash', '')}:{sub_chunk}"
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big") & 0x7FFFFFFFFFFFFFFF
 
+# One metadata row per embedded item, so rows line up with vectors by construction.
+# A chunk split into sub-chunks is re-tagged per piece, so entity postings only
+# point at the pieces that actually mention the entity. Each row records the
+# embedding model, which the search service checks against its query model
+def build_metadata(chunks, items, model=None):
+    model = model or config.embedding_model
+    faiss_metadata = []
+    for item in items:
+        chunk = chunks[item["chunk_pos"]]
+        entities = chunk.get("entities")
+        if entities is not None and item["text"] != chunk["text"]:
+            entities = extract_entities(item["text"])
+        faiss_metadata.append({
+            "id": chunk_id(chunk, item["sub_chunk"]),
+            "text": item["text"],
+            "section_header": chunk["section_header"],
+            "chunk_index": chunk.get("chunk_index"),
+            "section_id": chunk.get("section_id"),
+            "source_span": chunk.get("source_span"),
+            "entities": entities,
+            "metadata": chunk["metadata"],
+            "token_count": item["token_count"],
+            "sub_chunk": item["sub_chunk"],
+            "embedding_model": model
+        })
+    return faiss_metadata
 
+def token_usage_by_document(faiss_metadata):
+    token_log_by_doc = {}
+    for row in faiss_metadata:
+        source_file = row["metadata"].get("source_file", "unknown")
+        token_log_by_doc[source_file] = token_log_by_doc.get(source_file, 0) + row.get("token_count", 0)
+    return token_log_by_doc
+
+# Add vectors under their stable ids, in slices to bound peak memory
+def add_vectors(index, embedding_matrix, ids):
+    batch_size = 1000  # Add embeddings in batches
+    for i in tqdm(range(0, len(embedding_matrix), batch_size), desc="Building index", unit="batch"):
+        batch_end = min(i + batch_size, len(embedding_matrix))
+        index.add_with_ids(embedding_matrix[i:batch_end], ids[i:batch_end])
+
+# Group metadata rows by document as {source_file: set of ids}
+def ids_by_document(faiss_metadata):
+    docs = {}
+    for row in faiss_metadata:
+        docs.setdefault(row["metadata"].get("source_file", "unknown"), set()).add(row["id"])
+    return docs
+
+# Learn a PCA projection on (a sample of) the corpus and wrap a reduced-dimension
+# flat index with it. IndexPreTransform applies the same projection to every
+# vector added later and to every query, so search needs no extra code path.
+def train_pca_index(embedding_matrix, pca_dim, max_training_rows=100000):
+    dimension = embedding_matrix.shape[1]
+    if not 0 < pca_dim < dimension:
+        raise ValueError(f"PCA dimension must be between 1 and {dimension - 1}, got {pca_dim}")
+    rng = np.random.default_rng(0)
+    rows = len(embedding_matrix)
+    sample = np.sort(rng.choice(rows, size=min(rows, max_training_rows), replace=False))
+    print(f"📐 Training PCA {dimension} -> {pca_dim} on {len(sample)} vectors...")
+    pca = faiss.PCAMatrix(dimension, pca_dim)
+    pca.train(np.ascontiguousarray(embedding_matrix[sample]))
+    return faiss.IndexPreTransform(pca, faiss.IndexFlatL2(pca_dim))
+
+# recall@k of `index` against an exact full-dimension flat index, using
+# corpus vectors as queries
+def recall_at_k(embedding_matrix, index, k=10, n_queries=200):
+    exact = faiss.IndexFlatL2(embedding_matrix.shape[1])
+    for i in range(0, len(embedding_matrix), 1000):
+        exact.add(embedding_matrix[i:i + 1000])
+    rng = np.random.default_rng(1)
+    query_rows = np.sort(rng.choice(len(embedding_matrix), size=min(n_queries, len(embedding_matrix)), replace=False))
+    queries = np.ascontiguousarray(embedding_matrix[query_rows])
+
+    # The exact index is keyed by row position; map it onto the stable ids
+    # the evaluated index returns
+    row_ids = faiss.vector_to_array(index.id_map) if hasattr(index, "id_map") else np.arange(len(embedding_matrix))
+    _, exact_rows = exact.search(queries, k)
+    _, approx_ids = index.search(queries, k)
+    hits = sum(len(set(row_ids[e[e >= 0]]) & set(a[a >= 0])) for e, a in zip(exact_rows, approx_ids))
+    return hits / (len(queries) * k)
+
+
+# Write next to the live index and swap it in, so servers that memory-map
+# the old file keep reading intact pages until they reload
+def save_index(index, index_path):
+    with atomic_path(index_path) as tmp_index_path:
+        faiss.write_index(index, tmp_index_path)
+
+
+# FAISS index keyed by stable chunk ids, PCA-reduced when pca_dim is set
+def create_index(embedding_matrix, ids, pca_dim=None):
+    if pca_dim:
+        index = faiss.IndexIDMap2(train_pca_index(embedding_matrix, pca_dim))
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(embedding_matrix.shape[1]))
+    add_vectors(index, embedding_matrix, ids)
+    return index
+
+
+# Swap in the index, its metadata and the entity postings over the same rows.
+# Returns the entity index
+def save_index_outputs(index, faiss_metadata):
+    save_index(index, config.faiss_index_path)
+    write_json(config.faiss_metadata_path, faiss_metadata, indent=2)
+    # Exact-match postings (codes, CFR references, dollar amounts) over the same rows
+    entity_index = build_entity_index(faiss_metadata)
+    save_entity_index(config.entity_index_path, entity_index)
+    return entity_index
+
+
+# Re-extract the quantitative facts table (conversion factors, cap amounts, ...)
+# cited by the indexed chunk ids
+def refresh_facts(faiss_metadata):
+    facts = extract_all_facts(faiss_metadata)
+    fact_store = FactStore(config.fact_store_path)
+    try:
+        stored = fact_store.replace_all(facts)
+    finally:
+        fact_store.close()
+    return {"facts": stored, "fact_types": sorted({fact["fact_type"] for fact in facts})}
+
+
+# Write embedding_cost_summary.json; returns the per-document token counts and costs
+def save_cost_summary(faiss_metadata, output_folder):
+    doc_costs = {}
+    for doc, tokens in token_usage_by_document(faiss_metadata).items():
+        doc_costs[doc] = {"tokens": tokens, "cost": round(tokens / 1000 * 0.0001, 4)}
+    total_tokens = sum(doc["tokens"] for doc in doc_costs.values())
+    write_json(os.path.join(output_folder, "embedding_cost_summary.json"), {
+        "total_tokens": total_tokens,
+        "estimated_total_cost": round(total_tokens / 1000 * 0.0001, 4),
+        "per_document": doc_costs
+    }, indent=2)
+    return doc_costs
+
+
+# Precompute reports of new or changed documents so report reads need no LLM
+# call (see summarizer.refresh_reports); "missing" lists documents still without one
+def refresh_stored_reports(faiss_metadata, index):
+    from .summarizer import REPORT_PROMPT_VERSION, chunk_set_hash, group_chunks_by_source_file, refresh_reports
+
+    chunks_by_source_file = group_chunks_by_source_file(faiss_metadata)
+    store = ReportStore(config.report_store_path)
+    try:
+        refreshed = refresh_reports(chunks_by_source_file, store, faiss_index=index)
+        missing = [source_file for source_file, chunks in chunks_by_source_file.items()
+                   if not store.get(source_file, REPORT_PROMPT_VERSION, chunk_set_hash(chunks))]
+    finally:
+        store.close()
+    return {"documents": len(chunks_by_source_file), "regenerated": len(refreshed), "missing": missing}
+
+
+def build_full(client, chunks, items, output_folder, resume, pca_dim=None):
+    print("🔄 Generating embeddings with OpenAI using token-aware batching...")
+    embedding_matrix, _ = get_openai_embeddings(
+        client, items,
+        matrix_path=os.path.join(output_folder, EMBEDDINGS_FILE),
+        checkpoint_path=os.path.join(output_folder, CHECKPOINT_FILE),
+        resume=resume
+    )
+    faiss_metadata = build_metadata(chunks, items)
+
+    print("🔍 Building FAISS index...")
+    index = create_index(embedding_matrix, np.array([row["id"] for row in faiss_metadata], dtype="int64"), pca_dim)
+    return index, faiss_metadata, embedding_matrix
+
+
+# Reduced dimension of an index's PCA projection, or None for a full-dimension index
+def index_pca_dim(index):
+    base_index = faiss.downcast_index(getattr(index, "index", index))
+    return base_index.index.d if isinstance(base_index, faiss.IndexPreTransform) else None
+
+
+# Update the existing index in place: drop vectors of removed or changed
+# documents and embed only the documents whose chunk ids are new. New vectors
+# go through the index's own PCA projection; asking for another one is an error
+def update_incremental(client, chunks, items, output_folder, resume, pca_dim=None):
+    index = faiss.read_index(config.faiss_index_path)
+    if not hasattr(index, "id_map"):
+        raise ValueError("Existing index has no stable chunk ids; run a full build first")
+    if index.d != config.embedding_dimension:
+        raise ValueError(f"Existing index holds {index.d}-d vectors, not {config.embedding_dimension}-d; "
+                         f"run a full build")
+    existing_pca_dim = index_pca_dim(index)
+    if pca_dim and pca_dim != existing_pca_dim:
+        existing = f"a {existing_pca_dim}-d" if existing_pca_dim else "no"
+        raise ValueError(f"Existing index has {existing} PCA projection, not {pca_dim}-d; "
+                         f"run a full build to change it")
+    if existing_pca_dim and not pca_dim:
+        print(f"📐 Keeping the index's {index.d} -> {existing_pca_dim} PCA projection")
+    with open(config.faiss_metadata_path, "r") as f:
+        old_metadata = json.load(f)
+    # Vectors of two models can't share an index
+    old_models = {row.get("embedding_model") for row in old_metadata} - {None}
+    if old_models and old_models != {config.embedding_model}:
+        raise ValueError(f"Existing index was built with {', '.join(sorted(old_models))}, not "
+                         f"{config.embedding_model}; run a full build")
+
+    new_metadata = build_metadata(chunks, items)
+    old_docs = ids_by_document(old_metadata)
+    new_docs = ids_by_document(new_metadata)
+
+    removed = {doc for doc in old_docs if doc not in new_docs}
+    changed = {doc for doc in old_docs if doc in new_docs and old_docs[doc] != new_docs[doc]}
+    added = {doc for doc in new_docs if doc not in old_docs}
+    print(f"📊 Documents added: {len(added)}, changed: {len(changed)}, removed: {len(removed)}")
+
+    stale_ids = [i for doc in removed | changed for i in old_docs[doc]]
+    if stale_ids:
+        print(f"🗑️ Removing {len(stale_ids)} vectors...")
+        index.remove_ids(np.array(stale_ids, dtype="int64"))
+
+    to_embed = [(item, row) for item, row in zip(items, new_metadata)
+                if row["metadata"].get("source_file", "unknown") in added | changed]
+    if to_embed:
+        print("🔄 Embedding new and changed documents...")
+        embedding_matrix, _ = get_openai_embeddings(
+            client, [item for item, _ in to_embed],
+            matrix_path=os.path.join(output_folder, INCREMENTAL_EMBEDDINGS_FILE),
+            checkpoint_path=os.path.join(output_folder, INCREMENTAL_CHECKPOINT_FILE),
+            resume=resume
+        )
+        add_vectors(index, embedding_matrix, np.array([row["id"] for _, row in to_embed], dtype="int64"))
+
+    # Metadata store: untouched documents keep their rows, touched ones take the new rows
+    touched = removed | changed | added
+    faiss_metadata = [row for row in old_metadata if row["metadata"].get("source_file", "unknown") not in touched]
+    faiss_metadata += [row for _, row in to_embed]
+    return index, faiss_metadata
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Embed chunks and build the FAISS index")
+    parser.add_argument("--mode", choices=["full", "incremental"], default="full",
+                        help="full: rebuild everything; incremental: add/remove changed documents in place")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted build from its last completed batch")
+    parser.add_argument("--pca-dim", type=int, default=config.embedding_pca_dim,
+                        help="Reduce vectors to this many dimensions with PCA (incremental builds "
+                             "require the existing index's setting)")
+    parser.add_argument("--skip-reports", action="store_true",
+                        help="Do not refresh the precomputed report store after building")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Report recall@k of the built index against a full-dimension flat index")
+    parser.add_argument("--benchmark-k", type=int, default=10,
+                        help="k used for the recall@k benchmark")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
 
-if __name__ == "__main__":
     # Load environment variables
     load_dotenv()
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -129,88 +503,56 @@ if __name__ == "__main__":
     print("📁 Loading preprocessed chunks...")
     with open(os.path.join(output_folder, "chunks.json"), "r") as f:
         chunks = json.load(f)
+    print(f"✅ Loaded {len(chunks)} text chunks")
 
-    texts = [chunk["text"] for chunk in chunks]
-    print(f"✅ Loaded {len(texts)} text chunks")
-
-    # Tokenizer setup for ada-002
-    encoding = tiktoken.encoding_for_model("text-embedding-ada-002")
-    #encoding = tiktoken.get_encoding("o200k_base")
-    MAX_TOKENS_PER_BATCH = 8191
-    MAX_TOKENS_PER_CHUNK = 8191
-    SAFETY_MARGIN = 50  # leave headroom
+    # Single tokenization pass: split and truncate on token ids
+    print("🔍 Tokenizing chunks and splitting long ones...")
+    items = prepare_items(chunks)
+    if not items:
+        print("⚠️ No non-empty chunks to embed, nothing to do")
+        return
 
-    print("🔄 Generating embeddings with OpenAI using token-aware batching and splitting long chunks...")
-    embeddings, total_tokens = get_openai_embeddings(texts)
-    embedding_matrix = np.array(embeddings).astype("float32")
+    if args.mode == "incremental":
+        index, faiss_metadata = update_incremental(client, chunks, items, output_folder, args.resume,
+                                                   pca_dim=args.pca_dim)
+    else:
+        index, faiss_metadata, embedding_matrix = build_full(
+            client, chunks, items, output_folder, args.resume, pca_dim=args.pca_dim
+        )
+        if args.benchmark:
+            recall = recall_at_k(embedding_matrix, index, k=args.benchmark_k)
+            print(f"📏 recall@{args.benchmark_k} vs full-dimension flat index: {recall:.4f}")
+            write_json(os.path.join(output_folder, "index_benchmark.json"), {
+                "dimension": embedding_matrix.shape[1],
+                "index_dimension": args.pca_dim or embedding_matrix.shape[1],
+                "k": args.benchmark_k,
+                "recall_at_k": round(recall, 4)
+            }, indent=2)
 
-    # Create FAISS index
-    print("🔍 Building FAISS index...")
-    dimension = len(embedding_matrix[0])
-    index = faiss.IndexFlatL2(dimension)
-
-    # Add embeddings to index with progress bar
-    print("📥 Adding embeddings to FAISS index...")
-    batch_size = 1000  # Add embeddings in batches
-    for i in tqdm(range(0, len(embedding_matrix), batch_size), desc="Building index", unit="batch"):
-        batch_end = min(i + batch_size, len(embedding_matrix))
-        index.add(embedding_matrix[i:batch_end])
-
-    faiss.write_index(index, config.faiss_index_path)
+    print("💾 Saving index and metadata...")
+    entity_index = save_index_outputs(index, faiss_metadata)
     print("✅ FAISS index saved as " + config.faiss_index_path)
+    print("✅ Metadata saved as " + config.faiss_metadata_path)
+    print(f"✅ Entity index ({len(entity_index['postings'])} entities) saved as {config.entity_index_path}")
 
-    # Save metadata and track per-document token usage
-    print("💾 Preparing metadata...")
-    faiss_metadata = []
-    embedding_index = 0
-    token_log_by_doc = {}
-
-    with tqdm(chunks, desc="Processing metadata", unit="chunk") as pbar:
-        for chunk in pbar:
-            text = chunk["text"]
-            source_file = chunk["metadata"].get("source_file", "unknown")
-            token_log_by_doc.setdefault(source_file, 0)
-
-            if count_tokens(text) > MAX_TOKENS_PER_CHUNK - SAFETY_MARGIN:
-                sub_chunks = split_into_chunks(text, MAX_TOKENS_PER_CHUNK)
-            else:
-                sub_chunks = [text]
-
-            for sub_chunk in sub_chunks:
-                if not isinstance(sub_chunk, str) or not sub_chunk.strip():
-                    continue
-                if count_tokens(sub_chunk) > MAX_TOKENS_PER_CHUNK - SAFETY_MARGIN:
-                    encoded = encoding.encode(sub_chunk)
-                    sub_chunk = encoding.decode(encoded[:MAX_TOKENS_PER_CHUNK - SAFETY_MARGIN])
-                token_log_by_doc[source_file] += count_tokens(sub_chunk)
-                faiss_metadata.append({
-                    "text": sub_chunk,
-                    "section_header": chunk["section_header"],
-                    "metadata": chunk["metadata"]
-                })
-                embedding_index += 1
-            
-            pbar.set_postfix({'embeddings': embedding_index})
-
-    # Save metadata
-    with open(os.path.join(output_folder, "faiss_metadata.json"), "w") as f:
-        json.dump(faiss_metadata, f, indent=2)
-    print("✅ Metadata saved as " + os.path.join(output_folder, "faiss_metadata.json"))
+    facts = refresh_facts(faiss_metadata)
+    print(f"✅ Facts table ({facts['facts']} facts) saved as {config.fact_store_path}")
 
     # Print token usage per document
     print("\n📄 Token usage by document:")
-    doc_costs = {}
-    for doc, tokens in token_log_by_doc.items():
-        cost = tokens / 1000 * 0.0001
-        doc_costs[doc] = {"tokens": tokens, "cost": round(cost, 4)}
-        print(f"- {doc}: {tokens} tokens ≈ ${cost:.4f}")
-
-    # Save cost summary
-    with open(os.path.join(output_folder, "embedding_cost_summary.json"), "w") as f:
-        json.dump({
-            "total_tokens": total_tokens,
-            "estimated_total_cost": round(total_tokens / 1000 * 0.0001, 4),
-            "per_document": doc_costs
-        }, f, indent=2)
+    for doc, cost in save_cost_summary(faiss_metadata, output_folder).items():
+        print(f"- {doc}: {cost['tokens']} tokens ≈ ${cost['cost']:.4f}")
     print("💾 Cost summary saved as " + os.path.join(output_folder, "embedding_cost_summary.json"))
-    print("\n🎉 RAG embedding pipeline completed successfully!")
\ No newline at end of file
+
+    # Precompute reports for new or changed documents so report reads need no LLM call
+    if config.summarizer_precompute_reports and not args.skip_reports:
+        print("\n📝 Refreshing precomputed reports...")
+        reports = refresh_stored_reports(faiss_metadata, index)
+        if reports["missing"]:
+            print(f"⚠️ {len(reports['missing'])} documents have no report yet; they are retried on the next build")
+
+    print("\n🎉 RAG embedding pipeline completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
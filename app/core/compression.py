@@ -0,0 +1,90 @@
+"""
+compression.py
+
+Helpers for regulation XML stored plain (.xml) or compressed (.xml.gz,
+.xml.zst). Reads decompress as a stream straight into the parser, so a
+compressed corpus costs less disk and I/O without holding whole documents
+in memory.
+"""
+import gzip
+import shutil
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression name -> stored file suffix
+XML_SUFFIXES = {"none": ".xml", "gzip": ".xml.gz", "zstd": ".xml.zst"}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+COPY_BLOCK_SIZE = 1 << 20
+
+# Errors raised by a truncated or corrupt compressed stream
+CORRUPT_STREAM_ERRORS = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+PathLike = Union[str, Path]
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed; install it to read or write .xml.zst files")
+
+
+def xml_suffix(path: PathLike) -> Optional[str]:
+    """Return the XML suffix of a path (".xml", ".xml.gz" or ".xml.zst"), or None."""
+    name = Path(path).name.lower()
+    for suffix in (".xml.zst", ".xml.gz", ".xml"):
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+def is_xml_file(path: PathLike) -> bool:
+    """True for plain or compressed XML files."""
+    return xml_suffix(path) is not None
+
+
+def canonical_xml_name(path: PathLike) -> str:
+    """File name without its compression suffix (e.g. rule.xml.zst -> rule.xml)."""
+    name = Path(path).name
+    suffix = xml_suffix(name)
+    return name[:-len(suffix)] + ".xml" if suffix else name
+
+
+def open_xml(path: PathLike) -> BinaryIO:
+    """Open a plain or compressed XML file for streaming binary reads."""
+    name = str(path).lower()
+    if name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if name.endswith(".zst"):
+        _require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def compress_file(source: PathLike, destination: PathLike, compression: str) -> None:
+    """
+    Stream a plain or compressed XML file into `destination`, stored as `compression`.
+
+    Args:
+        source: File to read (.xml, .xml.gz or .xml.zst, decompressed on the fly)
+        destination: File to write (replaced if present)
+        compression: "none", "gzip" or "zstd"
+    """
+    with open_xml(source) as src, open(destination, "wb") as dst:
+        if compression == "none":
+            shutil.copyfileobj(src, dst, COPY_BLOCK_SIZE)
+        elif compression == "gzip":
+            # Fixed header (no name or mtime), so equal input gives equal output
+            with gzip.GzipFile(filename="", mode="wb", compresslevel=GZIP_LEVEL, fileobj=dst, mtime=0) as out:
+                shutil.copyfileobj(src, out, COPY_BLOCK_SIZE)
+        elif compression == "zstd":
+            _require_zstandard()
+            zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst, read_size=COPY_BLOCK_SIZE)
+        else:
+            raise ValueError(f"Unknown compression: {compression}")
@@ -1,21 +1,55 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
 import logging
-import time
-import random
+import os
 import requests
+import shlex
+import subprocess
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Iterable, Optional, Tuple
 
 import json
 from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Constants
-BASE_URL = "https://www.federalregister.gov/api/v1"
+from ..compression import CORRUPT_STREAM_ERRORS, XML_SUFFIXES, canonical_xml_name, compress_file, open_xml
+from ..rate_limit import TokenBucket
+from .manifest import DownloadManifest, INVALID, file_sha256
+
+# Constants (FEDERAL_REGISTER_URL points the fetcher at a mirror or local stub server)
+SITE_URL = os.getenv("FEDERAL_REGISTER_URL", "https://www.federalregister.gov").rstrip("/")
+BASE_URL = f"{SITE_URL}/api/v1"
 SEARCH_URL = f"{BASE_URL}/documents.json"
 DOCUMENT_URL = f"{BASE_URL}/documents/{{}}.json"
+XML_URL = f"{SITE_URL}/documents/full_text/xml/{{year}}/{{month}}/{{day}}/{{doc_number}}.xml"
+
+# Connection pool and pacing
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_SECOND = 4.0
+HTTP_RETRIES = 5
+REQUEST_TIMEOUT = (10, 60)  # (connect, read) seconds
+
+# Streaming downloads
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+RANGE_RESUMES = 3
+PART_SUFFIX = ".part"
+
+# Watch mode: seconds between incremental sync passes
+DEFAULT_WATCH_INTERVAL = 600
+
+# Sync passes a document may fail before the cursor moves past it
+DEFAULT_MAX_SYNC_FAILURES = 5
+
+# Shared by every request; see configure()
+_session: Optional[requests.Session] = None
+_limiter: Optional[TokenBucket] = None
 
 def setup_logging(verbose: bool = False) -> logging.Logger:
     """Setup logging configuration."""
@@ -27,6 +61,51 @@ def setup_logging(verbose: bool = False) -> logging.Logger:
     )
     return logging.getLogger(__name__)
 
+def create_session(pool_size: int = DEFAULT_WORKERS, retries: int = HTTP_RETRIES) -> requests.Session:
+    """Create a keep-alive session that retries transient HTTP failures.
+    
+    Args:
+        pool_size (int): Connections kept open per host (one per worker)
+        retries (int): Retries for connection errors, 429 and 5xx responses
+        
+    Returns:
+        requests.Session: Session with a pooled, retrying adapter mounted
+        
+    Retries back off exponentially and honour the server's Retry-After header.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=1,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = "RegHealth-Navigator fetcher"
+    return session
+
+def configure(workers: int = DEFAULT_WORKERS, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND) -> None:
+    """Set up the shared session and rate limiter used by every request.
+    
+    Args:
+        workers (int): Number of concurrent downloads the session must serve
+        requests_per_second (float): Sustained request rate across all workers
+    """
+    global _session, _limiter
+    _session = create_session(pool_size=workers)
+    _limiter = TokenBucket(requests_per_second, max(1.0, requests_per_second))
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """GET a URL through the shared session, waiting for a rate-limit token first."""
+    if _session is None:
+        configure()
+    _limiter.acquire()
+    return _session.get(url, timeout=REQUEST_TIMEOUT, **kwargs)
+
 def get_single_document(doc_number: str) -> Optional[Dict]:
     """Fetch a single document by its document number.
     
@@ -49,18 +128,19 @@ def get_single_document(doc_number: str) -> Optional[Dict]:
     """
     url = DOCUMENT_URL.format(doc_number)
     try:
-        response = requests.get(url)
+        response = http_get(url)
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
         logging.error(f"Error fetching document {doc_number}: {str(e)}")
         return None
 
-def get_latest_documents(days: int = 365) -> List[Dict]:
+def get_latest_documents(days: int = 365, workers: int = DEFAULT_WORKERS) -> List[Dict]:
     """Fetch latest documents from Federal Register.
     
     Args:
         days (int): Number of days to look back (default: 365)
+        workers (int): Number of search pages fetched concurrently
         
     Returns:
         List[Dict]: List of document data
@@ -92,41 +172,82 @@ def get_latest_documents(days: int = 365) -> List[Dict]:
             "next_page_url": null
         }
     """
-    all_docs = []
-    page = 1
-    
-    while True:
-        params = {
-            "conditions[publication_date][gte]": (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d"),
-            "conditions[type][]": ["RULE", "PRORULE"],
-            "conditions[agencies][]": "centers-for-medicare-medicaid-services",
-            "per_page": 100,
-            "page": page
-        }
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    return get_documents_since(since, workers=workers)
+
+def get_documents_since(since: str, workers: int = DEFAULT_WORKERS, strict: bool = False) -> List[Dict]:
+    """Fetch CMS rules and proposed rules published on or after a date.
+    
+    Args:
+        since (str): Earliest publication date, YYYY-MM-DD
+        workers (int): Number of search pages fetched concurrently
+        strict (bool): Raise if any search page fails (see search_documents)
+        
+    Returns:
+        List[Dict]: List of document data (see get_latest_documents)
+    """
+    params = {
+        "conditions[publication_date][gte]": since,
+        "conditions[type][]": ["RULE", "PRORULE"],
+        "conditions[agencies][]": "centers-for-medicare-medicaid-services",
+        "per_page": 100
+    }
+    return search_documents(params, workers=workers, strict=strict)
+
+def search_documents(params: Dict, workers: int = DEFAULT_WORKERS, strict: bool = False) -> List[Dict]:
+    """Fetch every page of a document search.
+    
+    The first page reports `total_pages`; the remaining pages are then
+    fetched concurrently (paced by the shared rate limiter) and returned in
+    page order.
+    
+    Args:
+        params (Dict): Search query parameters, without `page`
+        workers (int): Number of pages fetched concurrently
+        strict (bool): Raise instead of returning a partial listing when a page fails
+        
+    Returns:
+        List[Dict]: Results of all pages fetched successfully
         
+    Raises:
+        requests.RequestException: With `strict`, if any page could not be fetched
+    """
+    failed_pages = []
+    
+    def fetch_page(page: int) -> Dict:
         try:
-            response = requests.get(SEARCH_URL, params=params)
+            response = http_get(SEARCH_URL, params={**params, "page": page})
             response.raise_for_status()
-            data = response.json()
-            
-            if not data.get("results"):
-                break
-                
-            all_docs.extend(data["results"])
-            page += 1
-            
-            # Add delay between pages
-            time.sleep(random.uniform(1, 2))
-            
+            return response.json()
         except requests.RequestException as e:
             logging.error(f"Error fetching page {page}: {str(e)}")
-            break
-            
+            failed_pages.append(page)
+            return {}
+    
+    data = fetch_page(1)
+    all_docs = list(data.get("results") or [])
+    total_pages = data.get("total_pages")
+    if total_pages is None:
+        # No page count reported: walk pages until one comes back empty
+        page = 2
+        while data.get("results"):
+            data = fetch_page(page)
+            all_docs.extend(data.get("results") or [])
+            page += 1
+    elif total_pages > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for data in pool.map(fetch_page, range(2, total_pages + 1)):
+                all_docs.extend(data.get("results") or [])
+    if failed_pages and strict:
+        raise requests.RequestException(f"Search pages {sorted(failed_pages)} could not be fetched")
     return all_docs
 
 def is_valid_xml(filepath: Path) -> bool:
     """Check if a file is a valid XML file.
     
+    Compressed files (.xml.gz, .xml.zst) are decompressed as a stream
+    straight into the parser.
+    
     Args:
         filepath (Path): Path to the XML file to validate
         
@@ -156,10 +277,10 @@ def is_valid_xml(filepath: Path) -> bool:
         </FRDOC>
     """
     try:
-        with open(filepath, 'rb') as f:
+        with open_xml(filepath) as f:
             etree.parse(f)
         return True
-    except (etree.XMLSyntaxError, IOError):
+    except (etree.XMLSyntaxError,) + CORRUPT_STREAM_ERRORS:
         return False
 
 def detect_program_type(doc: Dict) -> Tuple[bool, str]:
@@ -194,7 +315,7 @@ def detect_program_type(doc: Dict) -> Tuple[bool, str]:
         (True, "MPFS")
     """
     title = doc.get("title", "").lower()
-    print("Detecting program type from title:", title)
+    logging.debug(f"Detecting program type from title: {title}")
     
     # MPFS (Medicare Physician Fee Schedule)
     if any(keyword in title for keyword in ["medicare physician fee schedule","physician fee schedule", "mpfs", "pfs", "physician fee"]):
@@ -210,19 +331,151 @@ def detect_program_type(doc: Dict) -> Tuple[bool, str]:
     
     return False, ""
 
-def download_xml(doc: Dict, save_dir: Path, logger: Optional[logging.Logger] = None) -> bool:
+def stream_download(url: str, part_path: Path, headers: Optional[Dict] = None,
+                    max_resumes: int = RANGE_RESUMES) -> Optional[Tuple[str, Dict]]:
+    """Stream a URL into `part_path`, hashing it as it arrives.
+    
+    Memory use is bounded by the chunk size. If the connection drops
+    mid-body, the download resumes from the bytes already written with a
+    Range request, guarded by If-Range so a changed file starts over.
+    
+    Args:
+        url (str): URL to download
+        part_path (Path): Temp file receiving the body (any stale content is replaced)
+        headers (Optional[Dict]): Extra request headers, e.g. conditional-GET validators
+        max_resumes (int): Resumed requests allowed after dropped connections
+        
+    Returns:
+        Optional[Tuple[str, Dict]]: None if the server answered 304 Not Modified,
+            else (sha256 hex digest, {"etag", "last_modified"} of the response)
+            
+    Raises:
+        requests.RequestException: On HTTP errors, or once resumes are exhausted
+    """
+    digest = hashlib.sha256()
+    offset = 0
+    validators = {}
+    resumes = 0
+    try:
+        with open(part_path, "wb") as f:
+            while True:
+                request_headers = dict(headers or {})
+                if offset:
+                    request_headers = {"Range": f"bytes={offset}-"}
+                    if validators.get("etag") or validators.get("last_modified"):
+                        request_headers["If-Range"] = validators.get("etag") or validators["last_modified"]
+                try:
+                    with http_get(url, headers=request_headers, stream=True) as response:
+                        if response.status_code == 304 and not offset:
+                            # Read the empty body so the connection goes back to the pool
+                            response.content
+                            validators = None
+                            break
+                        response.raise_for_status()
+                        if not offset:
+                            validators = {"etag": response.headers.get("ETag"),
+                                          "last_modified": response.headers.get("Last-Modified")}
+                        elif (response.status_code != 206 or
+                              not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-")):
+                            # Range ignored or the file changed: take the full body from the start
+                            f.seek(0)
+                            f.truncate()
+                            digest = hashlib.sha256()
+                            offset = 0
+                        for block in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            f.write(block)
+                            digest.update(block)
+                            offset += len(block)
+                    break
+                except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError) as e:
+                    if resumes >= max_resumes:
+                        raise
+                    resumes += 1
+                    logging.warning(f"Connection dropped after {offset} bytes of {url}, resuming ({e.__class__.__name__})")
+    except Exception:
+        part_path.unlink(missing_ok=True)
+        raise
+    
+    if validators is None:
+        part_path.unlink(missing_ok=True)
+        return None
+    return digest.hexdigest(), validators
+
+def adopt_existing_file(manifest: DownloadManifest, doc_number: str, filepath: Path) -> bool:
+    """Record a file the manifest doesn't vouch for (older corpus, or touched since).
+    
+    A file whose hash still matches its entry keeps its HTTP validators;
+    anything else is fully validated once.
+    
+    Returns:
+        bool: True if the file is valid and now recorded as current
+    """
+    entry = manifest.get(doc_number)
+    sha256 = file_sha256(filepath)
+    if entry and entry["status"] != INVALID and entry["sha256"] == sha256:
+        manifest.record(doc_number, filepath, sha256, etag=entry["etag"], last_modified=entry["last_modified"])
+        return True
+    if not is_valid_xml(filepath):
+        manifest.record(doc_number, filepath, sha256, status=INVALID)
+        return False
+    manifest.record(doc_number, filepath, sha256)
+    return True
+
+def convert_existing_copy(manifest: Optional[DownloadManifest], doc_number: str, filepath: Path,
+                          compression: str) -> bool:
+    """Store a valid local copy kept under another compression as `filepath`.
+    
+    Switching --compress re-encodes the corpus on disk instead of downloading
+    it again; the copy's HTTP validators carry over, since it's the same
+    document.
+    
+    Returns:
+        bool: True if `filepath` now holds the document and is recorded as current
+    """
+    stem = canonical_xml_name(filepath)[:-len(".xml")]
+    for suffix in XML_SUFFIXES.values():
+        other = filepath.with_name(stem + suffix)
+        if other == filepath or not other.exists():
+            continue
+        if manifest is None:
+            valid = is_valid_xml(other)
+        else:
+            valid = manifest.is_current(doc_number, other) or adopt_existing_file(manifest, doc_number, other)
+        if not valid:
+            continue
+        part_path = filepath.with_name(filepath.name + PART_SUFFIX)
+        try:
+            compress_file(other, part_path, compression)
+        except CORRUPT_STREAM_ERRORS:
+            part_path.unlink(missing_ok=True)
+            continue
+        os.replace(part_path, filepath)
+        other.unlink()
+        if manifest is not None:
+            entry = manifest.get(doc_number)
+            manifest.record(doc_number, filepath, file_sha256(filepath),
+                            etag=entry["etag"], last_modified=entry["last_modified"])
+        return True
+    return False
+
+def download_xml(doc: Dict, save_dir: Path, logger: Optional[logging.Logger] = None,
+                 manifest: Optional[DownloadManifest] = None, recheck: bool = False,
+                 compression: str = "none") -> bool:
     """Download XML file for a document.
     
     Args:
         doc (Dict): Document data containing metadata
         save_dir (Path): Directory to save the XML file
         logger (Optional[logging.Logger]): Logger instance for logging
+        manifest (Optional[DownloadManifest]): Manifest deciding skips and recording downloads
+        recheck (bool): Ask the server whether recorded files changed (conditional GET)
+        compression (str): Store the file as "none" (.xml), "gzip" (.xml.gz) or "zstd" (.xml.zst)
         
     Returns:
         bool: True if download successful, False otherwise
         
     File Naming Convention:
-        YYYY_PROGRAM_TYPE_DOC_TYPE_DOC_NUMBER.xml
+        YYYY_PROGRAM_TYPE_DOC_TYPE_DOC_NUMBER.xml (or .xml.gz / .xml.zst)
         
     Example:
         >>> doc = {
@@ -234,6 +487,23 @@ def download_xml(doc: Dict, save_dir: Path, logger: Optional[logging.Logger] = N
         >>> download_xml(doc, Path("data"))
         True  # Creates data/MPFS/2024_MPFS_final_2024-06431.xml
     """
+    return fetch_xml(doc, save_dir, logger=logger, manifest=manifest, recheck=recheck,
+                     compression=compression) != "failed"
+
+def fetch_xml(doc: Dict, save_dir: Path, logger: Optional[logging.Logger] = None,
+              manifest: Optional[DownloadManifest] = None, recheck: bool = False,
+              compression: str = "none") -> str:
+    """Make sure a document's XML file is present and current (see download_xml).
+    
+    With a manifest, a recorded file is skipped on a stat call alone; with
+    `recheck`, the server is asked with If-None-Match / If-Modified-Since
+    and only changed files are downloaded again. A compressed file is
+    downloaded and validated plain, then compressed before it is published.
+    
+    Returns:
+        str: "existing" (skipped), "unchanged" (server answered 304),
+            "downloaded" or "failed"
+    """
     if logger is None:
         logger = logging.getLogger(__name__)
     
@@ -244,13 +514,13 @@ def download_xml(doc: Dict, save_dir: Path, logger: Optional[logging.Logger] = N
         
         if not all([doc_number, publication_date, doc_type]):
             logger.error(f"Missing required document information: {doc}")
-            return False
+            return "failed"
         
         # Get program type
         has_program, program_type = detect_program_type(doc)
         if not has_program:
             logger.error(f"Could not detect program type for document {doc_number}")
-            return False
+            return "failed"
         
         # Create program type directory
         program_dir = save_dir #/ program_type
@@ -261,35 +531,243 @@ def download_xml(doc: Dict, save_dir: Path, logger: Optional[logging.Logger] = N
         month = publication_date.split("-")[1]
         date = publication_date.split("-")[2]
         doc_type_suffix = "final" if doc_type == "Rule" else "proposed"
-        filename = f"{year}_{program_type}_{doc_type_suffix}_{doc_number}.xml"
-        filepath = program_dir / filename
+        stem = f"{year}_{program_type}_{doc_type_suffix}_{doc_number}"
+        filepath = program_dir / (stem + XML_SUFFIXES[compression])
         
         # Check if file already exists and is valid
-        if filepath.exists() and is_valid_xml(filepath):
+        if manifest is None:
+            current = filepath.exists() and is_valid_xml(filepath)
+        else:
+            current = manifest.is_current(doc_number, filepath) or (
+                filepath.exists() and adopt_existing_file(manifest, doc_number, filepath)
+            )
+        if not current and not filepath.exists():
+            current = convert_existing_copy(manifest, doc_number, filepath, compression)
+            if current:
+                logger.info(f"Re-encoded local copy as {filepath}")
+        if current and not recheck:
             logger.info(f"Already exists and valid: {filepath}")
-            return True
+            return "existing"
         
-        # Download XML
-        xml_url = f"https://www.federalregister.gov/documents/full_text/xml/{year}/{month}/{date}/{doc_number}.xml"
-        response = requests.get(xml_url)
-        response.raise_for_status()
+        # Re-checks only transfer the file if the server's copy changed
+        headers = {}
+        entry = manifest.get(doc_number) if manifest is not None and current else None
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
         
-        # Save file
-        with open(filepath, "wb") as f:
-            f.write(response.content)
+        # Download XML into a temp file next to the target
+        xml_url = XML_URL.format(year=year, month=month, day=date, doc_number=doc_number)
+        part_path = program_dir / (stem + ".xml" + PART_SUFFIX)
+        result = stream_download(xml_url, part_path, headers=headers)
+        if result is None:
+            manifest.mark_checked(doc_number)
+            logger.info(f"Unchanged on server: {filepath}")
+            return "unchanged"
+        sha256, validators = result
         
-        # Verify file
-        if not is_valid_xml(filepath):
+        # Verify file, then publish it under its final name in one rename
+        if not is_valid_xml(part_path):
             logger.error(f"Downloaded file is not valid XML: {filepath}")
-            filepath.unlink()
-            return False
+            part_path.unlink()
+            return "failed"
+        if compression != "none":
+            compressed_part = filepath.with_name(filepath.name + PART_SUFFIX)
+            try:
+                compress_file(part_path, compressed_part, compression)
+            finally:
+                part_path.unlink()
+            sha256 = file_sha256(compressed_part)
+            part_path = compressed_part
+        os.replace(part_path, filepath)
+        # Drop the copy stored under another compression, if any
+        for suffix in XML_SUFFIXES.values():
+            if program_dir / (stem + suffix) != filepath:
+                (program_dir / (stem + suffix)).unlink(missing_ok=True)
+        if manifest is not None:
+            manifest.record(doc_number, filepath, sha256, **validators)
         
         logger.info(f"✅ Successfully downloaded: {filepath}")
-        return True
+        return "downloaded"
         
     except Exception as e:
         logger.error(f"Error downloading document {doc.get('document_number', '')}: {str(e)}")
-        return False
+        return "failed"
+
+def process_document(doc: Dict, save_dir: Path, logger: logging.Logger,
+                     manifest: Optional[DownloadManifest] = None, recheck: bool = False,
+                     compression: str = "none") -> str:
+    """Filter, classify and download one search result.
+    
+    Args:
+        doc (Dict): Document data from the search API
+        save_dir (Path): Root output directory (files go in save_dir/PROGRAM/)
+        logger (logging.Logger): Logger instance for logging
+        manifest (Optional[DownloadManifest]): Manifest deciding skips and recording downloads
+        recheck (bool): Ask the server whether recorded files changed
+        compression (str): Storage compression, "none", "gzip" or "zstd"
+        
+    Returns:
+        str: Outcome, one of "skipped", "unsupported", "unrecognized",
+            "existing", "unchanged", "downloaded" or "failed"
+    """
+    doc_number = doc.get("document_number", "")
+    doc_type = doc.get("type", "")
+    title = doc.get("title", "")
+    
+    # Skip correction documents
+    if doc_number.startswith("C"):
+        logger.info(f"Skip {doc_number}: Correction document ({doc_number})")
+        return "skipped"
+    
+    # Skip future-dated documents
+    publication_date = doc.get("publication_date", "")
+    if publication_date and datetime.strptime(publication_date, "%Y-%m-%d") > datetime.now():
+        logger.info(f"Skip {doc_number}: Future-dated document ({publication_date})")
+        return "skipped"
+    
+    # Skip non-rule documents
+    if doc_type not in ["Rule", "Proposed Rule"]:
+        logger.info(f"Skip {doc_number}: Unsupported document type ({doc_type})")
+        return "unsupported"
+    
+    # Detect program type
+    has_program, program_type = detect_program_type(doc)
+    logger.debug(f"{doc_number}: Detected program type: {program_type or 'none'}")
+    if not has_program:
+        logger.info(f"Unrecognized program type: {title}")
+        logger.info(f"{doc_number}: Unrecognized program type: {title}")
+        return "unrecognized"
+    
+    # Create program type directory
+    program_dir = save_dir / program_type
+    program_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Skip (or re-check) files already present, otherwise download
+    return fetch_xml(doc, program_dir, logger=logger, manifest=manifest, recheck=recheck,
+                     compression=compression)
+
+def advance_cursor(cursor: Optional[Dict], docs: List[Dict], outcomes: List[str],
+                   given_up: Iterable[str] = ()) -> Optional[Dict]:
+    """Compute the sync cursor after processing `docs`.
+    
+    The cursor moves to the latest publication date seen and remembers the
+    documents handled on that date, since more can still be published on it.
+    A failed document holds the cursor at its date so the next pass lists it
+    again (documents after it are then skipped through the manifest), unless
+    it has been given up on.
+    
+    Args:
+        cursor (Optional[Dict]): Current cursor, None before the first sync
+        docs (List[Dict]): Documents listed since the cursor, minus those it already holds
+        outcomes (List[str]): process_document outcome of each document
+        given_up (Iterable[str]): Numbers of failed documents the cursor may pass
+        
+    Returns:
+        Optional[Dict]: {"publication_date", "document_numbers"}, or the
+            unchanged cursor if nothing was listed
+    """
+    if not docs:
+        return cursor
+    given_up = set(given_up)
+    pinned = [outcome == "failed" and doc["document_number"] not in given_up for doc, outcome in zip(docs, outcomes)]
+    failed_dates = [doc["publication_date"] for doc, pin in zip(docs, pinned) if pin]
+    date = min(failed_dates) if failed_dates else max(doc["publication_date"] for doc in docs)
+    handled = {doc["document_number"] for doc, pin in zip(docs, pinned)
+               if doc["publication_date"] == date and not pin}
+    if cursor and cursor["publication_date"] == date:
+        handled.update(cursor["document_numbers"])
+    return {"publication_date": date, "document_numbers": sorted(handled)}
+
+def sync_documents(save_dir: Path, manifest: DownloadManifest, logger: logging.Logger,
+                   days: int = 365, workers: int = DEFAULT_WORKERS, recheck: bool = False,
+                   compression: str = "none", max_failures: int = DEFAULT_MAX_SYNC_FAILURES) -> Counter:
+    """Run one incremental sync pass from the manifest's cursor.
+    
+    Only documents published on or after the cursor date are listed (the
+    first pass looks back `days`). Every newly downloaded file is queued as a
+    sync event in the manifest for the chunk and embed stages. If any search
+    page fails the pass stops before downloading, leaving the cursor where it
+    was, since the missing page's documents would otherwise be passed by.
+    Failed passes are counted per document in the manifest; once a document
+    has failed `max_failures` of them it is logged and the cursor moves past it.
+    
+    Args:
+        save_dir (Path): Root output directory
+        manifest (DownloadManifest): Manifest holding the cursor and events
+        logger (logging.Logger): Logger instance for logging
+        days (int): Look-back of the first pass, before a cursor exists
+        workers (int): Number of concurrent downloads
+        recheck (bool): Ask the server whether recorded files changed
+        compression (str): Storage compression, "none", "gzip" or "zstd"
+        max_failures (int): Failed passes after which a document is skipped
+        
+    Returns:
+        Counter: Number of documents per process_document outcome
+        
+    Raises:
+        requests.RequestException: If the listing could not be fetched completely
+    """
+    cursor = manifest.get_cursor()
+    if cursor:
+        since = cursor["publication_date"]
+        handled = set(cursor["document_numbers"])
+    else:
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        handled = set()
+    
+    # Future-dated documents are left for a later pass rather than passed by the cursor
+    today = datetime.now().strftime("%Y-%m-%d")
+    docs = [doc for doc in get_documents_since(since, workers=workers, strict=True)
+            if doc.get("document_number") not in handled and doc.get("publication_date", "") <= today]
+    logger.info(f"Sync from {since}: {len(docs)} new documents")
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(
+            lambda doc: process_document(doc, save_dir, logger, manifest=manifest, recheck=recheck,
+                                         compression=compression),
+            docs
+        ))
+    given_up = []
+    for doc, outcome in zip(docs, outcomes):
+        if outcome == "downloaded":
+            manifest.add_event(doc["document_number"])
+        if outcome == "failed":
+            failures = manifest.record_failure(doc["document_number"])
+            if failures >= max_failures:
+                logger.warning(f"Skipping {doc['document_number']} ({doc['publication_date']}) after "
+                               f"{failures} failed sync passes; the cursor moves past it")
+                given_up.append(doc["document_number"])
+    manifest.clear_failures(doc["document_number"] for doc, outcome in zip(docs, outcomes) if outcome != "failed")
+    
+    # An empty first pass still pins the cursor to where it started looking
+    manifest.set_cursor(advance_cursor(cursor, docs, outcomes, given_up)
+                        or {"publication_date": since, "document_numbers": []})
+    return Counter(outcomes)
+
+def run_new_document_hook(command: str, manifest: DownloadManifest, logger: logging.Logger) -> None:
+    """Run a command on the files of pending sync events.
+    
+    `{files}` in the command is replaced with the shell-quoted file paths.
+    The events are marked consumed only if the command succeeds, so a failed
+    rebuild is retried after the next pass.
+    
+    Args:
+        command (str): Shell command, e.g. a chunk + incremental index build
+        manifest (DownloadManifest): Manifest holding the events
+        logger (logging.Logger): Logger instance for logging
+    """
+    events = manifest.pending_events()
+    if not events:
+        return
+    files = " ".join(shlex.quote(event["path"]) for event in events)
+    logger.info(f"Running new-document hook for {len(events)} documents")
+    result = subprocess.run(command.replace("{files}", files), shell=True)
+    if result.returncode == 0:
+        manifest.mark_consumed(event["id"] for event in events)
+    else:
+        logger.error(f"New-document hook exited with status {result.returncode}; events kept pending")
 
 def parse_args():
     """Parse command line arguments.
@@ -298,11 +776,18 @@ def parse_args():
         argparse.Namespace: Parsed command line arguments
         
     Command Line Arguments:
-        --mode: Operation mode (single/latest)
+        --mode: Operation mode (single/latest/sync/watch)
         --doc-number: Document number to download
         --date: Publication date in YYYY-MM-DD format
         --days: Number of days to look back
         --output-dir: Output directory for downloaded files
+        --workers: Number of concurrent downloads
+        --rate: Maximum requests per second to the Federal Register
+        --manifest: Download manifest path (default: OUTPUT_DIR/manifest.sqlite)
+        --recheck: Ask the server whether already-downloaded files changed
+        --interval: Seconds between sync passes in watch mode
+        --on-new: Command run on newly downloaded files after a sync pass
+        --compress: Store files plain, gzip- or zstd-compressed
         --verbose: Enable verbose logging
         
     Example:
@@ -313,20 +798,45 @@ def parse_args():
             date=None,
             days=365,
             output_dir='data',
+            workers=4,
+            rate=4.0,
+            manifest=None,
+            recheck=False,
+            interval=600,
+            on_new=None,
+            compress='none',
             verbose=False
         )
     """
     parser = argparse.ArgumentParser(description='Federal Register document fetcher')
-    parser.add_argument('--mode', choices=['single', 'latest'], default='latest',
-                      help='Operation mode: single (one document) or latest (fetch latest documents)')
+    parser.add_argument('--mode', choices=['single', 'latest', 'sync', 'watch'], default='latest',
+                      help='Operation mode: single (one document), latest (fetch latest documents), '
+                           'sync (one incremental pass from the saved cursor) or watch (sync repeatedly)')
     parser.add_argument('--doc-number', type=str,
                       help='Document number to download (e.g., 2024-06431)')
     parser.add_argument('--date', type=str,
                       help='Publication date in YYYY-MM-DD format')
     parser.add_argument('--days', type=int, default=365,
-                      help='Number of days to look back (for latest mode)')
+                      help='Number of days to look back (for latest mode and the first sync)')
     parser.add_argument('--output-dir', type=str, default='data',
                       help='Output directory for downloaded files')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                      help='Number of concurrent downloads')
+    parser.add_argument('--rate', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                      help='Maximum requests per second to the Federal Register')
+    parser.add_argument('--manifest', type=str,
+                      help='Download manifest path (default: OUTPUT_DIR/manifest.sqlite)')
+    parser.add_argument('--recheck', action='store_true',
+                      help='Re-check downloaded files with conditional GETs instead of skipping them')
+    parser.add_argument('--interval', type=int, default=DEFAULT_WATCH_INTERVAL,
+                      help='Seconds between sync passes (for watch mode)')
+    parser.add_argument('--max-failures', type=int, default=DEFAULT_MAX_SYNC_FAILURES,
+                      help='Sync passes a document may fail before the cursor moves past it')
+    parser.add_argument('--on-new', type=str,
+                      help='Shell command run after a sync pass that downloaded files; {files} is '
+                           'replaced with their paths')
+    parser.add_argument('--compress', choices=list(XML_SUFFIXES), default='none',
+                      help='Store XML files plain (.xml), gzip (.xml.gz) or zstd (.xml.zst) compressed')
     parser.add_argument('--verbose', '-v', action='store_true',
                       help='Enable verbose logging')
     return parser.parse_args()
@@ -342,15 +852,27 @@ def main():
     5. Downloads XML files
     6. Generates summary report
     
-    Command Line Usage:
+    Command Line Usage (from the app/ directory):
         # Fetch latest documents
-        python fetch_regulations.py --mode latest --days 30
+        python -m core.data_fetcher.fetch_regulations --mode latest --days 30
         
         # Download single document
-        python fetch_regulations.py --mode single --doc-number 2024-06431
+        python -m core.data_fetcher.fetch_regulations --mode single --doc-number 2024-06431
         
         # Enable verbose logging
-        python fetch_regulations.py --mode latest --verbose
+        python -m core.data_fetcher.fetch_regulations --mode latest --verbose
+        
+        # Eight concurrent downloads, at most 8 requests per second
+        python -m core.data_fetcher.fetch_regulations --mode latest --workers 8 --rate 8
+        
+        # Ask the server which downloaded files changed (conditional GETs)
+        python -m core.data_fetcher.fetch_regulations --mode latest --recheck
+        
+        # Store the corpus zstd-compressed (.xml.zst)
+        python -m core.data_fetcher.fetch_regulations --mode latest --compress zstd
+        
+        # Poll every 10 minutes for documents newer than the saved cursor
+        python -m core.data_fetcher.fetch_regulations --mode watch --interval 600
         
     Output:
         Creates a directory structure:
@@ -375,10 +897,17 @@ def main():
     save_dir = Path(args.output_dir)
     save_dir.mkdir(parents=True, exist_ok=True)
     
+    # One pooled session and rate limiter for all requests
+    configure(workers=args.workers, requests_per_second=args.rate)
+    
+    # Skip decisions come from the manifest instead of re-parsing every file
+    manifest = DownloadManifest(args.manifest or str(save_dir / "manifest.sqlite"))
+    
     # Initialize counters
     total_docs = 0
     downloaded = 0
     already_existed = 0
+    unchanged = 0
     unrecognized = 0
     unsupported = 0
     failed = 0
@@ -398,7 +927,8 @@ def main():
                     program_dir = save_dir / program_type
                     program_dir.mkdir(parents=True, exist_ok=True)
                     print("Program Directory:", program_dir)
-                    success = download_xml(doc, program_dir, logger=logger)
+                    success = download_xml(doc, program_dir, logger=logger, manifest=manifest,
+                                           recheck=args.recheck, compression=args.compress)
                     if success:
                         downloaded += 1
                     else:
@@ -407,84 +937,67 @@ def main():
                     unrecognized += 1
             else:
                 failed += 1
+        elif args.mode in ("sync", "watch"):
+            # Incremental passes from the cursor saved in the manifest
+            outcomes = Counter()
+            while True:
+                try:
+                    outcomes += sync_documents(save_dir, manifest, logger, days=args.days,
+                                               workers=args.workers, recheck=args.recheck,
+                                               compression=args.compress, max_failures=args.max_failures)
+                except requests.RequestException as e:
+                    # The cursor stays put, so the next pass lists the same documents again
+                    logger.error(f"Sync pass incomplete, cursor kept: {str(e)}")
+                    if args.mode == "sync":
+                        raise
+                if args.on_new:
+                    run_new_document_hook(args.on_new, manifest, logger)
+                if args.mode == "sync":
+                    break
+                try:
+                    time.sleep(args.interval)
+                except KeyboardInterrupt:
+                    break
+            total_docs = sum(outcomes.values())
+            downloaded = outcomes["downloaded"]
+            already_existed = outcomes["existing"]
+            unchanged = outcomes["unchanged"]
+            unrecognized = outcomes["unrecognized"]
+            unsupported = outcomes["unsupported"]
+            failed = outcomes["failed"]
         else:
             # Fetch latest documents
             logger.info(f"Fetching latest documents from the past {args.days} days...")
-            docs = get_latest_documents(args.days)
+            docs = get_latest_documents(args.days, workers=args.workers)
             total_docs = len(docs)
             logger.info(f"Found {total_docs} documents")
             
-            # Process each document
-            for doc in docs:
-                doc_number = doc.get("document_number", "")
-                doc_type = doc.get("type", "")
-                title = doc.get("title", "")
-                
-                # Skip correction documents
-                if doc_number.startswith("C"):
-                    logger.info(f"Skip {doc_number}: Correction document ({doc_number})")
-                    continue
-                
-                # Skip future-dated documents
-                publication_date = doc.get("publication_date", "")
-                if publication_date and datetime.strptime(publication_date, "%Y-%m-%d") > datetime.now():
-                    logger.info(f"Skip {doc_number}: Future-dated document ({publication_date})")
-                    continue
-                
-                # Skip non-rule documents
-                if doc_type not in ["Rule", "Proposed Rule"]:
-                    logger.info(f"Skip {doc_number}: Unsupported document type ({doc_type})")
-                    unsupported += 1
-                    continue
-                
-                # Detect program type
-                has_program, program_type = detect_program_type(doc)
-                print("Detected program type:", program_type)
-                print("Has program type:", has_program)
-                if not has_program:
-                    logger.info(f"Unrecognized program type: {title}")
-                    logger.info(f"{doc_number}: Unrecognized program type: {title}")
-                    unrecognized += 1
-                    continue
-                
-                # Create program type directory
-                program_dir = save_dir / program_type
-                program_dir.mkdir(parents=True, exist_ok=True)
-                
-                # Check if file already exists and is valid
-                year = publication_date.split("-")[0]
-                #month = publication_date.split("-")[1]
-                #date = publication_date.split("-")[2]
-                doc_type_suffix = "final" if doc_type == "Rule" else "proposed"
-                filename = f"{year}_{program_type}_{doc_type_suffix}_{doc_number}.xml"
-                filepath = program_dir / filename
-                
-                if filepath.exists() and is_valid_xml(filepath):
-                    logger.info(f"Already exists and valid: {filepath}")
-                    logger.info(f"{doc_number}: Already exists and valid: {filepath}")
-                    already_existed += 1
-                    continue
-                
-                # Download document
-                logger.info(f"{doc_number}: Need to download: {doc_number}")
-                success = download_xml(doc, program_dir, logger=logger)
-                if success:
-                    downloaded += 1
-                else:
-                    failed += 1
-                
-                # Add delay between downloads
-                time.sleep(random.uniform(2, 5))
+            # Download concurrently; the shared rate limiter paces the requests
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                outcomes = Counter(pool.map(
+                    lambda doc: process_document(doc, save_dir, logger, manifest=manifest, recheck=args.recheck,
+                                                 compression=args.compress),
+                    docs
+                ))
+            downloaded = outcomes["downloaded"]
+            already_existed = outcomes["existing"]
+            unchanged = outcomes["unchanged"]
+            unrecognized = outcomes["unrecognized"]
+            unsupported = outcomes["unsupported"]
+            failed = outcomes["failed"]
     
     except Exception as e:
         logger.error(f"Error occurred: {str(e)}")
         return
+    finally:
+        manifest.close()
     
     # Print summary
     logger.info("\nDownload Summary:")
     logger.info(f"Total documents: {total_docs}")
     logger.info(f"Successfully downloaded: {downloaded}")
     logger.info(f"Already existed: {already_existed}")
+    logger.info(f"Unchanged on server: {unchanged}")
     logger.info(f"Unrecognized program type: {unrecognized}")
     logger.info(f"Unsupported document type: {unsupported}")
     logger.info(f"Failed: {failed}")
@@ -0,0 +1,179 @@
+"""
+manifest.py
+
+Local record of every downloaded Federal Register XML file (size, mtime,
+sha256, HTTP validators and validation status), so re-runs can decide to skip
+a file from a stat call instead of re-parsing it. It also keeps the
+incremental sync cursor, the number of passes each document has failed, and
+the queue of new-document events consumed by the chunk and embed stages.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..sqlite_store import SQLiteStore
+
+# Validation states
+VALID = "valid"
+INVALID = "invalid"
+
+MANIFEST_COLUMNS = ("document_number", "path", "size", "mtime_ns", "sha256", "etag",
+                    "last_modified", "status", "checked_at")
+
+
+def file_sha256(filepath: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DownloadManifest(SQLiteStore):
+    """
+    SQLite-backed manifest of downloaded documents, keyed by document number.
+
+    Paths are stored relative to the manifest's directory, so the corpus and
+    its manifest can be moved together.
+
+    Attributes:
+        path (str): Path of the SQLite database file
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS documents (
+               document_number TEXT PRIMARY KEY,
+               path TEXT NOT NULL,
+               size INTEGER NOT NULL,
+               mtime_ns INTEGER NOT NULL,
+               sha256 TEXT NOT NULL,
+               etag TEXT,
+               last_modified TEXT,
+               status TEXT NOT NULL,
+               checked_at TEXT DEFAULT CURRENT_TIMESTAMP
+           )""",
+        """CREATE TABLE IF NOT EXISTS sync_state (
+               key TEXT PRIMARY KEY,
+               value TEXT NOT NULL
+           )""",
+        """CREATE TABLE IF NOT EXISTS sync_failures (
+               document_number TEXT PRIMARY KEY,
+               failures INTEGER NOT NULL,
+               last_failed_at TEXT DEFAULT CURRENT_TIMESTAMP
+           )""",
+        """CREATE TABLE IF NOT EXISTS sync_events (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               document_number TEXT NOT NULL,
+               path TEXT NOT NULL,
+               created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+               consumed_at TEXT
+           )""",
+    )
+
+    def __init__(self, path: str):
+        """
+        Initialize DownloadManifest.
+
+        Args:
+            path: Path of the SQLite database file (created if missing)
+        """
+        super().__init__(path)
+        self.root = Path(path).resolve().parent
+
+    def _relative(self, filepath: Path) -> str:
+        return os.path.relpath(Path(filepath).resolve(), self.root)
+
+    def get(self, document_number: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry of a document, or None."""
+        row = self._fetchone(
+            f"SELECT {', '.join(MANIFEST_COLUMNS)} FROM documents WHERE document_number = ?",
+            (document_number,)
+        )
+        return dict(zip(MANIFEST_COLUMNS, row)) if row else None
+
+    def is_current(self, document_number: str, filepath: Path) -> bool:
+        """
+        True if `filepath` is the valid file recorded for the document and is
+        unchanged since (same size and mtime); costs one stat call.
+        """
+        entry = self.get(document_number)
+        if not entry or entry["status"] != VALID or entry["path"] != self._relative(filepath):
+            return False
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+    def record(self, document_number: str, filepath: Path, sha256: str, status: str = VALID,
+               etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Record (or replace) a document's file, taking size and mtime from the file itself."""
+        stat = os.stat(filepath)
+        self._execute(
+            "INSERT OR REPLACE INTO documents "
+            "(document_number, path, size, mtime_ns, sha256, etag, last_modified, status, checked_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            (document_number, self._relative(filepath), stat.st_size, stat.st_mtime_ns,
+             sha256, etag, last_modified, status)
+        )
+
+    def mark_checked(self, document_number: str) -> None:
+        """Note that the server confirmed the recorded file is still current."""
+        self._execute("UPDATE documents SET checked_at = CURRENT_TIMESTAMP WHERE document_number = ?",
+                      (document_number,))
+
+    def get_cursor(self) -> Optional[Dict[str, Any]]:
+        """
+        Return the sync cursor, or None before the first sync.
+
+        The cursor is {"publication_date": "YYYY-MM-DD", "document_numbers": [...]},
+        the latest publication date fully synced and the documents already
+        handled on that date.
+        """
+        row = self._fetchone("SELECT value FROM sync_state WHERE key = 'cursor'")
+        return json.loads(row[0]) if row else None
+
+    def set_cursor(self, cursor: Dict[str, Any]) -> None:
+        """Persist the sync cursor."""
+        self._execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('cursor', ?)", (json.dumps(cursor),))
+
+    def record_failure(self, document_number: str) -> int:
+        """Count a failed sync pass for a document; returns its failures so far."""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO sync_failures (document_number, failures) VALUES (?, 1) "
+                "ON CONFLICT (document_number) DO UPDATE SET failures = failures + 1, "
+                "last_failed_at = CURRENT_TIMESTAMP",
+                (document_number,)
+            )
+            return conn.execute("SELECT failures FROM sync_failures WHERE document_number = ?",
+                                (document_number,)).fetchone()[0]
+
+    def clear_failures(self, document_numbers: Iterable[str]) -> None:
+        """Forget the failures of documents that have since been synced."""
+        self._executemany("DELETE FROM sync_failures WHERE document_number = ?",
+                          [(document_number,) for document_number in document_numbers])
+
+    def add_event(self, document_number: str) -> None:
+        """Queue a recorded document's file for the downstream chunk/embed stages."""
+        self._execute(
+            "INSERT INTO sync_events (document_number, path) "
+            "SELECT document_number, path FROM documents WHERE document_number = ?",
+            (document_number,)
+        )
+
+    def pending_events(self) -> List[Dict[str, Any]]:
+        """Return unconsumed events, oldest first, with absolute file paths."""
+        rows = self._fetchall(
+            "SELECT id, document_number, path, created_at FROM sync_events WHERE consumed_at IS NULL ORDER BY id"
+        )
+        return [{"id": row[0], "document_number": row[1], "path": str(self.root / row[2]), "created_at": row[3]}
+                for row in rows]
+
+    def mark_consumed(self, event_ids: Iterable[int]) -> None:
+        """Mark events as handled by the downstream stages."""
+        self._executemany("UPDATE sync_events SET consumed_at = CURRENT_TIMESTAMP WHERE id = ?",
+                          [(event_id,) for event_id in event_ids])
@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+from app.core.data_fetcher import fetch_regulations as fr
+from app.core.data_fetcher.manifest import DownloadManifest
+
+XML_BODY = (b'<?xml version="1.0" encoding="UTF-8"?><RULE><PREAMB><AGENCY>CMS</AGENCY></PREAMB>'
+            + b''.join(b'<P>Hospice payment paragraph %d.</P>' % i for i in range(200)) + b'</RULE>')
+ETAG = '"v1"'
+
+
+def make_doc(number, date):
+    return {"document_number": number, "publication_date": date, "type": "Rule",
+            "title": "FY 2025 Hospice Payment Rate Update"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Federal Register stand-in: search pages and XML files, with scripted failures."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        state["requests"].append((url.path, dict(self.headers)))
+        if url.path == "/api/v1/documents.json":
+            page = int(parse_qs(url.query)["page"][0])
+            if page in state["failing_pages"]:
+                self.send_error(404)
+                return
+            body = json.dumps({"results": state["pages"][page - 1], "total_pages": len(state["pages"])}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif url.path.startswith("/documents/full_text/xml/"):
+            if url.path.rsplit("/", 1)[-1][:-len(".xml")] in state["failing_docs"]:
+                self.send_error(404)
+                return
+            self.send_xml(state)
+        else:
+            self.send_error(404)
+
+    def send_xml(self, state):
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") == ETAG:
+            start = int(range_header[len("bytes="):-1])
+        body = XML_BODY[start:]
+        self.send_response(206 if start else 200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(XML_BODY) - 1}/{len(XML_BODY)}")
+        self.end_headers()
+        if state["truncate_next"]:
+            # Drop the connection halfway through the body
+            state["truncate_next"] = False
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.state = {"pages": [[]], "failing_pages": set(), "failing_docs": set(), "truncate_next": False, "requests": []}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    site = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setattr(fr, "SEARCH_URL", f"{site}/api/v1/documents.json")
+    monkeypatch.setattr(fr, "XML_URL", site + "/documents/full_text/xml/{year}/{month}/{day}/{doc_number}.xml")
+    fr.configure(workers=4, requests_per_second=50)
+    yield server.state
+    server.shutdown()
+    server.server_close()
+
+
+def xml_requests(state):
+    return [headers for path, headers in state["requests"] if path.endswith(".xml")]
+
+
+def test_search_is_paced(stub):
+    stub["pages"] = [[make_doc(f"2024-{page:05d}", "2024-03-01")] for page in range(1, 31)]
+    fr.configure(workers=4, requests_per_second=20)
+    started = time.monotonic()
+    docs = fr.search_documents({}, workers=4)
+    # 30 requests at 20 per second with a burst of 20
+    assert time.monotonic() - started >= 0.45
+    assert [doc["document_number"] for doc in docs] == [f"2024-{page:05d}" for page in range(1, 31)]
+
+
+def test_recheck_skips_unchanged_file(stub, tmp_path):
+    manifest = DownloadManifest(str(tmp_path / "manifest.sqlite"))
+    doc = make_doc("2024-00001", "2024-03-01")
+    assert fr.fetch_xml(doc, tmp_path, manifest=manifest) == "downloaded"
+    assert manifest.get("2024-00001")["etag"] == ETAG
+    # Recorded and untouched: skipped on a stat call, without a request
+    assert fr.fetch_xml(doc, tmp_path, manifest=manifest) == "existing"
+    assert len(xml_requests(stub)) == 1
+    # Re-checked: the server answers 304 to the stored validator
+    assert fr.fetch_xml(doc, tmp_path, manifest=manifest, recheck=True) == "unchanged"
+    assert xml_requests(stub)[-1]["If-None-Match"] == ETAG
+    assert (tmp_path / "2024_HOSPICE_final_2024-00001.xml").read_bytes() == XML_BODY
+    manifest.close()
+
+
+def test_download_resumes_after_truncated_body(stub, tmp_path, monkeypatch):
+    # Small blocks, so part of the body is written before the connection drops
+    monkeypatch.setattr(fr, "DOWNLOAD_CHUNK_SIZE", 1024)
+    stub["truncate_next"] = True
+    assert fr.fetch_xml(make_doc("2024-00001", "2024-03-01"), tmp_path) == "downloaded"
+    first, resumed = xml_requests(stub)
+    assert "Range" not in first
+    assert resumed["Range"] != "bytes=0-" and resumed["If-Range"] == ETAG
+    # Published whole under the final name, with no temp file left behind
+    assert (tmp_path / "2024_HOSPICE_final_2024-00001.xml").read_bytes() == XML_BODY
+    assert [path.name for path in tmp_path.iterdir()] == ["2024_HOSPICE_final_2024-00001.xml"]
+
+
+def test_sync_keeps_cursor_when_a_page_fails(stub, tmp_path):
+    manifest = DownloadManifest(str(tmp_path / "manifest.sqlite"))
+    cursor = {"publication_date": "2024-03-01", "document_numbers": []}
+    manifest.set_cursor(cursor)
+    stub["pages"] = [[make_doc("2024-00001", "2024-03-04")], [make_doc("2024-00002", "2024-03-05")]]
+    stub["failing_pages"] = {2}
+    with pytest.raises(requests.RequestException):
+        fr.sync_documents(tmp_path, manifest, fr.setup_logging())
+    assert manifest.get_cursor() == cursor
+    assert xml_requests(stub) == []
+
+    stub["failing_pages"] = set()
+    outcomes = fr.sync_documents(tmp_path, manifest, fr.setup_logging())
+    assert outcomes["downloaded"] == 2
+    assert manifest.get_cursor() == {"publication_date": "2024-03-05", "document_numbers": ["2024-00002"]}
+    assert [event["document_number"] for event in manifest.pending_events()] == ["2024-00001", "2024-00002"]
+    manifest.close()
+
+
+def test_sync_passes_a_document_after_repeated_failures(stub, tmp_path):
+    manifest = DownloadManifest(str(tmp_path / "manifest.sqlite"))
+    manifest.set_cursor({"publication_date": "2024-03-01", "document_numbers": []})
+    stub["pages"] = [[make_doc("2024-00001", "2024-03-04"), make_doc("2024-00002", "2024-03-05")]]
+    stub["failing_docs"] = {"2024-00001"}
+    # The first failure holds the cursor at the failed document's date
+    outcomes = fr.sync_documents(tmp_path, manifest, fr.setup_logging(), max_failures=2)
+    assert (outcomes["failed"], outcomes["downloaded"]) == (1, 1)
+    assert manifest.get_cursor() == {"publication_date": "2024-03-04", "document_numbers": []}
+    # The second one reaches the limit, and the cursor moves past it
+    outcomes = fr.sync_documents(tmp_path, manifest, fr.setup_logging(), max_failures=2)
+    assert (outcomes["failed"], outcomes["existing"]) == (1, 1)
+    assert manifest.get_cursor() == {"publication_date": "2024-03-05", "document_numbers": ["2024-00002"]}
+    manifest.close()
@@ -0,0 +1,58 @@
+"""
+embedding_cache.py
+
+Persistent store of embedding vectors keyed by text hash and model, so a
+rebuild only sends new or changed text to the embedding API.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .sqlite_store import SQLiteStore
+
+# SQLite caps bound parameters per statement; look keys up in slices
+LOOKUP_BATCH = 500
+
+
+class EmbeddingCache(SQLiteStore):
+    """
+    SQLite-backed cache of embedding vectors.
+
+    Entries are keyed by (text hash, model); vectors are stored as raw
+    float32 bytes.
+
+    Attributes:
+        path (str): Path of the SQLite database file
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS embeddings (
+               text_hash TEXT NOT NULL,
+               model TEXT NOT NULL,
+               vector BLOB NOT NULL,
+               created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+               PRIMARY KEY (text_hash, model)
+           )""",
+    )
+
+    def get_many(self, text_hashes: Iterable[str], model: str) -> Dict[str, np.ndarray]:
+        """Return {text_hash: vector} for the hashes that are cached."""
+        keys = list(dict.fromkeys(text_hashes))
+        vectors = {}
+        for i in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[i:i + LOOKUP_BATCH]
+            rows = self._fetchall(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                f"AND text_hash IN ({', '.join('?' * len(batch))})",
+                [model] + batch
+            )
+            for text_hash, blob in rows:
+                vectors[text_hash] = np.frombuffer(blob, dtype="float32")
+        return vectors
+
+    def put_many(self, entries: List[Tuple[str, np.ndarray]], model: str) -> None:
+        """Store (or replace) (text_hash, vector) pairs."""
+        self._executemany(
+            "INSERT OR REPLACE INTO embeddings (text_hash, model, vector) VALUES (?, ?, ?)",
+            [(text_hash, model, np.asarray(vector, dtype="float32").tobytes()) for text_hash, vector in entries]
+        )
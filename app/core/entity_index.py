@@ -0,0 +1,155 @@
+"""
+entity_index.py
+
+Exact-match entities in regulation text: CPT/HCPCS codes (and code ranges),
+CFR section references and dollar amounts. The chunker tags every chunk with
+the entities it mentions, and the index build inverts them into postings
+(entity -> sorted metadata row positions), so a query naming a code is
+answered with a dictionary lookup instead of an embedding call. Rows that
+mention any entity also keep their distinct words, which rank entity hits
+against the rest of the query without rescanning chunk text.
+
+Entity keys are normalized strings:
+    cpt:97550    CPT codes, including Category II/III (e.g. cpt:0591T)
+    hcpcs:G2211  HCPCS Level II codes
+    cfr:418.309  CFR sections (cfr:418 for a whole part)
+    usd:33.2875  Dollar amounts, scaled ("$2.5 million" -> usd:2500000)
+"""
+import re
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+from .atomic_io import read_json, write_json
+
+# Bump when extraction rules or the file layout change
+ENTITY_INDEX_VERSION = 2
+
+# Ranges wider than this are indexed by their endpoints only
+MAX_RANGE_CODES = 100
+
+# A code is 5 characters (CPT digits, Category II/III suffix or HCPCS letter),
+# not part of a larger number or a ZIP+4
+_CODE = r"(?:\d{4}[0-9FT]|[A-V]\d{4})"
+_CODE_BOUNDARY_BEFORE = r"(?<![\w$,.])"
+_CODE_BOUNDARY_AFTER = r"(?![\w%]|[,.]\d|-\d{4}\b)"
+CODE_RANGE_PATTERN = re.compile(
+    _CODE_BOUNDARY_BEFORE + rf"({_CODE})\s*(?:-|–|—|through|to)\s*({_CODE})" + _CODE_BOUNDARY_AFTER,
+    re.IGNORECASE
+)
+CODE_PATTERN = re.compile(_CODE_BOUNDARY_BEFORE + rf"({_CODE})" + _CODE_BOUNDARY_AFTER, re.IGNORECASE)
+# Numbers that look like codes but are Federal Register pages ("83 FR 38622, 38635
+# through 38648"), document or form numbers, Executive Orders, area codes
+# ("CBSA 24220", "FIPS county 09015") or assessment items ("item A1805")
+NOT_CODE_PATTERN = re.compile(
+    r"(?:\bFR|\bDoc\.|\bpages?|\brows?|\bOrders?|\bE\.O\.|\bCMS|\bCBSAs?|\bFIPS(?: county| code)?"
+    r"|\btransition code|\brural areas?|\bitems?)[\s,#-]+[A-Z]?\d[\d\s,–-]*(?:(?:and|through|to)\s+\d[\d\s,–-]*)*",
+    re.IGNORECASE
+)
+CFR_PATTERN = re.compile(r"\b\d+\s+CFR\s+(?:parts?\s+)?(\d+)(?:\.(\d+))?", re.IGNORECASE)
+SECTION_SIGN_PATTERN = re.compile(r"§§?\s*(\d+)\.(\d+)")
+DOLLAR_PATTERN = re.compile(r"\$\s?(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?(?:\s*(thousand|million|billion)\b)?",
+                            re.IGNORECASE)
+DOLLAR_SCALES = {"thousand": Decimal(1000), "million": Decimal(10) ** 6, "billion": Decimal(10) ** 9}
+# Words that rank entity hits; shorter ones are mostly stopwords
+RANKING_WORD_PATTERN = re.compile(r"[a-z]{4,}")
+
+
+def code_key(code: str) -> str:
+    """Entity key of a CPT or HCPCS code."""
+    code = code.upper()
+    return f"hcpcs:{code}" if code[0].isalpha() else f"cpt:{code}"
+
+
+def expand_code_range(first: str, last: str) -> Tuple[str, ...]:
+    """Entity keys of every code in an inclusive range like 97550-97552."""
+    first, last = first.upper(), last.upper()
+    same_shape = first[0].isalpha() == last[0].isalpha() and first[-1].isalpha() == last[-1].isalpha()
+    if same_shape and (first[0] == last[0] or not first[0].isalpha()):
+        prefix = first[0] if first[0].isalpha() else ""
+        suffix = first[-1] if first[-1].isalpha() else ""
+        low, high = int(first[len(prefix):len(first) - len(suffix)]), int(last[len(prefix):len(last) - len(suffix)])
+        width = len(first) - len(prefix) - len(suffix)
+        if 0 <= high - low < MAX_RANGE_CODES:
+            return tuple(code_key(f"{prefix}{number:0{width}d}{suffix}") for number in range(low, high + 1))
+    return code_key(first), code_key(last)
+
+
+def dollar_key(amount: str, fraction: str, scale: str) -> str:
+    """Entity key of a dollar amount, e.g. ("2", ".5", "million") -> usd:2500000."""
+    value = Decimal(amount.replace(",", "") + (fraction or ""))
+    if scale:
+        value *= DOLLAR_SCALES[scale.lower()]
+    return f"usd:{format(value.normalize(), 'f')}"
+
+
+def extract_entity_groups(text: str) -> List[Tuple[str, ...]]:
+    """
+    Entity mentions in text, in order of appearance.
+
+    Each mention is a tuple of entity keys: one key, or every code of a code
+    range, any of which satisfies it.
+    """
+    if not text:
+        return []
+    groups = []
+    masked = [match.span() for match in NOT_CODE_PATTERN.finditer(text)]
+    for match in CODE_RANGE_PATTERN.finditer(text):
+        if not any(start <= match.start() < end for start, end in masked):
+            groups.append((match.start(), expand_code_range(match.group(1), match.group(2))))
+        masked.append(match.span())
+    for match in CODE_PATTERN.finditer(text):
+        if not any(start <= match.start() < end for start, end in masked):
+            groups.append((match.start(), (code_key(match.group(1)),)))
+    for match in CFR_PATTERN.finditer(text):
+        section = f"{match.group(1)}.{match.group(2)}" if match.group(2) else match.group(1)
+        groups.append((match.start(), (f"cfr:{section}",)))
+    for match in SECTION_SIGN_PATTERN.finditer(text):
+        groups.append((match.start(), (f"cfr:{match.group(1)}.{match.group(2)}",)))
+    for match in DOLLAR_PATTERN.finditer(text):
+        groups.append((match.start(), (dollar_key(match.group(1), match.group(2), match.group(3)),)))
+
+    unique = []
+    for _, keys in sorted(groups, key=lambda group: group[0]):
+        if keys not in unique:
+            unique.append(keys)
+    return unique
+
+
+def extract_entities(text: str) -> List[str]:
+    """Sorted, de-duplicated entity keys mentioned in text."""
+    return sorted({key for keys in extract_entity_groups(text) for key in keys})
+
+
+def ranking_words(text: str) -> List[str]:
+    """Sorted distinct lowercase words of four or more letters in text."""
+    return sorted(set(RANKING_WORD_PATTERN.findall(text.lower())))
+
+
+def build_entity_index(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Invert the entities of FAISS metadata rows into {entity: [row positions]}.
+
+    Rows from chunks tagged by the chunker carry "entities"; older rows are
+    tagged from their text. Postings are in ascending row order, and
+    "words" maps the position of every row with an entity to its
+    ranking_words.
+    """
+    postings: Dict[str, List[int]] = {}
+    words: Dict[str, List[str]] = {}
+    for position, row in enumerate(rows):
+        entities = row.get("entities")
+        if entities is None:
+            entities = extract_entities(row.get("text", ""))
+        for entity in entities:
+            postings.setdefault(entity, []).append(position)
+        if entities:
+            words[str(position)] = ranking_words(row.get("text", ""))
+    return {"version": ENTITY_INDEX_VERSION, "rows": len(rows), "postings": postings, "words": words}
+
+
+def save_entity_index(path: str, index: Dict[str, Any]) -> None:
+    write_json(path, index, separators=(",", ":"))
+
+
+def load_entity_index(path: str) -> Dict[str, Any]:
+    return read_json(path)
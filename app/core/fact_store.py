@@ -0,0 +1,358 @@
+"""
+fact_store.py
+
+Typed quantitative facts (conversion factors, KX modifier thresholds, hospice
+cap amounts, payment update percentages, effective dates) extracted from the
+indexed chunks at build time into a local SQLite table. Single-fact questions
+are answered from the table with a templated, cited answer; anything the
+table can't answer confidently goes through the regular RAG path.
+"""
+import re
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from .sqlite_store import SQLiteStore
+
+# Bump when extraction rules change, so the build re-extracts every fact
+FACTS_VERSION = "2"
+
+# A fact is a sentence mentioning its subject, with a value following within the rule's window
+VALUE_WINDOW = 150
+USD_VALUE = r"\$\s?(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+# Not "percentage points" (reductions and adjustments, not updates)
+PERCENT_VALUE = r"(\d+(?:\.\d+)?)\s*percent\b"
+DATE_VALUE = (r"((?:January|February|March|April|May|June|July|August|September|October|November|December)"
+              r"\s+\d{1,2},\s+\d{4})")
+
+# fact_type -> (subject pattern, value pattern, unit, characters allowed between them)
+FACT_RULES = {
+    "conversion_factor": (r"conversion factor", USD_VALUE, "USD", VALUE_WINDOW),
+    "kx_threshold": (r"\bKX modifier thresholds?|\bKX thresholds?", USD_VALUE, "USD", VALUE_WINDOW),
+    "cap_amount": (r"\bcap amount", USD_VALUE, "USD", VALUE_WINDOW),
+    "payment_update": (r"payment update percentage|update percentage|payment update", PERCENT_VALUE, "percent",
+                       VALUE_WINDOW),
+    "effective_date": (r"\b(?:are|is|become|becomes|will be) effective(?: on| as of| beginning)?", DATE_VALUE, "date", 5),
+}
+# Subject and value separated by these belong to different quantities
+# ("update ... is based on a 3.4 percent market basket increase")
+NOT_VALUE_GAP = re.compile(r"\bbased on\b|\bthan\b|\bcompared\b|\breduc", re.IGNORECASE)
+# The chunker's EFFDATE metadata ("These regulations are effective on October 1, 2024.")
+# is the authoritative effective date; the sentence rule only covers documents without one
+EFFDATE_CONFIDENCE = 0.99
+# Statements quoted from public comments, not the rule's own figures
+COMMENT_PATTERN = re.compile(r"\bcomment(?:s|ers?)?\b", re.IGNORECASE)
+
+# Subject phrases of each fact type in a question, with how specifically each names it.
+# Bare words ("update", "increase", "effective") name other things too and don't count.
+QUERY_FACT_TYPES = [
+    ("conversion_factor", r"conversion factor", 1.0),
+    ("kx_threshold", r"\bKX modifier thresholds?|\bKX thresholds?", 1.0),
+    ("cap_amount", r"\bcap amount", 1.0),
+    ("cap_amount", r"\b(?:hospice|aggregate) cap\b", 0.95),
+    ("effective_date", r"\beffective date of the (?:final |proposed )?rule|\brule(?:'s)? effective date", 1.0),
+    ("effective_date", r"\brule (?:is |be |becomes? |takes? )?effect(?:ive)?\b", 0.95),
+    ("payment_update", r"payment update percentage|update percentage|market basket update", 1.0),
+    ("payment_update", r"payment update", 0.95),
+]
+# Question words that don't narrow the fact asked for; every other word left
+# over once the subject, program and year are removed lowers the match's specificity
+QUERY_FILLER = {
+    "what", "which", "when", "is", "are", "was", "were", "will", "be", "does", "do", "did", "the", "a", "an",
+    "for", "of", "in", "under", "to", "on", "as", "this", "that", "final", "proposed", "rule", "rules", "cms",
+    "medicare", "new", "current", "amount", "value", "percent", "percentage", "calendar", "fiscal", "year",
+}
+UNMATCHED_WORD_PENALTY = 0.1
+QUERY_PROGRAMS = [
+    ("Hospice", r"\bhospice\b"),
+    ("MPFS", r"\bMPFS\b|\bPFS\b|physician fee schedule"),
+    ("SNF", r"\bSNF\b|skilled nursing"),
+]
+# Fact types that only exist for one program
+FACT_TYPE_PROGRAMS = {"conversion_factor": "MPFS", "kx_threshold": "MPFS", "cap_amount": "Hospice"}
+# Questions asking for more than a single value go to the RAG path
+NOT_SINGLE_FACT = re.compile(r"\b(?:why|how does|how do|compare|compared|explain|summari[sz]e|difference|changes?)\b",
+                             re.IGNORECASE)
+
+PERIOD_PATTERN = re.compile(r"\b(CY|FY|calendar year|fiscal year)\s*(20\d{2})\b", re.IGNORECASE)
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z(])")
+
+FINAL = "final"
+PROPOSED = "proposed"
+
+ANSWER_TEMPLATES = {
+    "conversion_factor": "The {when}{program} conversion factor is {value}.",
+    "kx_threshold": "The {when}KX modifier threshold is {value}.",
+    "cap_amount": "The {when}{program} cap amount is {value}.",
+    "payment_update": "The {when}{program} payment update is {value}.",
+    "effective_date": "The {when}{program} rule is effective on {value}.",
+}
+
+FACT_COLUMNS = ("id", "fact_type", "value", "unit", "program", "period", "year", "stage", "confidence",
+                "source_file", "chunk_id", "section_header", "snippet")
+
+
+def _period(match: re.Match) -> Dict[str, Any]:
+    period = match.group(1).upper()
+    return {"period": {"CALENDAR YEAR": "CY", "FISCAL YEAR": "FY"}.get(period, period), "year": int(match.group(2))}
+
+
+def extract_facts(row: Dict[str, Any], chunk_id: int) -> List[Dict[str, Any]]:
+    """
+    Typed facts stated in a chunk (a FAISS metadata row).
+
+    A fact is a subject ("conversion factor", "cap amount", ...) followed in
+    the same sentence by a value of the expected kind. Its CY/FY year is the
+    last one named before the value (else the document title's). Sentences
+    about proposed values are kept but marked "proposed".
+    """
+    metadata = row.get("metadata", {})
+    title_period = PERIOD_PATTERN.search(metadata.get("title") or "")
+    facts = []
+    for sentence in SENTENCE_SPLIT.split(row.get("text", "")):
+        for fact_type, (subject_pattern, value_pattern, unit, window) in FACT_RULES.items():
+            for subject in re.finditer(subject_pattern, sentence, re.IGNORECASE):
+                value = re.compile(value_pattern).search(sentence, subject.end(), subject.end() + window + 40)
+                if (not value or value.start() - subject.end() > window
+                        or NOT_VALUE_GAP.search(sentence, subject.end(), value.start())):
+                    continue
+                periods = [match for match in PERIOD_PATTERN.finditer(sentence, 0, value.start())]
+                period = _period(periods[-1]) if periods else _period(title_period) if title_period else {}
+                proposed = re.search(r"\bproposed\b", sentence[:value.end()], re.IGNORECASE)
+                # Lower confidence for commenters' figures, values far from their subject or with no year at all
+                confidence = 0.5 if proposed else 0.95
+                if COMMENT_PATTERN.search(sentence):
+                    confidence -= 0.4
+                if value.start() - subject.end() > 60:
+                    confidence -= 0.2
+                if not period:
+                    confidence -= 0.2
+                facts.append({
+                    "fact_type": fact_type,
+                    "value": value.group(1).replace(",", "") if unit != "date" else value.group(1),
+                    "unit": unit,
+                    "program": metadata.get("program"),
+                    "period": period.get("period"),
+                    "year": period.get("year"),
+                    "stage": PROPOSED if proposed else FINAL,
+                    "confidence": round(confidence, 2),
+                    "source_file": metadata.get("source_file"),
+                    "chunk_id": chunk_id,
+                    "section_header": row.get("section_header"),
+                    "snippet": sentence.strip()[:500]
+                })
+    return facts
+
+
+def effective_date_fact(row: Dict[str, Any], chunk_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Effective date of a chunk's document from its EFFDATE metadata (see
+    XMLChunker.extract_preamb_metadata), or None if it names no date.
+    """
+    metadata = row.get("metadata", {})
+    date = re.search(DATE_VALUE, metadata.get("effective_date") or "")
+    if not date:
+        return None
+    title_period = PERIOD_PATTERN.search(metadata.get("title") or "")
+    period = _period(title_period) if title_period else {}
+    return {
+        "fact_type": "effective_date",
+        "value": date.group(1),
+        "unit": "date",
+        "program": metadata.get("program"),
+        "period": period.get("period"),
+        "year": period.get("year"),
+        "stage": PROPOSED if metadata.get("rule_type") == "Proposed" else FINAL,
+        "confidence": EFFDATE_CONFIDENCE if period else round(EFFDATE_CONFIDENCE - 0.2, 2),
+        "source_file": metadata.get("source_file"),
+        "chunk_id": chunk_id,
+        "section_header": row.get("section_header"),
+        "snippet": metadata["effective_date"][:500]
+    }
+
+
+def extract_all_facts(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Facts of every metadata row, cited by chunk id (row position for rows
+    without ids). A sentence repeated by chunk overlap yields its facts once.
+
+    Each document's effective date comes from its EFFDATE metadata, cited by
+    the first chunk quoting it (else the document's first chunk); documents
+    without one fall back to effective-date sentences in the text.
+    """
+    effective_dates: Dict[str, Dict[str, Any]] = {}
+    for position, row in enumerate(rows):
+        metadata = row.get("metadata", {})
+        source_file = metadata.get("source_file")
+        cited = effective_dates.get(source_file)
+        if cited is None or (cited["snippet"] not in cited["text"] and cited["snippet"] in row.get("text", "")):
+            fact = effective_date_fact(row, row.get("id", position))
+            if fact:
+                effective_dates[source_file] = {**fact, "text": row.get("text", "")}
+
+    facts = {}
+    for fact in effective_dates.values():
+        fact.pop("text")
+        facts[(fact["fact_type"], fact["source_file"])] = fact
+    for position, row in enumerate(rows):
+        for fact in extract_facts(row, row.get("id", position)):
+            if fact["fact_type"] == "effective_date" and fact["source_file"] in effective_dates:
+                continue
+            key = (fact["fact_type"], fact["value"], fact["year"], fact["stage"], fact["source_file"], fact["snippet"])
+            facts.setdefault(key, fact)
+    return list(facts.values())
+
+
+def parse_fact_query(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Fact type, program, year and stage asked for by a single-fact question,
+    or None if the question isn't one.
+
+    The question must name exactly one fact type by its subject phrase.
+    "specificity" (at most 1.0) drops for looser subject phrases and for
+    every word the subject, program and year don't account for, so "payment
+    update for hospice aides" is a weaker match than "hospice payment update".
+    """
+    if NOT_SINGLE_FACT.search(query):
+        return None
+    matches = [(name, match, weight) for name, pattern, weight in QUERY_FACT_TYPES
+               for match in [re.search(pattern, query, re.IGNORECASE)] if match]
+    if len({name for name, _, _ in matches}) != 1:
+        return None
+    fact_type, subject, weight = matches[0]
+    program = next((name for name, pattern in QUERY_PROGRAMS if re.search(pattern, query, re.IGNORECASE)),
+                   FACT_TYPE_PROGRAMS.get(fact_type))
+    period = PERIOD_PATTERN.search(query) or re.search(r"\b(20\d{2})\b", query)
+
+    rest = query[:subject.start()] + " " + query[subject.end():]
+    for pattern in [PERIOD_PATTERN.pattern, r"\b20\d{2}\b"] + [pattern for _, pattern in QUERY_PROGRAMS]:
+        rest = re.sub(pattern, " ", rest, flags=re.IGNORECASE)
+    unmatched = [word for word in re.findall(r"[a-z]+", rest.lower()) if word not in QUERY_FILLER]
+    return {
+        "fact_type": fact_type,
+        "program": program,
+        "year": int(period.groups()[-1]) if period else None,
+        "stage": PROPOSED if re.search(r"\bproposed\b", query, re.IGNORECASE) else FINAL,
+        "specificity": round(max(0.0, weight - UNMATCHED_WORD_PENALTY * len(unmatched)), 2)
+    }
+
+
+def format_value(fact: Dict[str, Any]) -> str:
+    if fact["unit"] == "USD":
+        value = Decimal(fact["value"])
+        return f"${value:,.{max(2, -value.as_tuple().exponent)}f}"
+    if fact["unit"] == "percent":
+        return f"{fact['value']} percent"
+    return fact["value"]
+
+
+def choose_fact(candidates: List[Dict[str, Any]], year_given: bool) -> Optional[Dict[str, Any]]:
+    """
+    The fact answering a question, with the answer's confidence, or None.
+
+    Without a year in the question the latest year is assumed (at slightly
+    lower confidence). Candidates disagreeing on the value cap the confidence
+    at the winning value's share of the supporting evidence.
+    """
+    if not candidates:
+        return None
+    year = max((fact["year"] or 0) for fact in candidates)
+    candidates = [fact for fact in candidates if (fact["year"] or 0) == year]
+    support: Dict[str, float] = {}
+    for fact in candidates:
+        support[fact["value"]] = support.get(fact["value"], 0.0) + fact["confidence"]
+    value = max(support, key=support.get)
+    supporting = sorted((fact for fact in candidates if fact["value"] == value),
+                        key=lambda fact: fact["confidence"], reverse=True)
+    confidence = supporting[0]["confidence"] * support[value] / sum(support.values())
+    if not year_given:
+        confidence *= 0.9
+    return {**supporting[0], "answer_confidence": round(confidence, 2), "supporting": supporting}
+
+
+def templated_answer(fact: Dict[str, Any], sources: int) -> str:
+    """Answer sentence for a fact, citing its first `sources` supporting chunks."""
+    when = f"{fact['period'] or ''} {fact['year']} ".lstrip() if fact["year"] else ""
+    if fact["stage"] == PROPOSED:
+        when = "proposed " + when
+    answer = ANSWER_TEMPLATES[fact["fact_type"]].format(
+        when=when, program=fact["program"] or "", value=format_value(fact)
+    ).replace("  ", " ")
+    citations = "".join(f"[Source{i + 1}]" for i in range(sources))
+    return f"{answer[:-1]} {citations}."
+
+
+class FactStore(SQLiteStore):
+    """
+    SQLite-backed table of extracted facts, indexed by (fact_type, program, year).
+
+    Attributes:
+        path (str): Path of the SQLite database file
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS facts (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               fact_type TEXT NOT NULL,
+               value TEXT NOT NULL,
+               unit TEXT NOT NULL,
+               program TEXT,
+               period TEXT,
+               year INTEGER,
+               stage TEXT NOT NULL,
+               confidence REAL NOT NULL,
+               source_file TEXT,
+               chunk_id INTEGER,
+               section_header TEXT,
+               snippet TEXT
+           )""",
+        "CREATE INDEX IF NOT EXISTS facts_lookup ON facts (fact_type, program, year)",
+    )
+
+    def replace_all(self, facts: Iterable[Dict[str, Any]]) -> int:
+        """Replace the whole table with freshly extracted facts; returns how many were stored."""
+        columns = FACT_COLUMNS[1:]
+        rows = [tuple(fact[column] for column in columns) for fact in facts]
+        # One transaction, so readers never see a half-written table
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM facts")
+            conn.executemany(f"INSERT INTO facts ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+        return len(rows)
+
+    def lookup(self, fact_type: str, program: Optional[str] = None, year: Optional[int] = None,
+               stage: str = FINAL) -> List[Dict[str, Any]]:
+        """Facts of a type, optionally narrowed to a program and year."""
+        sql = f"SELECT {', '.join(FACT_COLUMNS)} FROM facts WHERE fact_type = ? AND stage = ?"
+        params: List[Any] = [fact_type, stage]
+        if program:
+            sql += " AND program = ?"
+            params.append(program)
+        if year:
+            sql += " AND year = ?"
+            params.append(year)
+        return [dict(zip(FACT_COLUMNS, row)) for row in self._fetchall(sql, params)]
+
+    def answer(self, query: str, source_files: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Best fact for a single-fact question, or None if the question isn't
+        one or nothing matches.
+
+        Args:
+            query: User question
+            source_files: Only consider facts from these documents (e.g. those passing the search filters)
+
+        Returns:
+            The chosen fact with "answer_confidence" (scaled by the question's
+            specificity) and its "supporting" facts
+        """
+        request = parse_fact_query(query)
+        if request is None:
+            return None
+        candidates = self.lookup(request["fact_type"], request["program"], request["year"], request["stage"])
+        if source_files is not None:
+            source_files = set(source_files)
+            candidates = [fact for fact in candidates if fact["source_file"] in source_files]
+        fact = choose_fact(candidates, request["year"] is not None)
+        if fact is not None:
+            # As sure as both the extraction and the question's match allow
+            fact["answer_confidence"] = round(fact["answer_confidence"] * request["specificity"], 2)
+        return fact
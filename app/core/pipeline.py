@@ -0,0 +1,546 @@
+"""
+pipeline.py
+
+Single entry point that turns the Federal Register corpus into a searchable
+index: fetch -> chunk -> dedupe -> embed -> index -> facts -> reports.
+
+Every stage is keyed by a hash of its inputs and settings. A stage whose key
+matches its last successful run, and whose outputs are untouched since, is
+skipped. Chunks are cached per document and embeddings per text, both
+content-addressed, so a changed document only re-chunks and re-embeds itself.
+Each run writes a JSON report with stage timings and artifact sizes.
+
+Usage (from the repository root):
+    python -m app.core.pipeline build [--no-fetch] [--force STAGE ...] [--workers 4] [--pca-dim 256] [--skip-reports]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..config import config
+from .atomic_io import read_json, write_json
+# Embedding cache keys are the same text hash the summarizer's extraction cache uses
+from .summary_cache import text_hash
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "chunk", "dedupe", "embed", "index", "facts", "reports")
+
+# Bump when a stage's logic or output format changes, so earlier runs miss
+DEDUPE_VERSION = "1"
+EMBED_VERSION = "4"
+INDEX_VERSION = "3"
+
+# Vectors copied between the embedding cache and a memmap matrix per slice
+VECTOR_COPY_BATCH = 1000
+
+
+def digest(*parts: Any) -> str:
+    """SHA-256 hex digest of JSON-serializable parts (a stage or artifact key)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def file_fingerprint(path: str) -> Optional[List[int]]:
+    """[size, mtime_ns] of a file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BuildState:
+    """
+    Key and output fingerprints of each stage's last successful run, plus a
+    stat cache of corpus file hashes (state.json in the cache directory).
+
+    Attributes:
+        path (str): Path of the state file
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize BuildState.
+
+        Args:
+            path: Path of the JSON state file (created on first save)
+        """
+        self.path = path
+        self.data = read_json(path) if os.path.exists(path) else {}
+        self.data.setdefault("stages", {})
+        self.data.setdefault("file_hashes", {})
+
+    def is_current(self, stage: str, key: str) -> bool:
+        """True if the stage last succeeded with `key` and its outputs are unchanged since."""
+        entry = self.data["stages"].get(stage)
+        if not entry or entry["key"] != key:
+            return False
+        return all(file_fingerprint(path) == fingerprint for path, fingerprint in entry["outputs"].items())
+
+    def record(self, stage: str, key: str, outputs: List[str] = ()) -> None:
+        """Record a successful stage run and the fingerprints of its outputs."""
+        self.data["stages"][stage] = {"key": key, "outputs": {path: file_fingerprint(path) for path in outputs}}
+        self.save()
+
+    def file_sha256(self, path: str) -> str:
+        """SHA-256 of a corpus file, recomputed only if its size or mtime changed."""
+        from .data_fetcher.manifest import file_sha256
+
+        fingerprint = file_fingerprint(path)
+        cached = self.data["file_hashes"].get(path)
+        if cached and cached[:2] == fingerprint:
+            return cached[2]
+        sha256 = file_sha256(Path(path))
+        self.data["file_hashes"][path] = fingerprint + [sha256]
+        return sha256
+
+    def save(self) -> None:
+        write_json(self.path, self.data)
+
+
+class RunReport:
+    """
+    Status, timing, stats and artifact sizes of each stage of one build run.
+
+    Attributes:
+        stages (List[Dict[str, Any]]): One entry per stage, in run order
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.stages: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Time a stage; the yielded dict collects its status, key, stats and artifacts."""
+        entry = {"stage": name, "status": "ran"}
+        self.stages.append(entry)
+        started = time.perf_counter()
+        logger.info(f"▶️ Stage '{name}'")
+        try:
+            yield entry
+        except Exception as e:
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry["seconds"] = round(time.perf_counter() - started, 3)
+            logger.info(f"   {name}: {entry['status']} in {entry['seconds']:.2f}s")
+
+    def skip(self, name: str, reason: str) -> None:
+        """Record a stage that was not run at all."""
+        self.stages.append({"stage": name, "status": "skipped", "reason": reason, "seconds": 0.0})
+
+    def save(self, runs_dir: str) -> str:
+        """Write the report as runs_dir/build-<timestamp>.json and return its path."""
+        path = os.path.join(runs_dir, f"build-{self.started_at.strftime('%Y%m%d-%H%M%S-%f')}.json")
+        write_json(path, {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_seconds": round(sum(stage["seconds"] for stage in self.stages), 3),
+            "stages": self.stages
+        }, indent=2)
+        return path
+
+
+def artifact_sizes(paths: List[str]) -> Dict[str, int]:
+    """{path: size in bytes} of the given artifacts that exist."""
+    return {path: os.path.getsize(path) for path in paths if os.path.exists(path)}
+
+
+def prune_artifacts(directory: str, keep: List[str]) -> int:
+    """Delete files in `directory` other than `keep`; returns the number removed."""
+    if not os.path.isdir(directory):
+        return 0
+    keep = {os.path.abspath(path) for path in keep}
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.abspath(os.path.join(directory, name))
+        if path not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+# -------- FETCH --------
+
+def run_fetch(corpus_dir: str, workers: int, compression: str) -> Dict[str, Any]:
+    """One incremental sync pass of the Federal Register fetcher into the corpus directory."""
+    from .data_fetcher import fetch_regulations as fetcher
+    from .data_fetcher.manifest import DownloadManifest
+
+    fetcher.configure(workers=workers)
+    manifest = DownloadManifest(os.path.join(corpus_dir, "manifest.sqlite"))
+    try:
+        outcomes = fetcher.sync_documents(Path(corpus_dir), manifest, logger, workers=workers,
+                                          compression=compression)
+    finally:
+        manifest.close()
+    return {"outcomes": dict(outcomes)}
+
+
+def consume_sync_events(corpus_dir: str) -> None:
+    """Mark the fetcher's new-document events handled once a build has indexed them."""
+    from .data_fetcher.manifest import DownloadManifest
+
+    manifest_path = os.path.join(corpus_dir, "manifest.sqlite")
+    if not os.path.exists(manifest_path):
+        return
+    manifest = DownloadManifest(manifest_path)
+    try:
+        manifest.mark_consumed(event["id"] for event in manifest.pending_events())
+    finally:
+        manifest.close()
+
+
+# -------- CHUNK --------
+
+_chunker = None
+
+
+def _init_chunker(corpus_dir: str, sections_dir: str) -> None:
+    global _chunker
+    from .xml_chunker import XMLChunker
+    _chunker = XMLChunker(input_dir=corpus_dir, sections_dir=sections_dir)
+
+
+def _chunk_document(job: Dict[str, str]) -> Optional[str]:
+    """Chunk one document into its artifact file; returns an error message on failure."""
+    try:
+        chunks = _chunker.process_file(Path(job["file"]), job["subfolder"])
+        write_json(job["artifact"], chunks)
+        return None
+    except Exception as e:
+        return f"{Path(job['file']).name}: {e}"
+
+
+def chunk_corpus(corpus_dir: str, artifacts_dir: str, sections_dir: str, state: BuildState, workers: int,
+                 force: bool = False) -> Dict[str, Any]:
+    """
+    Chunk the corpus documents whose chunk artifact (or section index) isn't
+    cached yet.
+
+    A document's artifact key covers its content hash, its path and the
+    chunker's code and settings, so unchanged documents are never re-parsed.
+    Missing artifacts are built in parallel, one document per task.
+
+    Returns:
+        Stage stats; "artifacts" lists each document's chunk artifact in corpus order
+    """
+    from . import xml_chunker
+    from .compression import canonical_xml_name
+    from .section_index import section_index_path
+
+    chunker_key = digest(Path(xml_chunker.__file__).read_text(), xml_chunker.CHUNK_WORDS,
+                         xml_chunker.OVERLAP_SENTENCES)
+    corpus_root = Path(corpus_dir)
+    # Documents placed directly in the corpus root are chunked too, with subfolder "."
+    files = xml_chunker.XMLChunker(input_dir=corpus_dir).find_xml_files()
+
+    jobs = []
+    for path in files:
+        subfolder = str(path.parent.relative_to(corpus_root))
+        key = digest(chunker_key, state.file_sha256(str(path)), str(path), subfolder)
+        jobs.append({"file": str(path), "subfolder": subfolder,
+                     "artifact": os.path.join(artifacts_dir, f"{key}.json"),
+                     "sections": section_index_path(sections_dir, canonical_xml_name(path))})
+    state.save()
+
+    pending = [job for job in jobs
+               if force or not os.path.exists(job["artifact"]) or not os.path.exists(job["sections"])]
+    errors = []
+    if pending:
+        logger.info(f"Chunking {len(pending)} of {len(jobs)} documents with {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunker,
+                                 initargs=(corpus_dir, sections_dir)) as pool:
+            errors = [error for error in pool.map(_chunk_document, pending) if error]
+        for error in errors:
+            logger.error(f"❌ Error chunking {error}")
+
+    artifacts = [job["artifact"] for job in jobs if os.path.exists(job["artifact"])]
+    prune_artifacts(artifacts_dir, artifacts)
+    prune_artifacts(sections_dir, [job["sections"] for job in jobs])
+    return {
+        "documents": len(jobs),
+        "chunked": len(pending) - len(errors),
+        "cached": len(jobs) - len(pending),
+        "failed": errors,
+        "artifacts": artifacts
+    }
+
+
+# -------- DEDUPE --------
+
+def dedupe_chunks(artifacts: List[str], output_path: str, dedupe: bool = True) -> Dict[str, Any]:
+    """
+    Merge the per-document chunk artifacts into chunks.json, dropping chunks
+    whose text already appeared earlier in the corpus.
+    """
+    chunks = []
+    seen = set()
+    duplicates = 0
+    for artifact in artifacts:
+        for chunk in read_json(artifact):
+            if dedupe and chunk["hash"] in seen:
+                duplicates += 1
+                continue
+            seen.add(chunk["hash"])
+            chunks.append(chunk)
+    write_json(output_path, chunks, indent=2)
+    return {"chunks": len(chunks), "duplicates_dropped": duplicates}
+
+
+# -------- EMBED --------
+
+def embed_chunks(chunks_path: str, plan_path: str, cache_dir: str) -> Dict[str, Any]:
+    """
+    Make sure every embeddable text of chunks.json has a cached vector.
+
+    Only texts missing from the embedding cache are sent to the API. The
+    index rows (one per embedded text, as build_faiss.build_metadata) are
+    written to `plan_path` for the index stage.
+    """
+    from .build_faiss import build_metadata, get_openai_embeddings, prepare_items
+    from .embedding_cache import EmbeddingCache
+
+    chunks = read_json(chunks_path)
+    items = prepare_items(chunks)
+    rows = build_metadata(chunks, items)
+    model = config.embedding_model
+
+    cache = EmbeddingCache(os.path.join(cache_dir, "embeddings.sqlite"))
+    try:
+        hashes = [text_hash(item["text"]) for item in items]
+        cached = cache.get_many(hashes, model)
+        missing = {}
+        for item, item_hash in zip(items, hashes):
+            if item_hash not in cached:
+                missing.setdefault(item_hash, item)
+
+        embedded_tokens = 0
+        if missing:
+            import openai
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            # Resumable like build_faiss: an interrupted run picks up from its checkpoint
+            checkpoint_path = os.path.join(cache_dir, "pending_checkpoint.json")
+            matrix, embedded_tokens = get_openai_embeddings(
+                client, list(missing.values()),
+                matrix_path=os.path.join(cache_dir, "pending_embeddings.f32"),
+                checkpoint_path=checkpoint_path,
+                model=model, resume=os.path.exists(checkpoint_path)
+            )
+            # Slice by slice, so memory stays bounded however many vectors were embedded
+            missing_hashes = list(missing)
+            for start in range(0, len(missing_hashes), VECTOR_COPY_BATCH):
+                batch = missing_hashes[start:start + VECTOR_COPY_BATCH]
+                cache.put_many(list(zip(batch, matrix[start:start + len(batch)])), model)
+            del matrix
+            for name in ("pending_embeddings.f32", "pending_checkpoint.json"):
+                os.remove(os.path.join(cache_dir, name))
+    finally:
+        cache.close()
+
+    write_json(plan_path, rows)
+    return {
+        "rows": len(rows),
+        "cached": len(rows) - sum(1 for item_hash in hashes if item_hash in missing),
+        "embedded": len(missing),
+        "embedded_tokens": embedded_tokens
+    }
+
+
+# -------- INDEX --------
+
+def build_index(plan_path: str, cache_dir: str, pca_dim: Optional[int] = None):
+    """
+    Build the FAISS index from the embed stage's rows and the cached vectors,
+    and swap it, its metadata and the entity index in next to the live files
+    (build_faiss.create_index and save_index_outputs).
+
+    Returns:
+        (index, stats)
+    """
+    import numpy as np
+    from .build_faiss import create_index, save_index_outputs
+    from .embedding_cache import EmbeddingCache
+
+    rows = read_json(plan_path)
+    dimension = config.embedding_dimension
+    matrix_path = os.path.join(cache_dir, "index_matrix.f32")
+    matrix = np.memmap(matrix_path, dtype="float32", mode="w+", shape=(len(rows), dimension))
+    cache = EmbeddingCache(os.path.join(cache_dir, "embeddings.sqlite"))
+    try:
+        for start in range(0, len(rows), VECTOR_COPY_BATCH):
+            batch = rows[start:start + VECTOR_COPY_BATCH]
+            hashes = [text_hash(row["text"]) for row in batch]
+            vectors = cache.get_many(hashes, config.embedding_model)
+            matrix[start:start + len(batch)] = np.stack([vectors[item_hash] for item_hash in hashes])
+    finally:
+        cache.close()
+
+    index = create_index(matrix, np.array([row["id"] for row in rows], dtype="int64"), pca_dim)
+    del matrix
+    os.remove(matrix_path)
+
+    entity_index = save_index_outputs(index, rows)
+    return index, {"vectors": index.ntotal, "dimension": pca_dim or dimension,
+                   "entities": len(entity_index["postings"])}
+
+
+# -------- BUILD --------
+
+def build(args: argparse.Namespace) -> bool:
+    """Run the build stages in order; returns True if every stage succeeded."""
+    cache_dir = config.build_cache_dir
+    corpus_dir = config.docs_data_path
+    chunks_path = os.path.join(config.build_faiss_output_folder, "chunks.json")
+    chunk_artifacts_dir = os.path.join(cache_dir, "chunks")
+    plans_dir = os.path.join(cache_dir, "plans")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    force = set(STAGES) if "all" in args.force else set(args.force)
+    state = BuildState(os.path.join(cache_dir, "state.json"))
+    report = RunReport()
+    index = None
+
+    def current(stage: str, key: str) -> bool:
+        return stage not in force and state.is_current(stage, key)
+
+    try:
+        if args.no_fetch:
+            report.skip("fetch", "--no-fetch")
+        else:
+            with report.stage("fetch") as entry:
+                entry.update(run_fetch(corpus_dir, args.workers, args.compress))
+
+        with report.stage("chunk") as entry:
+            stats = chunk_corpus(corpus_dir, chunk_artifacts_dir, config.sections_path, state, args.workers,
+                                 force="chunk" in force)
+            artifacts = stats.pop("artifacts")
+            entry.update(stats)
+            entry["artifact_bytes"] = sum(artifact_sizes(artifacts).values())
+            if not artifacts:
+                raise RuntimeError(f"No XML documents could be chunked under {corpus_dir}")
+
+        # Artifact names are content hashes, so the list of names keys everything downstream
+        dedupe_key = digest("dedupe", DEDUPE_VERSION, config.build_dedupe_chunks,
+                            [os.path.basename(artifact) for artifact in artifacts])
+        with report.stage("dedupe") as entry:
+            entry["key"] = dedupe_key
+            if current("dedupe", dedupe_key):
+                entry["status"] = "cached"
+            else:
+                entry.update(dedupe_chunks(artifacts, chunks_path, dedupe=config.build_dedupe_chunks))
+                state.record("dedupe", dedupe_key, [chunks_path])
+            entry["artifacts"] = artifact_sizes([chunks_path])
+
+        embed_key = digest("embed", EMBED_VERSION, dedupe_key, config.embedding_model, config.embedding_dimension)
+        plan_path = os.path.join(plans_dir, f"{embed_key}.json")
+        with report.stage("embed") as entry:
+            entry["key"] = embed_key
+            if current("embed", embed_key) and os.path.exists(plan_path):
+                entry["status"] = "cached"
+            else:
+                entry.update(embed_chunks(chunks_path, plan_path, cache_dir))
+                prune_artifacts(plans_dir, [plan_path])
+                state.record("embed", embed_key, [plan_path])
+            entry["artifacts"] = artifact_sizes([plan_path, os.path.join(cache_dir, "embeddings.sqlite")])
+
+        index_key = digest("index", INDEX_VERSION, embed_key, args.pca_dim)
+        index_outputs = [config.faiss_index_path, config.faiss_metadata_path, config.entity_index_path]
+        with report.stage("index") as entry:
+            entry["key"] = index_key
+            if current("index", index_key):
+                entry["status"] = "cached"
+            else:
+                index, stats = build_index(plan_path, cache_dir, pca_dim=args.pca_dim)
+                entry.update(stats)
+                state.record("index", index_key, index_outputs)
+            entry["artifacts"] = artifact_sizes(index_outputs)
+
+        from .build_faiss import refresh_facts, refresh_stored_reports
+        from .fact_store import FACTS_VERSION
+
+        facts_key = digest("facts", FACTS_VERSION, index_key)
+        with report.stage("facts") as entry:
+            entry["key"] = facts_key
+            if current("facts", facts_key):
+                entry["status"] = "cached"
+            else:
+                entry.update(refresh_facts(read_json(plan_path)))
+                state.record("facts", facts_key, [config.fact_store_path])
+            entry["artifacts"] = artifact_sizes([config.fact_store_path])
+
+        if args.skip_reports or not config.summarizer_precompute_reports:
+            report.skip("reports", "--skip-reports" if args.skip_reports else "precompute_reports is off")
+        else:
+            from .summarizer import REPORT_PROMPT_VERSION
+
+            reports_key = digest("reports", index_key, REPORT_PROMPT_VERSION, config.summarizer_model)
+            with report.stage("reports") as entry:
+                entry["key"] = reports_key
+                if current("reports", reports_key):
+                    entry["status"] = "cached"
+                else:
+                    if index is None:
+                        import faiss
+                        index = faiss.read_index(config.faiss_index_path)
+                    entry.update(refresh_stored_reports(read_json(plan_path), index))
+                    # Documents whose report failed are retried on the next run
+                    if not entry["missing"]:
+                        state.record("reports", reports_key)
+                entry["artifacts"] = artifact_sizes([config.report_store_path])
+
+        if not args.no_fetch:
+            consume_sync_events(corpus_dir)
+        return True
+    except Exception as e:
+        logger.error(f"❌ Build failed: {e}")
+        return False
+    finally:
+        report_path = report.save(config.build_runs_dir)
+        logger.info(f"📄 Run report saved as {report_path}")
+        for entry in report.stages:
+            logger.info(f"   {entry['stage']:<8} {entry['status']:<8} {entry['seconds']:>8.2f}s")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="RegHealth build pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Fetch, chunk, dedupe, embed and index the corpus")
+    build_parser.add_argument("--no-fetch", action="store_true",
+                              help="Build from the documents already on disk")
+    build_parser.add_argument("--force", nargs="+", default=[], choices=STAGES + ("all",),
+                              help="Re-run these stages even if their inputs are unchanged")
+    build_parser.add_argument("--workers", type=int, default=config.build_workers,
+                              help="Documents chunked (and downloaded) in parallel")
+    build_parser.add_argument("--compress", choices=["none", "gzip", "zstd"], default="none",
+                              help="Storage compression of newly fetched documents")
+    build_parser.add_argument("--pca-dim", type=int, default=config.embedding_pca_dim,
+                              help="Reduce vectors to this many dimensions with PCA")
+    build_parser.add_argument("--skip-reports", action="store_true",
+                              help="Do not refresh the precomputed report store")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    args = parse_args()
+    if args.command == "build":
+        sys.exit(0 if build(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
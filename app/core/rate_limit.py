@@ -0,0 +1,146 @@
+"""
+rate_limit.py
+
+Client-side pacing and retry helpers shared by the OpenAI-backed pipelines.
+"""
+import random
+import threading
+import time
+import logging
+from typing import Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Attributes:
+        rate (float): Tokens added per second
+        capacity (float): Maximum tokens the bucket can hold
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize TokenBucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1) -> None:
+        """
+        Block until `amount` tokens are available, then take them.
+
+        Requests larger than the capacity are clamped so they can still proceed
+        once the bucket is full.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Paces calls against requests-per-minute and tokens-per-minute limits.
+
+    Either limit may be None to disable it.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        """
+        Initialize RateLimiter.
+
+        Args:
+            requests_per_minute: Maximum requests per minute
+            tokens_per_minute: Maximum tokens per minute
+        """
+        self.requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request carrying `tokens` tokens may be sent."""
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens and tokens:
+            self.tokens.acquire(tokens)
+
+
+def is_retryable_openai_error(exc: Exception) -> bool:
+    """Return True for transient OpenAI errors (429, 5xx, timeouts, dropped connections)."""
+    import openai
+
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES or exc.status_code >= 500
+    return False
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Read a Retry-After header from an API error response, if present."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_with_backoff(fn: Callable[[], T], max_retries: int = 6, base_delay: float = 1.0,
+                       max_delay: float = 60.0,
+                       is_retryable: Callable[[Exception], bool] = is_retryable_openai_error) -> T:
+    """
+    Call `fn`, retrying transient failures with jittered exponential backoff.
+
+    Args:
+        fn: Zero-argument callable to invoke
+        max_retries: Number of retries after the first attempt
+        base_delay: Delay ceiling for the first retry, in seconds
+        max_delay: Upper bound for any single delay, in seconds
+        is_retryable: Predicate deciding whether an exception is transient
+
+    Returns:
+        The value returned by `fn`
+
+    Raises:
+        The last exception once retries are exhausted or the error is not retryable
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            # Full jitter, but never sooner than the server asked us to wait
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            delay = max(delay, _retry_after_seconds(e) or 0)
+            attempt += 1
+            logger.warning(f"Transient error ({e.__class__.__name__}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,63 @@
+"""
+report_store.py
+
+Persistent store of finished business-intelligence reports, keyed by
+document and prompt version, so report reads are a key lookup.
+"""
+from typing import Any, Dict, Iterable, Optional
+
+from .sqlite_store import SQLiteStore
+
+
+class ReportStore(SQLiteStore):
+    """
+    SQLite-backed store of generated reports.
+
+    Each document keeps one report per prompt version, tagged with the hash
+    of the chunk set it was generated from. A report is only served while
+    that hash still matches the document's current chunks.
+
+    Attributes:
+        path (str): Path of the SQLite database file
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS reports (
+               source_file TEXT NOT NULL,
+               prompt_version TEXT NOT NULL,
+               chunk_set_hash TEXT NOT NULL,
+               report TEXT NOT NULL,
+               created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+               PRIMARY KEY (source_file, prompt_version)
+           )""",
+    )
+
+    def get(self, source_file: str, prompt_version: str, chunk_set_hash: str) -> Optional[Dict[str, Any]]:
+        """Return {"report", "created_at"} if a current report exists, else None."""
+        row = self._fetchone(
+            "SELECT report, created_at FROM reports "
+            "WHERE source_file = ? AND prompt_version = ? AND chunk_set_hash = ?",
+            (source_file, prompt_version, chunk_set_hash)
+        )
+        return {"report": row[0], "created_at": row[1]} if row else None
+
+    def put(self, source_file: str, prompt_version: str, chunk_set_hash: str, report: str) -> None:
+        """Store a report, replacing any earlier one for the same document and prompt version."""
+        self._execute(
+            "INSERT OR REPLACE INTO reports (source_file, prompt_version, chunk_set_hash, report) "
+            "VALUES (?, ?, ?, ?)",
+            (source_file, prompt_version, chunk_set_hash, report)
+        )
+
+    def invalidate(self, source_file: str) -> None:
+        """Drop every stored report for a document."""
+        self._execute("DELETE FROM reports WHERE source_file = ?", (source_file,))
+
+    def prune(self, source_files: Iterable[str]) -> int:
+        """Drop reports of documents not in `source_files`; returns the number removed."""
+        keep = set(source_files)
+        stored = {row[0] for row in self._fetchall("SELECT DISTINCT source_file FROM reports")}
+        removed = stored - keep
+        for source_file in removed:
+            self.invalidate(source_file)
+        return len(removed)
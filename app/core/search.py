@@ -5,15 +5,16 @@ Main functionality: Receive user query, return relevant document chunks
 import os
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 import numpy as np
-import faiss
-import openai
 import json
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 import logging
-import sys
-from pathlib import Path
+from .entity_index import ENTITY_INDEX_VERSION, extract_entity_groups, load_entity_index, ranking_words
+from .fact_store import FactStore, templated_answer
+from .section_index import load_section_index, read_source_span, section_index_path, source_changed, subtree_section_ids
 logger = logging.getLogger(__name__)
-sys.path.append(str(Path(__file__).parent.parent))
+
+# Supporting chunks cited by an answer from the facts table
+MAX_FACT_SOURCES = 3
 
 
 class ChatSearchService:
@@ -22,13 +23,25 @@ class ChatSearchService:
     1. Retrieval: Search relevant chunks from pre-built index
     2. Generation: Use LLM to generate answers based on chunks
 
-    Two search modes:
+    Three search modes:
     1. With filter: Filter results from pre-built index
     2. Without filter: Direct search using pre-built FAISS index
+    3. Section-scoped: Search only the chunks of a section subtree (needs section indexes)
+
+    Queries naming CPT/HCPCS codes, CFR sections or dollar amounts are first
+    looked up in the entity index; enough exact hits skip the embedding call,
+    fewer are ranked ahead of the dense results.
+
+    Single-value questions ("What is the FY 2025 hospice cap amount?") are
+    answered from the facts table extracted at build time when the fact is
+    confident enough, without retrieval or an LLM call.
     """
 
     def __init__(self, openai_api_key: str, faiss_index_path: str = "../rag_data/faiss.index",
-                 metadata_path: str = "../rag_data/faiss_metadata.json"):
+                 metadata_path: str = "../rag_data/faiss_metadata.json", mmap_index: bool = False,
+                 sections_dir: Optional[str] = None, entity_index_path: Optional[str] = None,
+                 entity_min_hits: int = 3, fact_min_confidence: float = 0.8,
+                 embedding_model: str = "text-embedding-ada-002"):
         """
         Initialize
 
@@ -36,23 +49,127 @@ class ChatSearchService:
             openai_api_key: OpenAI API key
             faiss_index_path: FAISS index file path
             metadata_path: Metadata file path
+            mmap_index: Memory-map the index vectors read-only instead of copying them into memory
+            sections_dir: Directory of the chunker's per-document section indexes
+            entity_index_path: Entity postings built with the index (see entity_index.py)
+            entity_min_hits: Chunks matching every query entity needed to skip dense search
+            fact_min_confidence: Fact confidence needed to answer without the LLM
+            embedding_model: Model embedding the queries; must be the one the index was built with
+
+        Raises:
+            ValueError: If the metadata records a different embedding model
         """
+        # faiss and openai are slow to import, so only pay for them once a service is built
+        import faiss
+        import openai
+
         self.openai_client = openai.OpenAI(api_key=openai_api_key)
 
-        # Load pre-built FAISS index
-        self.faiss_index = faiss.read_index(faiss_index_path)
+        # Load pre-built FAISS index; memory-mapped vectors live in the page cache,
+        # so every process serving the same file shares one copy
+        io_flags = 0
+        if mmap_index and hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            io_flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+        self.faiss_index = faiss.read_index(faiss_index_path, io_flags)
 
         # Load metadata (contains all chunks information)
         with open(metadata_path, 'r', encoding='utf-8') as f:
             self.all_chunks = json.load(f)
 
-        logger.info(f"Loaded FAISS index with {self.faiss_index.ntotal} vectors")
+        logger.info(f"Loaded FAISS index with {self.faiss_index.ntotal} vectors" + (" (memory-mapped)" if io_flags else ""))
+
+        # PCA-reduced indexes wrap their projection in an IndexPreTransform, so
+        # FAISS applies the same transform to query vectors at search time
+        base_index = faiss.downcast_index(getattr(self.faiss_index, "index", self.faiss_index))
+        if isinstance(base_index, faiss.IndexPreTransform):
+            logger.info(f"Index uses a {self.faiss_index.d} -> {base_index.index.d} dimension PCA projection")
         logger.info(f"Loaded metadata with {len(self.all_chunks)} chunks")
 
+        # Query vectors from another model than the index's would match nothing meaningful.
+        # Rows built before the model was recorded carry none
+        self.embedding_model = embedding_model
+        index_models = {chunk.get("embedding_model") for chunk in self.all_chunks} - {None}
+        if index_models and index_models != {embedding_model}:
+            raise ValueError(f"Index was built with {', '.join(sorted(index_models))} but queries would be "
+                             f"embedded with {embedding_model}; rebuild the index or change embedding_model")
+
+        # Indexes built with stable chunk ids return ids instead of row positions
+        self.chunks_by_id = {chunk["id"]: chunk for chunk in self.all_chunks if "id" in chunk}
+
+        # Index ids of each section's chunks, keyed by (source_file, section_id), for section-scoped search
+        self.sections_dir = sections_dir
+        self.section_indexes: Dict[str, Dict] = {}
+        self.ids_by_section: Dict[Tuple[str, int], List[int]] = {}
+        # Documents by (metadata key, value), so filters resolve to source files without a
+        # scan; every chunk carries a copy of its document's metadata, so the first one is enough
+        self.source_files_by_metadata: Dict[Tuple[str, Any], set] = {}
+        indexed_source_files = set()
+        for position, chunk in enumerate(self.all_chunks):
+            metadata = chunk.get("metadata", {})
+            if chunk.get("section_id") is not None:
+                key = (metadata.get("source_file"), chunk["section_id"])
+                self.ids_by_section.setdefault(key, []).append(chunk.get("id", position))
+            source_file = metadata.get("source_file")
+            if source_file not in indexed_source_files:
+                indexed_source_files.add(source_file)
+                for item in metadata.items():
+                    if isinstance(item[1], (str, int, float)):
+                        self.source_files_by_metadata.setdefault(item, set()).add(source_file)
+
+        # Entity postings point at metadata row positions, so they must come from the same build
+        self.entity_min_hits = entity_min_hits
+        self.entity_postings: Dict[str, List[int]] = {}
+        self.entity_row_words: Dict[int, frozenset] = {}
+        if entity_index_path and os.path.exists(entity_index_path):
+            entity_index = load_entity_index(entity_index_path)
+            if entity_index.get("version") != ENTITY_INDEX_VERSION:
+                logger.warning(f"Entity index has version {entity_index.get('version')}, expected {ENTITY_INDEX_VERSION}; ignoring it until the next build")
+            elif entity_index["rows"] == len(self.all_chunks):
+                self.entity_postings = entity_index["postings"]
+                self.entity_row_words = {int(position): frozenset(words)
+                                         for position, words in entity_index["words"].items()}
+                logger.info(f"Loaded entity index with {len(self.entity_postings)} entities")
+            else:
+                logger.warning(f"Entity index covers {entity_index['rows']} rows but metadata has {len(self.all_chunks)}; ignoring it until the next build")
+
+        # Facts cite chunk ids; answers whose chunks aren't in this metadata fall back to RAG.
+        # The table is opened per process by open_fact_store()
+        self.fact_min_confidence = fact_min_confidence
+        self.fact_store: Optional[FactStore] = None
+
         # Validate consistency between index and metadata
         if self.faiss_index.ntotal != len(self.all_chunks):
             logger.warning(f"Warning: FAISS index contains {self.faiss_index.ntotal} vectors, but metadata contains {len(self.all_chunks)} chunks. Inconsistency detected!")
 
+    def open_fact_store(self, fact_store_path: str) -> None:
+        """
+        Open the facts table built with the index (see fact_store.py)
+        A SQLite connection must not cross a fork, so each serving process
+        opens its own after the shared index is loaded
+
+        Args:
+            fact_store_path: Facts table path; single-value questions go through RAG if it doesn't exist
+        """
+        self.fact_store = FactStore(fact_store_path) if os.path.exists(fact_store_path) else None
+
+    def _lookup_chunk(self, idx: int) -> Dict:
+        """
+        Resolve a FAISS search result to its metadata row
+
+        Args:
+            idx: Stable chunk id, or row position for indexes built without ids
+
+        Returns:
+            Copy of the chunk dictionary, or None if not found
+        """
+        if self.chunks_by_id:
+            chunk = self.chunks_by_id.get(int(idx))
+        elif 0 <= idx < len(self.all_chunks):
+            chunk = self.all_chunks[idx]
+        else:
+            chunk = None
+        return chunk.copy() if chunk is not None else None
+
     def embed_text(self, text: str) -> np.ndarray:
         """
         Convert text to vector
@@ -64,7 +181,7 @@ class ChatSearchService:
             Vector (1536 dimensions)
         """
         response = self.openai_client.embeddings.create(
-            model="text-embedding-ada-002",
+            model=self.embedding_model,
             input=text
         )
         return np.array(response.data[0].embedding, dtype='float32')
@@ -93,9 +210,8 @@ class ChatSearchService:
         # Step 2: Apply filters
         filtered_results = []
         for idx, dist in zip(indices[0], distances[0]):
-            if 0 <= idx < len(self.all_chunks):
-                chunk = self.all_chunks[idx].copy()
-
+            chunk = self._lookup_chunk(idx)
+            if chunk is not None:
                 # Check if all filter conditions are met
                 match = True
                 for key, value in filters.items():
@@ -137,13 +253,224 @@ class ChatSearchService:
         # Return results
         results = []
         for idx, dist in zip(indices[0], distances[0]):
-            if 0 <= idx < len(self.all_chunks):
-                chunk = self.all_chunks[idx].copy()
+            chunk = self._lookup_chunk(idx)
+            if chunk is not None:
+                chunk['distance'] = float(dist)
+                results.append(chunk)
+
+        return results
+
+    def search_entities(self, query: str, filters: Dict[str, Any] = None, top_k: int = 20) -> List[Dict]:
+        """
+        Exact lookup of the codes, code ranges, CFR sections and dollar amounts named in the query
+        No embedding call: postings are read straight from the entity index
+
+        Args:
+            query: User's question
+            filters: Optional filter conditions, as in search_with_filter
+            top_k: Return top k results
+
+        Returns:
+            Chunks ranked by how many query entities they mention, then by how
+            many other query words they contain; "distance" is the share of
+            query entities missing (0.0 when every one matched)
+        """
+        groups = extract_entity_groups(query)
+        if not groups or not self.entity_postings:
+            return []
+
+        # One pass over the postings records both the groups and the keys each chunk matched
+        matched_groups: Dict[int, set] = {}
+        matched_keys: Dict[int, List[str]] = {}
+        for group_index, keys in enumerate(groups):
+            for key in keys:
+                for position in self.entity_postings.get(key, ()):
+                    matched_groups.setdefault(position, set()).add(group_index)
+                    matched_keys.setdefault(position, []).append(key)
+
+        words = frozenset(ranking_words(query))
+        ranked = []
+        for position, group_indexes in matched_groups.items():
+            chunk = self.all_chunks[position]
+            if filters and any(chunk.get('metadata', {}).get(key) != value for key, value in filters.items()):
+                continue
+            missing = len(groups) - len(group_indexes)
+            shared_words = len(words & self.entity_row_words.get(position, frozenset()))
+            ranked.append((missing, -shared_words, position))
+        ranked.sort()
+
+        results = []
+        for missing, _, position in ranked[:top_k]:
+            chunk = self.all_chunks[position].copy()
+            chunk['distance'] = round(missing / len(groups), 4)
+            chunk['entity_matches'] = matched_keys[position]
+            results.append(chunk)
+
+        logger.info(f"Entity lookup for {groups} matched {len(matched_groups)} chunks")
+        return results
+
+    def answer_from_facts(self, query: str, filters: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Templated answer to a single-value question from the facts table
+        No retrieval and no LLM call
+
+        Args:
+            query: User's question
+            filters: Optional filter conditions, applied to the facts' source chunks
+
+        Returns:
+            Result shaped like generate_answer's, or None if the question isn't
+            a single-value one or no fact is confident enough
+        """
+        if self.fact_store is None:
+            return None
+        source_files = None
+        if filters:
+            try:
+                source_files = set.intersection(*(self.source_files_by_metadata.get(item, set())
+                                                  for item in filters.items()))
+            except TypeError:
+                # Unhashable filter values (lists, dicts) match no document's metadata
+                source_files = set()
+        fact = self.fact_store.answer(query, source_files)
+        if fact is None or fact["answer_confidence"] < self.fact_min_confidence:
+            return None
+
+        sources_used = []
+        for supporting in fact["supporting"]:
+            chunk = self._lookup_chunk(supporting["chunk_id"])
+            if chunk is None or any(source["chunk_id"] == str(chunk.get("id")) for source in sources_used):
+                continue
+            sources_used.append({
+                "source_id": len(sources_used) + 1,
+                "chunk_id": str(chunk["id"]) if "id" in chunk else None,
+                "section_id": chunk.get("section_id"),
+                "text_preview": supporting["snippet"],
+                "distance": 0.0,
+                "metadata": chunk.get('metadata', {})
+            })
+            if len(sources_used) == MAX_FACT_SOURCES:
+                break
+        if not sources_used:
+            logger.warning("Facts table doesn't match the loaded metadata; rebuild the index")
+            return None
+
+        logger.info(f"Answering from the facts table: {fact['fact_type']} = {fact['value']}")
+        return {
+            "answer": templated_answer(fact, len(sources_used)),
+            "confidence": fact["answer_confidence"],
+            "sources_used": sources_used,
+            "total_sources": len(fact["supporting"]),
+            "fact": {key: fact[key] for key in ("fact_type", "value", "unit", "program", "period", "year", "stage")}
+        }
+
+    def get_section_index(self, source_file: str) -> Dict:
+        """
+        Get a document's section index, loading it from its sidecar file once
+
+        Args:
+            source_file: Document the index belongs to
+
+        Returns:
+            Section index (see section_index.py)
+
+        Raises:
+            FileNotFoundError: If no section index exists for the document
+        """
+        if source_file not in self.section_indexes:
+            if not self.sections_dir:
+                raise FileNotFoundError("No section index directory configured")
+            self.section_indexes[source_file] = load_section_index(section_index_path(self.sections_dir, source_file))
+        return self.section_indexes[source_file]
+
+    def section_chunk_ids(self, source_file: str, section_id: int) -> List[int]:
+        """
+        Index ids of the chunks in a section and all its subsections
+
+        Args:
+            source_file: Document containing the section
+            section_id: Section id from the document's section index
+
+        Returns:
+            List of FAISS ids (row positions for indexes built without ids)
+        """
+        index = self.get_section_index(source_file)
+        return [chunk_id for sid in subtree_section_ids(index, section_id)
+                for chunk_id in self.ids_by_section.get((source_file, sid), [])]
+
+    def search_in_section(self, query: str, source_file: str, section_id: int, top_k: int = 20) -> List[Dict]:
+        """
+        Search only the chunks of a section subtree
+        FAISS skips every other vector through an ID selector, so results are
+        exact within the section however small it is
+
+        Args:
+            query: User's question
+            source_file: Document containing the section
+            section_id: Section id from the document's section index
+            top_k: Return top k results
+
+        Returns:
+            List of relevant chunks
+        """
+        import faiss
+
+        ids = self.section_chunk_ids(source_file, section_id)
+        if not ids:
+            return []
+        selector = faiss.IDSelectorBatch(np.array(ids, dtype="int64"))
+        query_embedding = self.embed_text(query).reshape(1, -1)
+        distances, indices = self.faiss_index.search(query_embedding, min(top_k, len(ids)),
+                                                     params=faiss.SearchParameters(sel=selector))
+
+        results = []
+        for idx, dist in zip(indices[0], distances[0]):
+            chunk = self._lookup_chunk(idx) if idx >= 0 else None
+            if chunk is not None:
                 chunk['distance'] = float(dist)
                 results.append(chunk)
 
+        logger.info(f"Returned {len(results)} results from section {section_id} of {source_file}")
         return results
 
+    def chunk_source(self, chunk_id: int, context: int = 0) -> Dict[str, Any]:
+        """
+        Exact source XML of a chunk, read with one seek from its byte span
+
+        Args:
+            chunk_id: Chunk id (row position for indexes built without ids)
+            context: Extra bytes of source to include before and after the chunk
+
+        Returns:
+            Dictionary with source_file, section path, byte span and XML text
+
+        Raises:
+            KeyError: If the chunk id is unknown
+            ValueError: If the chunk has no source span or its file changed since it was indexed
+        """
+        chunk = self._lookup_chunk(chunk_id)
+        if chunk is None:
+            raise KeyError(f"Unknown chunk: {chunk_id}")
+        source_file = chunk.get("metadata", {}).get("source_file")
+        if not chunk.get("source_span"):
+            raise ValueError(f"Chunk {chunk_id} has no source offsets; rebuild the index to add them")
+        index = self.get_section_index(source_file)
+        if source_changed(index):
+            raise ValueError(f"{source_file} changed since it was indexed; rebuild the index")
+
+        start = max(0, chunk["source_span"][0] - context)
+        end = chunk["source_span"][1] + context
+        section_id = chunk.get("section_id")
+        return {
+            "chunk_id": str(chunk_id),
+            "source_file": source_file,
+            "section_id": section_id,
+            "section_path": index["sections"][section_id]["path"] if section_id is not None else chunk.get("section_header"),
+            "start": start,
+            "end": end,
+            "xml": read_source_span(index["path"], start, end).decode("utf-8", errors="replace")
+        }
+
     def generate_answer(self, query: str, chunks: List[Dict], max_context_length: int = 4000) -> Dict[str, Any]:
         """
         Use LLM to generate answers based on retrieved chunks
@@ -179,6 +506,9 @@ class ChatSearchService:
             current_length += len(chunk_text)
             sources_used.append({
                 "source_id": i+1,
+                # 63-bit ids don't fit a JavaScript number, so they travel as strings
+                "chunk_id": str(chunk["id"]) if "id" in chunk else None,
+                "section_id": chunk.get("section_id"),
                 "text_preview": chunk['text'][:100] + "..." if len(chunk['text']) > 100 else chunk['text'],
                 "distance": chunk.get('distance', 0),
                 "metadata": chunk.get('metadata', {})
@@ -248,7 +578,8 @@ Answer:"""
                 "total_sources": len(chunks)
             }
 
-    def ask_question(self, query: str, filters: Dict[str, Any] = None, top_k: int = 5) -> Dict[str, Any]:
+    def ask_question(self, query: str, filters: Dict[str, Any] = None, top_k: int = 5,
+                     section: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Complete RAG Q&A process: Retrieval + Generation
 
@@ -256,20 +587,49 @@ Answer:"""
             query: User's question
             filters: Optional filter conditions
             top_k: Number of chunks to retrieve
+            section: Optional scope, {"source_file": str, "section_id": int}; takes precedence over filters
 
         Returns:
             Complete Q&A result including answer, sources, and metadata
         """
         logger.info(f"Processing question: {query}")
 
+        # Step 0: Single-value questions the facts table answers confidently need no retrieval
+        result = None if section else self.answer_from_facts(query, filters)
+        if result is not None:
+            result.update({
+                "query": query,
+                "filters_applied": filters,
+                "section": section,
+                "retrieval_method": "facts"
+            })
+            return result
+
         # Step 1: Retrieve relevant chunks
-        if filters:
-            logger.info(f"Retrieving with filters: {filters}")
-            chunks = self.search_with_filter(query, filters, top_k)
+        entity_chunks = [] if section else self.search_entities(query, filters, top_k)
+        exact_chunks = [chunk for chunk in entity_chunks if chunk['distance'] == 0]
+        if section:
+            logger.info(f"Retrieving within section: {section}")
+            chunks = self.search_in_section(query, section["source_file"], int(section["section_id"]), top_k)
+            retrieval_method = "section"
+        elif len(exact_chunks) >= min(self.entity_min_hits, top_k):
+            # Enough chunks name every code in the query: no embedding call needed
+            logger.info(f"Answering from {len(exact_chunks)} exact entity matches")
+            chunks = exact_chunks
+            retrieval_method = "entity"
         else:
-            logger.info("Retrieving without filters")
-            print(f"Retrieving without filters")
-            chunks = self.search_without_filter(query, top_k)
+            if filters:
+                logger.info(f"Retrieving with filters: {filters}")
+                chunks = self.search_with_filter(query, filters, top_k)
+            else:
+                logger.info("Retrieving without filters")
+                chunks = self.search_without_filter(query, top_k)
+            retrieval_method = "filtered" if filters else "unfiltered"
+            if entity_chunks:
+                # Boost: entity matches first, then dense results not already included
+                seen = {chunk.get('id', chunk['text']) for chunk in entity_chunks}
+                chunks = (entity_chunks + [chunk for chunk in chunks if chunk.get('id', chunk['text']) not in seen])[:top_k]
+                retrieval_method += "+entity"
 
         logger.info(f"Retrieved {len(chunks)} relevant chunks")
 
@@ -280,7 +640,8 @@ Answer:"""
         result.update({
             "query": query,
             "filters_applied": filters,
-            "retrieval_method": "filtered" if filters else "unfiltered"
+            "section": section,
+            "retrieval_method": retrieval_method
         })
 
         logger.info(f"Answer generation completed, confidence: {result['confidence']}")
@@ -315,7 +676,7 @@ Answer:"""
         else:
             raise IndexError(f"Index {index} out of range")
 
-    def ask_query(self, query):
+    def ask_query(self, query, section=None):
         # Example usage
         try:
             # Initialize service with actual FAISS index and metadata files
@@ -341,7 +702,7 @@ Answer:"""
                     print("Exiting...")
                     break
             '''
-            result = self.ask_question(query, top_k=10)
+            result = self.ask_question(query, top_k=10, section=section)
             print(f"Question: {result['query']}")
             print(f"Answer: {result['answer']}")
             print(f"Confidence: {result['confidence']}")
@@ -0,0 +1,89 @@
+"""
+section_index.py
+
+Per-document sidecar index written by the chunker: the HD1/HD2/HD3 section
+hierarchy, each chunk's byte span in the source XML and the chunks of each
+section. Search uses it to scope a query to a section subtree, and citations
+read a chunk's exact source text with one seek instead of re-parsing the
+document.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .atomic_io import write_json
+from .compression import open_xml
+from .data_fetcher.manifest import file_sha256
+
+# Bump when the sidecar layout changes
+SECTION_INDEX_VERSION = 2
+
+
+def section_index_path(sections_dir: str, source_file: str) -> str:
+    """Sidecar path of a document, from its source_file (canonical .xml name)."""
+    return os.path.join(sections_dir, Path(source_file).stem + ".json")
+
+
+def save_section_index(path: str, index: Dict[str, Any]) -> None:
+    write_json(path, index)
+
+
+def load_section_index(path: str) -> Dict[str, Any]:
+    """
+    Read a sidecar index, resolving its source path against the sidecar's directory.
+
+    Raises:
+        FileNotFoundError: If the document has no sidecar
+    """
+    with open(path, "r") as f:
+        index = json.load(f)
+    index["path"] = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path)), index["path"]))
+    return index
+
+
+def subtree_section_ids(index: Dict[str, Any], section_id: int) -> List[int]:
+    """
+    Ids of a section and all its descendants.
+
+    Raises:
+        KeyError: If the document has no such section
+    """
+    sections = index["sections"]
+    if not 0 <= section_id < len(sections):
+        raise KeyError(f"Unknown section {section_id} in {index['source_file']}")
+    # Sections are stored in document order, so parents always precede their children
+    subtree = {section_id}
+    for section in sections[section_id + 1:]:
+        if section["parent"] in subtree:
+            subtree.add(section["id"])
+    return sorted(subtree)
+
+
+def source_changed(index: Dict[str, Any]) -> bool:
+    """
+    Whether a document's XML changed since its sidecar was written.
+
+    Size and mtime are checked first; a different mtime with the same size
+    falls back to comparing the SHA-256, and a match is remembered.
+    """
+    stat = os.stat(index["path"])
+    if stat.st_size != index["size"] or "sha256" not in index:
+        return True
+    if stat.st_mtime_ns != index["mtime_ns"]:
+        if file_sha256(Path(index["path"])) != index["sha256"]:
+            return True
+        index["mtime_ns"] = stat.st_mtime_ns
+    return False
+
+
+def read_source_span(path: str, start: int, end: int) -> bytes:
+    """
+    Bytes [start, end) of a document's XML.
+
+    Plain files cost one seek and one read; compressed files are decompressed
+    forward up to `start` without parsing.
+    """
+    with open_xml(path) as f:
+        f.seek(start)
+        return f.read(end - start)
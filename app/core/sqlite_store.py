@@ -0,0 +1,73 @@
+"""
+sqlite_store.py
+
+Base class of the local SQLite stores (embedding cache, extraction cache,
+report store, job queue, download manifest, facts table): one connection
+shared by every thread, with each statement or transaction serialized by a
+lock and committed before the lock is released.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+
+class SQLiteStore:
+    """
+    SQLite database shared by threads, created with its schema on first open.
+
+    Subclasses list their CREATE TABLE / CREATE INDEX statements in SCHEMA.
+
+    Attributes:
+        path (str): Path of the SQLite database file
+    """
+
+    SCHEMA: Sequence[str] = ()
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the database and its schema.
+
+        Args:
+            path: Path of the SQLite database file (created if missing)
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._transaction() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold the lock for several statements, committing them together (or rolling back on error)."""
+        with self._lock:
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _execute(self, sql: str, params: Sequence[Any] = ()) -> None:
+        with self._transaction() as conn:
+            conn.execute(sql, params)
+
+    def _executemany(self, sql: str, rows: Iterable[Sequence[Any]]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(sql, rows)
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
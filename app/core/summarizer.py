@@ -1,17 +1,34 @@
+"""
+summarizer.py
+
+Business-intelligence report generation over pre-processed rule chunks.
+
+Usage (from the repository root):
+    python -m app.core.summarizer
+"""
 import os
+import re
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any
-from openai import OpenAI, APIStatusError, APIConnectionError, APITimeoutError
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator
+from ..config import config
+from .rate_limit import RateLimiter, retry_with_backoff, is_retryable_openai_error
+from .summary_cache import ExtractionCache, text_hash
+from .report_store import ReportStore
 
 # -------- OpenAI Client Initialization --------
-api_key = os.getenv("OPENAI_API_KEY")
 client = None
-if api_key:
-    client = OpenAI(api_key=api_key)
-else:
-    print("Error: OPENAI_API_KEY environment variable not set. Please set it before running.")
-    exit(1)
+
+def get_client():
+    """Return the shared OpenAI client, creating it on first use (None if OPENAI_API_KEY is not set)."""
+    global client
+    if client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if api_key:
+            from openai import OpenAI
+            client = OpenAI(api_key=api_key)
+    return client
 
 # -------- ADVANCED PROMPT TEMPLATES (V3 - Added Flexibility) --------
 
@@ -97,59 +114,640 @@ Create a concise, actionable checklist for our company and customers. Use the sp
 [End of structured JSON data]
 """
 
-# -------- Summarization Function --------
-def generate_report(chunks_data: List[Dict], file_name: str) -> str:
-    global client
-    if not client: return "Error: OpenAI API key not set."
+# 중간 단계 프롬프트: 토큰 예산을 넘는 대형 문서를 위해 청크 요약을 계층적으로 병합
+REDUCE_PROMPT = """
+You are a senior compliance analyst consolidating structured notes taken from consecutive parts of a Medicare regulation.
 
-    individual_summaries: List[Dict[str, Any]] = []
+Merge the JSON objects below into ONE JSON object with exactly these keys:
+1.  **section_header**: The section these notes come from (use the common section if there is one).
+2.  **topic**: A list of the regulatory topics covered.
+3.  **key_changes**: A bulleted list of the specific policy changes. Keep every condition, exception and expiration date.
+4.  **quantitative_data**: Every specific number, percentage, dollar amount, CPT/HCPCS code and date. Never drop or round a value; remove only exact duplicates.
+5.  **stakeholders_affected**: The combined list of impacted groups, without duplicates.
 
-    for i, chunk_info in enumerate(chunks_data):
-        chunk_text = chunk_info.get('page_content') or chunk_info.get('text', '')
-        if not chunk_text.strip(): continue
+Provide the response as a single, valid JSON object.
 
-        prompt = COMPANY_SPECIFIC_CHUNK_PROMPT.format(chunk=chunk_text)
-        print(f"🔄 Analyzing chunk {i+1}/{len(chunks_data)} for {file_name}...")
+[Start of JSON notes]
+{summaries}
+[End of JSON notes]
+"""
 
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.0,
-                response_format={"type": "json_object"}
-            )
-            summary_json_str = response.choices[0].message.content
-            parsed_summary = json.loads(summary_json_str)
-            individual_summaries.append(parsed_summary)
-            print(f"✅ Chunk {i+1} analyzed.")
-        except Exception as e:
-            print(f"❌ Error analyzing chunk {i+1}: {e}")
-            continue
+# Retrieval anchors for pre-selection: one query per topic the final report covers
+TOPIC_ANCHORS = {
+    "Key Dates": "date the final rule was released and the date it becomes effective",
+    "Conversion Factor": "physician fee schedule conversion factor for the calendar year and its percentage change from the prior year",
+    "KX Modifier Threshold": "KX modifier therapy threshold amounts for physical therapy, speech-language pathology and occupational therapy, and the medical review threshold",
+    "Misvalued Codes": "potentially misvalued codes nominated for review, including therapy codes",
+    "Telehealth": "Medicare telehealth services list, physical and occupational therapists and speech-language pathologists as distant site practitioners, temporary flexibilities extended",
+    "Virtual Supervision": "direct supervision through real-time audio-video communication technology and virtual presence",
+    "Telehealth Billing": "modifier 95 and place of service codes for telehealth claims for outpatient therapy",
+    "New Codes": "new CPT and HCPCS codes, caregiver training services 97550 97551 97552",
+    "G2211": "office/outpatient E/M visit complexity add-on code G2211 and budget neutrality",
+    "Split/Shared Visits": "split or shared evaluation and management visits and the definition of substantive portion",
+    "Skin Substitutes": "payment and coding policy for skin substitutes and wound care",
+    "Other Programs": "electronic prescribing of controlled substances, appropriate use criteria program, Medicare Shared Savings Program",
+}
+
+# 묶음 프롬프트: 짧은 청크 여러 개를 한 번의 요청으로 분석 (청크별 JSON 배열 반환)
+PACKED_CHUNK_PROMPT = """
+You are a senior compliance analyst for a healthcare technology company specializing in software for outpatient therapy (PT, OT, SLP), wound care, and telehealth.
+
+Analyze the following {count} consecutive sections of a Medicare regulation. Each section is delimited by [Start of chunk N] and [End of chunk N]. Analyze EACH chunk independently and extract key data points relevant to our business.
+
+For every chunk, extract the following information:
+1.  **chunk**: The chunk number N.
+2.  **topic**: Identify the main regulatory topic (e.g., "Conversion Factor", "Telehealth Modifiers", "Therapy Supervision", "Skin Substitutes Payment").
+3.  **key_changes**: In a bulleted list, summarize the specific policy changes. **Pay close attention to conditions, exceptions, and expiration dates (e.g., "temporary through 2024", "permanent", "does not apply to...") and include them in this summary.**
+4.  **quantitative_data**: List all specific numbers, percentages, dollar amounts, CPT/HCPCS codes, or dates mentioned (e.g., "Conversion factor is $32.7442", "3.37% decrease", "Threshold is $2330", "Codes 97550-97552").
+5.  **stakeholders_affected**: List the primary groups impacted (e.g., "Physical Therapists", "Physicians", "Hospitals", "Billing Staff").
+
+Provide the response as a single, valid JSON object of the form {{"results": [...]}}, where "results" holds exactly {count} objects, one per chunk, in chunk order.
+
+{chunks}
+"""
+
+# Extractions are cached per prompt template; editing either template invalidates them
+CHUNK_PROMPT_HASH = text_hash(COMPANY_SPECIFIC_CHUNK_PROMPT + PACKED_CHUNK_PROMPT)
+
+# Version of the whole report pipeline; stored reports are keyed by it. The
+# pre-selection settings decide which chunks a report is built from, so
+# changing them makes stored reports stale too
+REPORT_PROMPT_VERSION = text_hash("\n".join([
+    config.summarizer_model, CHUNK_PROMPT_HASH, REDUCE_PROMPT, FINAL_REPORT_PROMPT, json.dumps(TOPIC_ANCHORS),
+    json.dumps([config.summarizer_preselect, config.summarizer_preselect_per_topic,
+                config.summarizer_preselect_max_chunks])
+]))
+
+# -------- Token Counting --------
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the tokenizer used by the GPT-4 family."""
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text))
+
+# -------- Chunk Pre-selection --------
+_faiss_index = None
+_anchor_vectors = None
+
+def _load_faiss_index():
+    """Load the configured FAISS index once per process."""
+    global _faiss_index
+    if _faiss_index is None:
+        import faiss
+        _faiss_index = faiss.read_index(config.faiss_index_path)
+    return _faiss_index
+
+def embed_topic_anchors():
+    """Embed TOPIC_ANCHORS with the index's embedding model (cached per process)."""
+    global _anchor_vectors
+    if _anchor_vectors is None:
+        import numpy as np
+        response = retry_with_backoff(
+            lambda: get_client().embeddings.create(model=config.embedding_model, input=list(TOPIC_ANCHORS.values())),
+            max_retries=config.summarizer_max_retries
+        )
+        _anchor_vectors = np.array([r.embedding for r in sorted(response.data, key=lambda r: r.index)], dtype="float32")
+    return _anchor_vectors
+
+def preselect_chunks(chunks_data: List[Dict], faiss_index=None, per_topic: Optional[int] = None,
+                     max_chunks: Optional[int] = None) -> List[Dict]:
+    """
+    Keep only the chunks that score best against the report's topic anchors.
+
+    Each anchor searches the FAISS index restricted (via an ID selector) to
+    this document's chunk ids. Hits are taken round-robin by rank across
+    topics until `max_chunks` is reached, and returned in document order.
+    Documents without stable chunk ids, or already within budget, are
+    returned unchanged.
+    """
+    import faiss
+    import numpy as np
+
+    per_topic = per_topic or config.summarizer_preselect_per_topic
+    max_chunks = max_chunks or config.summarizer_preselect_max_chunks
+    if len(chunks_data) <= max_chunks:
+        return chunks_data
+    if any("id" not in chunk for chunk in chunks_data):
+        print("⚠️ Chunks have no stable ids; skipping pre-selection.")
+        return chunks_data
+
+    faiss_index = faiss_index if faiss_index is not None else _load_faiss_index()
+    doc_ids = np.array([chunk["id"] for chunk in chunks_data], dtype="int64")
+    params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(doc_ids))
+    _, hits = faiss_index.search(embed_topic_anchors(), per_topic, params=params)
+
+    selected = set()
+    for rank in range(per_topic):
+        for topic_hits in hits:
+            if len(selected) >= max_chunks:
+                break
+            if topic_hits[rank] >= 0:
+                selected.add(int(topic_hits[rank]))
+
+    kept = [chunk for chunk in chunks_data if chunk["id"] in selected]
+    print(f"🎯 Pre-selected {len(kept)} of {len(chunks_data)} chunks across {len(TOPIC_ANCHORS)} topics.")
+    return kept
+
+# -------- Map Phase --------
+def _is_retryable(exc: Exception) -> bool:
+    # A malformed JSON reply is usually a one-off; ask again rather than drop the chunk
+    return is_retryable_openai_error(exc) or isinstance(exc, json.JSONDecodeError)
+
+def analyze_chunk(chunk_text: str, limiter: RateLimiter, max_retries: int) -> Dict[str, Any]:
+    """Run the per-chunk extraction prompt and return the parsed JSON object."""
+    prompt = COMPANY_SPECIFIC_CHUNK_PROMPT.format(chunk=chunk_text)
+    prompt_tokens = count_tokens(prompt)
+
+    def request() -> Dict[str, Any]:
+        limiter.acquire(prompt_tokens)
+        response = get_client().chat.completions.create(
+            model=config.summarizer_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.0,
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+
+    return retry_with_backoff(request, max_retries=max_retries, is_retryable=_is_retryable)
+
+class PackSplitError(ValueError):
+    """A packed extraction response did not contain one result per chunk."""
+
+def analyze_pack(chunk_texts: List[str], limiter: RateLimiter, max_retries: int) -> List[Dict[str, Any]]:
+    """
+    Extract several chunks with one request and split the response per chunk.
+
+    A single chunk uses the plain per-chunk prompt. If a packed response cannot
+    be split cleanly, each chunk is extracted on its own.
+    """
+    if len(chunk_texts) == 1:
+        return [analyze_chunk(chunk_texts[0], limiter, max_retries)]
+
+    packed = "\n\n".join(
+        f"[Start of chunk {n}]\n{text}\n[End of chunk {n}]" for n, text in enumerate(chunk_texts, start=1)
+    )
+    prompt = PACKED_CHUNK_PROMPT.format(count=len(chunk_texts), chunks=packed)
+    prompt_tokens = count_tokens(prompt)
+
+    def request() -> List[Dict[str, Any]]:
+        limiter.acquire(prompt_tokens)
+        response = get_client().chat.completions.create(
+            model=config.summarizer_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.0,
+            response_format={"type": "json_object"}
+        )
+        results = json.loads(response.choices[0].message.content).get("results")
+        if not isinstance(results, list) or len(results) != len(chunk_texts) \
+                or not all(isinstance(r, dict) for r in results):
+            raise PackSplitError(f"expected {len(chunk_texts)} results")
+        # Each result must name its chunk exactly once, or extractions would be cached under the wrong chunk
+        numbers = [r.get("chunk") for r in results]
+        if not all(type(number) is int for number in numbers) \
+                or sorted(numbers) != list(range(1, len(chunk_texts) + 1)):
+            raise PackSplitError(f"expected results numbered 1 to {len(chunk_texts)}, got {numbers}")
+        results.sort(key=lambda r: r["chunk"])
+        return [{k: v for k, v in r.items() if k != "chunk"} for r in results]
+
+    try:
+        return retry_with_backoff(request, max_retries=max_retries, is_retryable=_is_retryable)
+    except (PackSplitError, json.JSONDecodeError) as e:
+        print(f"⚠️ Packed extraction of {len(chunk_texts)} chunks could not be split ({e}); extracting one by one.")
+        return [analyze_chunk(text, limiter, max_retries) for text in chunk_texts]
+
+class ChunkAnalysisError(RuntimeError):
+    """Some chunks could not be analyzed, so any report built from the rest would be incomplete."""
+
+    def __init__(self, failed: int, total: int):
+        super().__init__(f"{failed} of {total} chunks could not be analyzed")
+        self.failed = failed
+        self.total = total
+
+def plan_packs(indices: List[int], texts: List[str], sources: List[str]) -> List[List[int]]:
+    """
+    Group consecutive chunks from the same document into packs under the
+    configured token budget and chunk cap. Chunks larger than the budget go
+    alone.
+    """
+    budget = config.summarizer_pack_token_budget
+    max_chunks = config.summarizer_pack_max_chunks
+    packs: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i in indices:
+        tokens = count_tokens(texts[i])
+        if current and (
+            current_tokens + tokens > budget
+            or len(current) >= max_chunks
+            or sources[i] != sources[current[-1]]
+        ):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def map_chunks(chunks_data: List[Dict], file_name: str, max_workers: Optional[int] = None,
+               cache: Optional[ExtractionCache] = None,
+               progress: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Extract structured data from every chunk using a bounded worker pool.
+
+    Chunks already extracted with the same model and prompt templates are read
+    from `cache`; only misses are sent to the LLM, with consecutive short
+    chunks packed into shared requests. Requests are paced against the
+    configured rate limits and retried with backoff. Results are returned in
+    chunk order. `progress(done, total)` is called as chunks complete.
+
+    Raises:
+        ChunkAnalysisError: If any chunk still failed after all retries. Every
+            other chunk is analyzed (and cached) first, so a retry only sends
+            the failed ones.
+    """
+    max_workers = max_workers or config.summarizer_max_workers
+    model = config.summarizer_model
+    limiter = RateLimiter(
+        requests_per_minute=config.summarizer_requests_per_minute,
+        tokens_per_minute=config.summarizer_tokens_per_minute
+    )
+    texts = [chunk_info.get('page_content') or chunk_info.get('text', '') for chunk_info in chunks_data]
+    sources = [chunk_info.get('metadata', {}).get('source_file', file_name) for chunk_info in chunks_data]
+    jobs = [i for i, text in enumerate(texts) if text.strip()]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    failed = 0
+
+    # Serve cache hits first
+    if cache is not None:
+        for i in jobs:
+            results[i] = cache.get(text_hash(texts[i]), model, CHUNK_PROMPT_HASH)
+        misses = [i for i in jobs if results[i] is None]
+        print(f"♻️ {len(jobs) - len(misses)} of {len(jobs)} chunk extractions served from cache.")
+    else:
+        misses = jobs
+
+    if progress:
+        progress(len(jobs) - len(misses), len(jobs))
+
+    packs = plan_packs(misses, texts, sources)
+    print(f"🔄 Analyzing {len(misses)} chunks for {file_name} in {len(packs)} requests with {max_workers} workers...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(analyze_pack, [texts[i] for i in pack], limiter, config.summarizer_max_retries): pack
+            for pack in packs
+        }
+        analyzed = 0
+        for future in as_completed(futures):
+            pack = futures[future]
+            try:
+                pack_results = future.result()
+            except Exception as e:
+                failed += len(pack)
+                print(f"❌ Error analyzing chunks {pack[0]+1}-{pack[-1]+1} after retries: {e}")
+                continue
+            for i, summary in zip(pack, pack_results):
+                results[i] = summary
+                if cache is not None:
+                    cache.put(text_hash(texts[i]), model, CHUNK_PROMPT_HASH, summary)
+            analyzed += len(pack)
+            print(f"✅ Chunks {pack[0]+1}-{pack[-1]+1} analyzed ({analyzed}/{len(misses)}).")
+            if progress:
+                progress(len(jobs) - len(misses) + analyzed, len(jobs))
+
+    if failed:
+        raise ChunkAnalysisError(failed, len(jobs))
+    # Carry the section header along so the reduce phase can group by section
+    return [
+        {"section_header": chunks_data[i].get('section_header', ''), **summary}
+        for i, summary in enumerate(results) if summary is not None
+    ]
+
+# -------- Reduce Phase --------
+def _serialize(summaries: List[Dict[str, Any]]) -> str:
+    return json.dumps(summaries, indent=2)
+
+def _section_key(summary: Dict[str, Any]) -> str:
+    # Group by the top-level (HD1) heading of the section path
+    return str(summary.get('section_header', '')).split(' > ')[0]
+
+def _merge_mechanically(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fallback merge without the LLM: concatenate list fields, dropping duplicates."""
+    merged: Dict[str, Any] = {"section_header": _section_key(summaries[0])}
+    for key in ("topic", "key_changes", "quantitative_data", "stakeholders_affected"):
+        values: List[Any] = []
+        for summary in summaries:
+            value = summary.get(key, [])
+            for v in value if isinstance(value, list) else [value]:
+                if v not in values:
+                    values.append(v)
+        merged[key] = values
+    return merged
+
+# List fields of a summary, in the order entries are dropped when the reduced
+# summaries still exceed the final budget (quantitative data is kept longest)
+TRIM_ORDER = ("stakeholders_affected", "topic", "key_changes", "quantitative_data")
+
+def _cap_field(summaries: List[Dict[str, Any]], key: str, cap: int) -> List[Dict[str, Any]]:
+    capped = []
+    for summary in summaries:
+        value = summary.get(key)
+        if value is not None:
+            values = value if isinstance(value, list) else [value]
+            summary = {**summary, key: values[:cap]}
+        capped.append(summary)
+    return capped
+
+def trim_to_budget(summaries: List[Dict[str, Any]], budget: int) -> List[Dict[str, Any]]:
+    """
+    Cap the list fields of summaries until they fit the token budget.
+
+    Fields are capped in TRIM_ORDER, each to the most entries per summary
+    that fit (found by bisection); later entries go first. A field is only
+    emptied if capping it alone can't make the summaries fit.
+    """
+    for key in TRIM_ORDER:
+        if count_tokens(_serialize(summaries)) <= budget:
+            break
+        longest = max((len(v) if isinstance(v, list) else 1 for v in (s.get(key) for s in summaries)
+                       if v is not None), default=0)
+        low, high = 0, longest
+        while low < high:
+            cap = (low + high + 1) // 2
+            if count_tokens(_serialize(_cap_field(summaries, key, cap))) <= budget:
+                low = cap
+            else:
+                high = cap - 1
+        summaries = _cap_field(summaries, key, low)
+    return summaries
+
+def merge_summaries(summaries: List[Dict[str, Any]], limiter: RateLimiter, max_retries: int) -> Dict[str, Any]:
+    """Merge a group of summaries into one with the LLM, falling back to a mechanical merge."""
+    prompt = REDUCE_PROMPT.format(summaries=_serialize(summaries))
+    prompt_tokens = count_tokens(prompt)
+
+    def request() -> Dict[str, Any]:
+        limiter.acquire(prompt_tokens)
+        response = get_client().chat.completions.create(
+            model=config.summarizer_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.0,
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+
+    try:
+        return retry_with_backoff(request, max_retries=max_retries, is_retryable=_is_retryable)
+    except Exception as e:
+        print(f"❌ Error merging {len(summaries)} summaries, keeping them unmerged: {e}")
+        return _merge_mechanically(summaries)
+
+def plan_reduce_groups(summaries: List[Dict[str, Any]], group_budget: int) -> List[List[Dict[str, Any]]]:
+    """
+    Pack consecutive summaries into groups under a token budget.
+
+    A new group starts when the budget would be exceeded, or when the section
+    changes and the current group is already half full. Every group holds at
+    least two summaries (when available) so each level strictly shrinks.
+    """
+    groups: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = 0
+    for summary in summaries:
+        tokens = count_tokens(_serialize([summary]))
+        if len(current) >= 2 and (
+            current_tokens + tokens > group_budget
+            or (_section_key(summary) != _section_key(current[-1]) and current_tokens >= group_budget // 2)
+        ):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        # A trailing singleton joins the previous group instead of surviving alone
+        if len(current) == 1 and groups:
+            groups[-1].extend(current)
+        else:
+            groups.append(current)
+    return groups
+
+def reduce_summaries(summaries: List[Dict[str, Any]], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Tree-reduce chunk summaries until they fit the final synthesis budget.
+
+    Each level groups summaries by section under a token budget and merges
+    every group in parallel, so the number of levels grows logarithmically
+    with document size. Merges that fell back to _merge_mechanically don't
+    shrink, so whatever is left over the budget at the end is trimmed (see
+    trim_to_budget) and the final synthesis prompt always fits.
+    """
+    max_workers = max_workers or config.summarizer_max_workers
+    final_budget = config.summarizer_final_token_budget
+    limiter = RateLimiter(
+        requests_per_minute=config.summarizer_requests_per_minute,
+        tokens_per_minute=config.summarizer_tokens_per_minute
+    )
+    level = 0
+    while len(summaries) > 1 and count_tokens(_serialize(summaries)) > final_budget:
+        level += 1
+        groups = plan_reduce_groups(summaries, config.summarizer_reduce_group_token_budget)
+        print(f"🔄 Reduce level {level}: merging {len(summaries)} summaries into {len(groups)} groups...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            summaries = list(executor.map(
+                lambda group: group[0] if len(group) == 1 else merge_summaries(group, limiter, config.summarizer_max_retries),
+                groups
+            ))
+    if count_tokens(_serialize(summaries)) > final_budget:
+        print(f"⚠️ Reduced summaries still exceed {final_budget} tokens; dropping their lowest-priority entries.")
+        summaries = trim_to_budget(summaries, final_budget)
+    return summaries
+
+# -------- Summarization Function --------
+def group_chunks_by_source_file(all_chunks: List[Dict]) -> Dict[str, List[Dict]]:
+    """Group metadata rows by their source document, keeping chunk order."""
+    chunks_by_source_file: Dict[str, List[Dict]] = {}
+    for chunk in all_chunks:
+        source_file = chunk.get('metadata', {}).get('source_file', 'unknown_document.xml')
+        chunks_by_source_file.setdefault(source_file, []).append(chunk)
+    return chunks_by_source_file
+
+# Markdown headings that open a new report section (the prompt uses "### ")
+SECTION_HEADING = re.compile(r"^\s*#{1,3}\s")
+
+def split_report_sections(deltas: Iterable[str]) -> Iterator[str]:
+    """
+    Regroup streamed report text into markdown sections.
+
+    A section is yielded as soon as the next heading line starts, so callers
+    see each section while later ones are still being generated. Text before
+    the first heading (the title banner) stays with the first section, and
+    the yielded pieces concatenate back to the exact input text.
+    """
+    section: List[str] = []
+    pending = ""
+    seen_heading = False
+    for delta in deltas:
+        pending += delta
+        while "\n" in pending:
+            line, pending = pending.split("\n", 1)
+            is_heading = bool(SECTION_HEADING.match(line))
+            if is_heading and seen_heading and section:
+                yield "".join(section)
+                section = []
+            seen_heading = seen_heading or is_heading
+            section.append(line + "\n")
+    if pending:
+        if SECTION_HEADING.match(pending) and seen_heading and section:
+            yield "".join(section)
+            section = []
+        section.append(pending)
+    if section:
+        yield "".join(section)
+
+def section_title(section: str) -> str:
+    """Plain-text title of a report section (its heading without markdown markup)."""
+    for line in section.splitlines():
+        if SECTION_HEADING.match(line):
+            return line.strip().lstrip("#").strip().strip("*").strip()
+    return ""
+
+def stream_report(chunks_data: List[Dict], file_name: str, max_workers: Optional[int] = None,
+                  use_cache: bool = True, preselect: Optional[bool] = None, faiss_index=None,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+    """
+    Generate a report, yielding its markdown sections as the final synthesis streams in.
+
+    The map and reduce phases run first; the final completion is then
+    streamed and split on section headings. When no complete report can be
+    produced (including when any chunk failed extraction), a single
+    placeholder section is yielded instead (see is_failed_report).
+    """
+    if get_client() is None:
+        yield "Error: OpenAI API key not set."
+        return
+
+    # Only send the chunks most relevant to the report's topics to the map phase
+    if config.summarizer_preselect if preselect is None else preselect:
+        chunks_data = preselect_chunks(chunks_data, faiss_index=faiss_index)
+
+    cache = ExtractionCache(config.summarizer_cache_path) if use_cache else None
+    try:
+        individual_summaries = map_chunks(chunks_data, file_name, max_workers=max_workers, cache=cache,
+                                          progress=progress)
+    except ChunkAnalysisError as e:
+        print(f"❌ {e}; not generating a partial report.")
+        yield f"No report could be generated; {e}."
+        return
+    finally:
+        if cache is not None:
+            cache.close()
 
     if not individual_summaries:
-        return "No report could be generated; analysis of chunks failed."
+        yield "No report could be generated; analysis of chunks failed."
+        return
+
+    # Merge hierarchically until the summaries fit the final prompt's token budget
+    reduced_summaries = reduce_summaries(individual_summaries, max_workers=max_workers)
 
     year_str = file_name.split('_')[0] if '_' in file_name else "latest"
-    joined_summaries = json.dumps(individual_summaries, indent=2)
+    joined_summaries = _serialize(reduced_summaries)
     final_prompt = FINAL_REPORT_PROMPT.format(summaries=joined_summaries, year=year_str)
 
+    def deltas() -> Iterator[str]:
+        response = retry_with_backoff(
+            lambda: get_client().chat.completions.create(
+                model=config.summarizer_model,
+                messages=[{"role": "user", "content": final_prompt}],
+                temperature=0.1,
+                stream=True,
+            ),
+            max_retries=config.summarizer_max_retries
+        )
+        for event in response:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
     try:
         print("\n🔄 Generating final, client-ready intelligence report...")
-        final_response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[{"role": "user", "content": final_prompt}],
-            temperature=0.1,
-        )
-        final_report = final_response.choices[0].message.content.strip()
+        started = False
+        for section in split_report_sections(deltas()):
+            # Drop the leading whitespace the non-streamed report used to strip
+            if not started:
+                section = section.lstrip()
+                if not section:
+                    continue
+                started = True
+            yield section
         print("✅ Final report generated successfully.")
-        return final_report
     except Exception as e:
         print(f"❌ An unexpected error occurred during final report generation: {e}")
-        return f"Final synthesis failed. Raw chunk data below:\n\n{joined_summaries}"
+        yield f"Final synthesis failed. Raw chunk data below:\n\n{joined_summaries}"
+
+def assemble_report(sections: List[str]) -> str:
+    """Join streamed sections into the full report; a trailing failure placeholder replaces a partial report."""
+    if sections and is_failed_report(sections[-1]):
+        return sections[-1]
+    return "".join(sections).strip()
+
+def generate_report(chunks_data: List[Dict], file_name: str, max_workers: Optional[int] = None,
+                    use_cache: bool = True, preselect: Optional[bool] = None, faiss_index=None,
+                    progress: Optional[Callable[[int, int], None]] = None) -> str:
+    return assemble_report(list(stream_report(
+        chunks_data, file_name, max_workers=max_workers, use_cache=use_cache,
+        preselect=preselect, faiss_index=faiss_index, progress=progress
+    )))
+
+# -------- Precomputed Reports --------
+def is_failed_report(report: str) -> bool:
+    """True for the placeholder texts generate_report returns when no report could be produced."""
+    return report.startswith(("Error:", "No report could be generated", "Final synthesis failed"))
+
+def chunk_set_hash(chunks: List[Dict]) -> str:
+    """Hash of a document's chunk texts in order; changes whenever any chunk does."""
+    return text_hash("".join(text_hash(chunk.get('page_content') or chunk.get('text', '')) for chunk in chunks))
+
+def refresh_reports(chunks_by_source_file: Dict[str, List[Dict]], store: ReportStore, faiss_index=None) -> List[str]:
+    """
+    Bring the report store in line with the indexed documents.
+
+    Reports of documents that are no longer indexed are dropped. Documents
+    without a report for the current prompt version and chunk set (new
+    documents, or ones whose chunks changed) are regenerated.
+
+    Returns:
+        Source files whose reports were (re)generated
+    """
+    removed = store.prune(chunks_by_source_file)
+    if removed:
+        print(f"🗑️ Dropped reports of {removed} documents no longer indexed.")
+
+    refreshed = []
+    for source_file, chunks in sorted(chunks_by_source_file.items()):
+        current_hash = chunk_set_hash(chunks)
+        if store.get(source_file, REPORT_PROMPT_VERSION, current_hash):
+            continue
+        print(f"\n--- Precomputing report for: {source_file} ---")
+        store.invalidate(source_file)
+        report = generate_report(chunks, source_file, faiss_index=faiss_index)
+        if is_failed_report(report):
+            print(f"❌ Report for {source_file} failed; it will be retried on the next refresh.")
+            continue
+        store.put(source_file, REPORT_PROMPT_VERSION, current_hash, report)
+        refreshed.append(source_file)
+    print(f"✅ Report store up to date ({len(refreshed)} regenerated).")
+    return refreshed
 
 # -------- Main Execution Block --------
 if __name__ == "__main__":
-    CHUNKS_FILE_PATH = Path("../../rag_data/faiss_metadata.json")
+    if get_client() is None:
+        print("Error: OPENAI_API_KEY environment variable not set. Please set it before running.")
+        exit(1)
+
+    CHUNKS_FILE_PATH = Path(config.faiss_metadata_path)
     print(f"Loading pre-processed chunks from {CHUNKS_FILE_PATH}...")
 
     try:
@@ -160,10 +758,7 @@ if __name__ == "__main__":
         print(f"❌ Error loading chunks file: {e}. Please ensure it exists and is valid JSON.")
         exit(1)
 
-    chunks_by_source_file: Dict[str, List[Dict]] = {}
-    for chunk in all_loaded_chunks:
-        source_file = chunk.get('metadata', {}).get('source_file', 'unknown_document.xml')
-        chunks_by_source_file.setdefault(source_file, []).append(chunk)
+    chunks_by_source_file = group_chunks_by_source_file(all_loaded_chunks)
 
     if not chunks_by_source_file:
         print("⚠️ No processable documents found in the chunks file.")
@@ -181,7 +776,7 @@ if __name__ == "__main__":
             if 1 <= int(choice) <= len(source_files_list):
                 selected_index = int(choice) - 1
             else:
-                print(f"❌ Invalid number.")
+                print("❌ Invalid number.")
         except ValueError:
             print("❌ Invalid input. Please enter a number.")
 
@@ -189,10 +784,10 @@ if __name__ == "__main__":
     chunks_for_selected_file = chunks_by_source_file[selected_file]
 
     print(f"\n--- Starting processing for: {selected_file} ---")
-    report_result = generate_report(chunks_for_selected_file, selected_file)
-
+    # Print each report section as soon as it has been generated
     print("\n")
-    print(report_result)
+    for report_section in stream_report(chunks_for_selected_file, selected_file):
+        print(report_section, end="", flush=True)
     print("\n------------------------------------------------------------\n")
 
     print("Selected document has been processed.")
@@ -0,0 +1,54 @@
+"""
+summary_cache.py
+
+Persistent store for per-chunk LLM extractions, so unchanged chunks are not
+re-sent to the model when a report is regenerated.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from .sqlite_store import SQLiteStore
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 hex digest of a text (chunk or prompt template)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache(SQLiteStore):
+    """
+    SQLite-backed cache of per-chunk extraction results.
+
+    Entries are keyed by (chunk text hash, model, prompt template hash), so
+    changing the model or editing the extraction prompt naturally misses.
+
+    Attributes:
+        path (str): Path of the SQLite database file
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS extractions (
+               chunk_hash TEXT NOT NULL,
+               model TEXT NOT NULL,
+               prompt_hash TEXT NOT NULL,
+               result TEXT NOT NULL,
+               created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+               PRIMARY KEY (chunk_hash, model, prompt_hash)
+           )""",
+    )
+
+    def get(self, chunk_hash: str, model: str, prompt_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the cached extraction, or None on a miss."""
+        row = self._fetchone(
+            "SELECT result FROM extractions WHERE chunk_hash = ? AND model = ? AND prompt_hash = ?",
+            (chunk_hash, model, prompt_hash)
+        )
+        return json.loads(row[0]) if row else None
+
+    def put(self, chunk_hash: str, model: str, prompt_hash: str, result: Dict[str, Any]) -> None:
+        """Store (or replace) an extraction result."""
+        self._execute(
+            "INSERT OR REPLACE INTO extractions (chunk_hash, model, prompt_hash, result) VALUES (?, ?, ?, ?)",
+            (chunk_hash, model, prompt_hash, json.dumps(result))
+        )
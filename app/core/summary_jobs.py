@@ -0,0 +1,205 @@
+"""
+summary_jobs.py
+
+Background job queue for report generation, backed by a persistent SQLite
+job table so long summaries never run on a request worker.
+
+Several server processes share the table. Each one holds a lease on the jobs
+it queued or runs by touching their updated_at, and re-queues jobs whose lease
+expired because the process that held them died.
+"""
+import logging
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_COLUMNS = ("id", "source_file", "status", "progress_done", "progress_total",
+               "report", "error", "created_at", "updated_at")
+LATEST_JOB_SQL = (f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE source_file = ? "
+                  f"ORDER BY created_at DESC, rowid DESC LIMIT 1")
+
+
+class SummaryJobQueue(SQLiteStore):
+    """
+    Runs report generation jobs on a worker pool and records them in SQLite.
+
+    Attributes:
+        db_path (str): Path of the SQLite job database
+        run_report (Callable): Function (source_file, progress) -> report text,
+            where progress(done, total) reports per-chunk progress
+        lease_seconds (int): Time after which a job that stopped being renewed
+            is taken over by another process
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS jobs (
+               id TEXT PRIMARY KEY,
+               source_file TEXT NOT NULL,
+               status TEXT NOT NULL,
+               progress_done INTEGER DEFAULT 0,
+               progress_total INTEGER DEFAULT 0,
+               report TEXT,
+               error TEXT,
+               created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+               updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+           )""",
+        "CREATE INDEX IF NOT EXISTS jobs_source_file ON jobs (source_file, created_at)",
+    )
+
+    def __init__(self, db_path: str, run_report: Callable[[str, Callable[[int, int], None]], str],
+                 max_workers: int = 2, resume_interrupted: bool = True, lease_seconds: int = 120):
+        """
+        Initialize SummaryJobQueue, re-queue jobs interrupted by a restart and
+        start renewing leases.
+
+        Args:
+            db_path: Path of the SQLite job database (created if missing)
+            run_report: Function generating the report for a source file
+            max_workers: Number of reports generated concurrently
+            resume_interrupted: Re-queue every job left queued or running; disable
+                in all but one process when several share the database (the
+                others still take over jobs once their lease expires)
+            lease_seconds: Time after which an unrenewed job is taken over
+        """
+        super().__init__(db_path)
+        self.db_path = db_path
+        self.run_report = run_report
+        self.lease_seconds = lease_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary-job")
+        # Ids of the jobs this process has queued or is running
+        self._leased: set = set()
+        self._leased_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        # Jobs that were queued or running when the process stopped start over
+        if resume_interrupted:
+            for job in self._query(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE status IN (?, ?)",
+                                   (QUEUED, RUNNING)):
+                logger.info(f"Re-queueing interrupted summary job {job['id']} for {job['source_file']}")
+                self._update(job["id"], status=QUEUED, progress_done=0)
+                self._start(job["id"], job["source_file"])
+
+        threading.Thread(target=self._keep_leases, name="summary-job-lease", daemon=True).start()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return [dict(zip(JOB_COLUMNS, row)) for row in self._fetchall(sql, params)]
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._execute(
+            f"UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (*fields.values(), job_id)
+        )
+
+    def _start(self, job_id: str, source_file: str) -> None:
+        with self._leased_lock:
+            self._leased.add(job_id)
+        self._executor.submit(self._run, job_id, source_file)
+
+    def _run(self, job_id: str, source_file: str) -> None:
+        self._update(job_id, status=RUNNING)
+
+        def progress(done: int, total: int) -> None:
+            self._update(job_id, progress_done=done, progress_total=total)
+
+        try:
+            report = self.run_report(source_file, progress)
+            self._update(job_id, status=DONE, report=report)
+            logger.info(f"Summary job {job_id} for {source_file} finished")
+        except Exception as e:
+            logger.error(f"Summary job {job_id} for {source_file} failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e))
+        finally:
+            with self._leased_lock:
+                self._leased.discard(job_id)
+
+    def _keep_leases(self) -> None:
+        # Renew well within the lease, so a slow renewal never lets a live job be taken over
+        while not self._stopped.wait(self.lease_seconds / 4):
+            with self._leased_lock:
+                leased = list(self._leased)
+            try:
+                if leased:
+                    self._execute(
+                        f"UPDATE jobs SET updated_at = CURRENT_TIMESTAMP WHERE id IN ({', '.join('?' * len(leased))})",
+                        leased
+                    )
+                self.reclaim_expired()
+            except sqlite3.Error as e:
+                logger.error(f"Renewing summary job leases failed: {e}")
+
+    def reclaim_expired(self) -> List[str]:
+        """
+        Re-queue, in this process, queued or running jobs whose lease expired.
+
+        Returns:
+            Ids of the jobs taken over
+        """
+        with self._leased_lock:
+            leased = set(self._leased)
+        with self._transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = [
+                (job_id, source_file) for job_id, source_file in conn.execute(
+                    "SELECT id, source_file FROM jobs WHERE status IN (?, ?) AND updated_at < datetime('now', ?)",
+                    (QUEUED, RUNNING, f"-{self.lease_seconds} seconds")
+                ).fetchall()
+                if job_id not in leased
+            ]
+            for job_id, _ in expired:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, progress_done = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (QUEUED, job_id)
+                )
+        for job_id, source_file in expired:
+            logger.warning(f"Taking over summary job {job_id} for {source_file}: its lease expired")
+            self._start(job_id, source_file)
+        return [job_id for job_id, _ in expired]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if the id is unknown."""
+        jobs = self._query(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def latest_for(self, source_file: str) -> Optional[Dict[str, Any]]:
+        """Return the most recent job for a source file, or None."""
+        jobs = self._query(LATEST_JOB_SQL, (source_file,))
+        return jobs[0] if jobs else None
+
+    def submit(self, source_file: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Queue a report for a source file and return its job record immediately.
+
+        An in-flight job for the same file is returned instead of starting a
+        second one; a finished report is returned as-is unless `force` is set.
+        """
+        job_id = uuid.uuid4().hex
+        # Check and insert in one write transaction, so concurrent requests
+        # (threads here, or other server processes) can't both start a job
+        with self._transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(LATEST_JOB_SQL, (source_file,)).fetchone()
+            latest = dict(zip(JOB_COLUMNS, row)) if row else None
+            if latest and (latest["status"] in (QUEUED, RUNNING) or (latest["status"] == DONE and not force)):
+                return latest
+            conn.execute("INSERT INTO jobs (id, source_file, status) VALUES (?, ?, ?)", (job_id, source_file, QUEUED))
+        self._start(job_id, source_file)
+        return self.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs and close the database."""
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
+        self.close()
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from app.core import build_faiss
+from app.core.build_faiss import (MAX_TOKENS_PER_BATCH, SAFETY_MARGIN, chunk_id, create_index, index_pca_dim,
+                                  plan_batches, recall_at_k, split_token_ids)
+
+PERIOD = 0
+
+CHUNK = {"text": "The hospice cap amount is $34,465.34.", "chunk_index": 12, "hash": "3f2a9c",
+         "metadata": {"source_file": "2024_HOSPICE_final_2024-16910.xml"}}
+
+
+class FakeEncoding:
+    """Token PERIOD decodes to a sentence end, every other token to a word."""
+
+    def decode_single_token_bytes(self, token):
+        return b"." if token == PERIOD else b" word"
+
+
+@pytest.fixture(autouse=True)
+def fake_encoding(monkeypatch):
+    # Stands in for the ada-002 encoding, which tiktoken would download
+    monkeypatch.setattr(build_faiss, "_encoding", FakeEncoding())
+
+
+def test_split_token_ids_fits_in_one_window():
+    assert split_token_ids([1] * 10, 10) == [(0, 10)]
+    assert split_token_ids([], 10) == []
+
+
+def test_split_token_ids_cuts_after_a_sentence_end():
+    tokens = [1] * 7 + [PERIOD] + [1] * 12
+    assert split_token_ids(tokens, 10) == [(0, 8), (8, 18), (18, 20)]
+
+
+def test_split_token_ids_ignores_sentence_ends_early_in_the_window():
+    # A cut in the first half of the window would leave it mostly empty
+    tokens = [1, 1, PERIOD] + [1] * 17
+    assert split_token_ids(tokens, 10) == [(0, 10), (10, 20)]
+
+
+def test_plan_batches_respects_token_budget():
+    budget = MAX_TOKENS_PER_BATCH - SAFETY_MARGIN
+    counts = [4000, 4000, 200, budget, 10]
+    batches = plan_batches(["a", "b", "c", "d", "e"], counts)
+    assert batches == [(["a", "b"], 8000), (["c"], 200), (["d"], budget), (["e"], 10)]
+
+
+def test_plan_batches_keeps_an_oversized_chunk_alone():
+    batches = plan_batches(["a", "b", "c"], [5, MAX_TOKENS_PER_BATCH * 2, 5])
+    assert [batch for batch, _ in batches] == [["a"], ["b"], ["c"]]
+
+
+def test_chunk_id_is_stable():
+    # Pinned, so a change to the id scheme (which orphans every stored id) is deliberate
+    assert chunk_id(CHUNK, 0) == chunk_id(dict(CHUNK), 0) == 1348184107733807591
+    assert 0 <= chunk_id(CHUNK, 0) < 2 ** 63
+
+
+def test_chunk_id_ignores_other_metadata():
+    retagged = {**CHUNK, "entities": ["usd:34465.34"], "metadata": {**CHUNK["metadata"], "program": "Hospice"}}
+    assert chunk_id(retagged, 0) == chunk_id(CHUNK, 0)
+
+
+@pytest.mark.parametrize("change", [
+    {"chunk_index": 13}, {"hash": "3f2a9d"}, {"metadata": {"source_file": "2025_HOSPICE_final.xml"}},
+])
+def test_chunk_id_changes_with_the_chunk(change):
+    assert chunk_id({**CHUNK, **change}, 0) != chunk_id(CHUNK, 0)
+    assert chunk_id(CHUNK, 1) != chunk_id(CHUNK, 0)
+
+
+def low_rank_vectors(rows=500, dimension=64, rank=8):
+    # Embeddings mostly spanned by a few directions, as PCA expects
+    rng = np.random.default_rng(0)
+    basis = rng.normal(size=(rank, dimension))
+    vectors = rng.normal(size=(rows, rank)) @ basis + rng.normal(scale=0.01, size=(rows, dimension))
+    return vectors.astype("float32")
+
+
+def test_create_index_with_pca():
+    vectors = low_rank_vectors()
+    ids = np.arange(1000, 1000 + len(vectors), dtype="int64")
+    index = create_index(vectors, ids, pca_dim=16)
+    assert (index.ntotal, index.d, index_pca_dim(index)) == (len(vectors), 64, 16)
+    _, found = index.search(vectors[:5], 1)
+    assert found[:, 0].tolist() == ids[:5].tolist()
+    assert recall_at_k(vectors, index, k=10) > 0.9
+    assert index_pca_dim(create_index(vectors, ids)) is None
+
+
+@pytest.mark.parametrize("pca_dim", [-1, 64, 100])
+def test_create_index_rejects_bad_pca_dim(pca_dim):
+    vectors = low_rank_vectors(rows=50)
+    with pytest.raises(ValueError):
+        create_index(vectors, np.arange(50, dtype="int64"), pca_dim=pca_dim)
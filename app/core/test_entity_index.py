@@ -0,0 +1,49 @@
+import pytest
+from app.core.entity_index import build_entity_index, expand_code_range, extract_entities, extract_entity_groups
+
+
+@pytest.mark.parametrize("text, entities", [
+    ("Remote therapeutic monitoring (CPT 98975) is covered.", ["cpt:98975"]),
+    ("HCPCS code g2211 is the visit complexity add-on.", ["hcpcs:G2211"]),
+    ("Category III code 0591T and Category II code 1036F.", ["cpt:0591T", "cpt:1036F"]),
+    ("as amended at 42 CFR 418.309 and 42 CFR part 414", ["cfr:414", "cfr:418.309"]),
+    ("under §§ 418.306 and § 418.309(a)", ["cfr:418.306", "cfr:418.309"]),
+    ("The cap is $34,465.34 and the savings $2.5 million.", ["usd:2500000", "usd:34465.34"]),
+    ("a total of $1 billion over $750 thousand", ["usd:1000000000", "usd:750000"]),
+])
+def test_extract_entities(text, entities):
+    assert extract_entities(text) == entities
+
+
+@pytest.mark.parametrize("text", [
+    "See 83 FR 38622, 38635 through 38648.",
+    "FR Doc. 2024-16910 Filed 7-29-24",
+    "CBSA 24220 and FIPS county 09015",
+    "assessment item A1805 and items 12345, 23456",
+    "Executive Order 12866",
+    "ZIP code 20850-1234",
+    "an increase of 12345.6 or 97550%",
+    "OMB control number 0938-1067 for CMS-10390",
+])
+def test_extract_entities_skips_lookalike_numbers(text):
+    assert [key for key in extract_entities(text) if key.startswith(("cpt:", "hcpcs:"))] == []
+
+
+def test_code_ranges():
+    assert extract_entity_groups("codes 97550-97552 and G0023 through G0024") == [
+        ("cpt:97550", "cpt:97551", "cpt:97552"), ("hcpcs:G0023", "hcpcs:G0024")
+    ]
+    assert expand_code_range("0591T", "0593T") == ("cpt:0591T", "cpt:0592T", "cpt:0593T")
+    # Too wide, or mixing code shapes: only the endpoints
+    assert expand_code_range("10000", "69999") == ("cpt:10000", "cpt:69999")
+    assert expand_code_range("G0023", "99213") == ("hcpcs:G0023", "cpt:99213")
+
+
+def test_build_entity_index():
+    rows = [{"text": "CPT 98975 at $34,465.34", "entities": ["cpt:98975", "usd:34465.34"]},
+            {"text": "No codes here"},
+            {"text": "Remote monitoring with 98975"}]
+    index = build_entity_index(rows)
+    assert index["rows"] == 3
+    assert index["postings"] == {"cpt:98975": [0, 2], "usd:34465.34": [0]}
+    assert index["words"] == {"0": [], "2": ["monitoring", "remote", "with"]}
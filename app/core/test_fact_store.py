@@ -0,0 +1,76 @@
+import pytest
+from app.core.fact_store import FactStore, extract_all_facts, extract_facts, parse_fact_query
+
+HOSPICE_ROW = {
+    "text": ("For FY 2025, the hospice payment update percentage is 2.9 percent. "
+             "The hospice cap amount for FY 2025 is $34,465.34."),
+    "section_header": "III. Payment Updates",
+    "metadata": {"source_file": "hospice_2025.xml", "program": "Hospice",
+                 "title": "FY 2025 Hospice Wage Index and Payment Rate Update",
+                 "effective_date": "These regulations are effective on October 1, 2024."}
+}
+
+
+@pytest.mark.parametrize("query, fact_type, year", [
+    ("What is the FY 2025 hospice payment update percentage?", "payment_update", 2025),
+    ("What is the SNF market basket update?", "payment_update", None),
+    ("What is the CY 2025 MPFS conversion factor?", "conversion_factor", 2025),
+    ("What is the KX modifier threshold for 2024?", "kx_threshold", 2024),
+    ("What is the hospice cap amount for FY 2025?", "cap_amount", 2025),
+    ("What is the effective date of the rule?", "effective_date", None),
+])
+def test_parse_fact_query_subjects(query, fact_type, year):
+    request = parse_fact_query(query)
+    assert request["fact_type"] == fact_type
+    assert request["year"] == year
+    assert request["specificity"] == 1.0
+
+
+@pytest.mark.parametrize("query", [
+    "What is the update to the hospice quality reporting program?",
+    "Is there an update to the hospice CAHPS survey?",
+    "What is the estimated increase in hospice aggregate payments?",
+    "When is the hospice HQRP data submission deadline effective?",
+    "Why did the conversion factor change?",
+    "What are the conversion factor and the payment update?",
+])
+def test_parse_fact_query_rejects_other_questions(query):
+    assert parse_fact_query(query) is None
+
+
+def test_parse_fact_query_specificity():
+    exact = parse_fact_query("What is the FY 2025 hospice payment update percentage?")
+    loose = parse_fact_query("What is the FY 2025 hospice payment update?")
+    qualified = parse_fact_query("What is the FY 2025 hospice payment update for aides?")
+    assert exact["specificity"] > loose["specificity"] > qualified["specificity"]
+    assert parse_fact_query("What is the FY 2025 proposed conversion factor?")["stage"] == "proposed"
+
+
+def test_extract_facts():
+    facts = {fact["fact_type"]: fact for fact in extract_facts(HOSPICE_ROW, 7)}
+    assert facts["payment_update"]["value"] == "2.9"
+    assert facts["cap_amount"]["value"] == "34465.34"
+    assert facts["cap_amount"]["year"] == 2025
+    assert facts["cap_amount"]["chunk_id"] == 7
+    assert all(fact["stage"] == "final" and fact["confidence"] == 0.95 for fact in facts.values())
+
+
+def test_extract_facts_skips_other_quantities():
+    row = {**HOSPICE_ROW, "text": "The FY 2025 payment update is based on a 3.4 percent market basket increase."}
+    assert extract_facts(row, 0) == []
+    row = {**HOSPICE_ROW, "text": "The proposed FY 2025 payment update percentage is 2.6 percent."}
+    assert extract_facts(row, 0)[0]["stage"] == "proposed"
+
+
+def test_fact_store_answer(tmp_path):
+    store = FactStore(str(tmp_path / "facts.sqlite"))
+    store.replace_all(extract_all_facts([HOSPICE_ROW]))
+    fact = store.answer("What is the FY 2025 hospice cap amount?")
+    assert fact["value"] == "34465.34"
+    assert fact["answer_confidence"] == 0.95
+    # A looser question about the same fact is answered less confidently
+    assert store.answer("What is the FY 2025 hospice cap for newly certified hospices?")["answer_confidence"] < 0.8
+    assert store.answer("What is the effective date of the rule?")["value"] == "October 1, 2024"
+    assert store.answer("Is there an update to the hospice CAHPS survey?") is None
+    assert store.answer("What is the FY 2025 hospice cap amount?", source_files=["other.xml"]) is None
+    store.close()
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from app.core.section_index import (load_section_index, read_source_span, section_index_path, source_changed,
+                                    subtree_section_ids)
+from app.core.xml_chunker import XMLChunker
+
+DOCUMENT = (
+    b'<?xml version="1.0" encoding="UTF-8"?>\n<RULE><SUPLINF>\n'
+    b'<HD SOURCE="HD1">I. Background</HD>\n<P>Hospice payments are updated.</P>\n'
+    b'<HD SOURCE="HD2">A. Cap</HD>\n<P>The cap is $34,465.34.</P>\n'
+    b'<HD SOURCE="HD3">1. Method</HD>\n<P>The cap is updated annually.</P>\n'
+    b'<HD SOURCE="HD2">B. Wage Index</HD>\n<P>The wage index is updated.</P>\n'
+    b'<HD SOURCE="HD1">II. Provisions</HD>\n<P>Quality reporting changes.</P>\n'
+    b'</SUPLINF></RULE>\n'
+)
+
+
+@pytest.fixture
+def index(tmp_path):
+    corpus = tmp_path / "data" / "HOSPICE"
+    corpus.mkdir(parents=True)
+    path = corpus / "2024_HOSPICE_final_2024-16910.xml"
+    path.write_bytes(DOCUMENT)
+    sections_dir = str(tmp_path / "rag_data" / "sections")
+    XMLChunker(input_dir=str(tmp_path / "data"), chunk_words=3, overlap_sentences=0,
+               sections_dir=sections_dir).process_file(path, "HOSPICE")
+    return load_section_index(section_index_path(sections_dir, "2024_HOSPICE_final_2024-16910.xml"))
+
+
+def test_sidecar_path_resolves_to_the_source(index, tmp_path):
+    assert index["path"] == str(tmp_path / "data" / "HOSPICE" / "2024_HOSPICE_final_2024-16910.xml")
+    assert [section["path"] for section in index["sections"]] == [
+        "I. Background", "I. Background > A. Cap", "I. Background > A. Cap > 1. Method",
+        "I. Background > B. Wage Index", "II. Provisions"
+    ]
+
+
+def test_subtree_section_ids(index):
+    assert subtree_section_ids(index, 0) == [0, 1, 2, 3]
+    assert subtree_section_ids(index, 1) == [1, 2]
+    assert subtree_section_ids(index, 2) == [2]
+    assert subtree_section_ids(index, 4) == [4]
+    with pytest.raises(KeyError):
+        subtree_section_ids(index, 5)
+
+
+def test_chunk_spans_read_their_source(index):
+    texts = [read_source_span(index["path"], chunk["start"], chunk["end"]) for chunk in index["chunks"]]
+    assert texts == [b"<P>Hospice payments are updated.</P>", b"<P>The cap is $34,465.34.</P>",
+                     b"<P>The cap is updated annually.</P>", b"<P>The wage index is updated.</P>",
+                     b"<P>Quality reporting changes.</P>"]
+    assert [chunk["section_id"] for chunk in index["chunks"]] == [0, 1, 2, 3, 4]
+    section = index["sections"][1]
+    assert read_source_span(index["path"], section["start"], section["end"]).startswith(b'<HD SOURCE="HD2">A. Cap')
+    assert read_source_span(index["path"], section["start"], section["end"]).endswith(b"updated annually.</P>")
+
+
+def test_source_changed(index):
+    assert not source_changed(index)
+    # Touched but identical: the hash matches and the new mtime is remembered
+    stat = os.stat(index["path"])
+    os.utime(index["path"], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not source_changed(index)
+    assert index["mtime_ns"] == stat.st_mtime_ns + 10 ** 9
+    # Same size, different bytes
+    with open(index["path"], "r+b") as f:
+        f.seek(DOCUMENT.index(b"34,465"))
+        f.write(b"35,465")
+    os.utime(index["path"], ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    assert source_changed(index)
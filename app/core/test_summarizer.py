@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+import pytest
+from app.config import config
+from app.core import summarizer
+from app.core.rate_limit import RateLimiter
+from app.core.summary_cache import ExtractionCache
+from app.core.summarizer import (TOPIC_ANCHORS, ChunkAnalysisError, analyze_pack, map_chunks,
+                                 plan_reduce_groups, preselect_chunks, reduce_summaries, section_title,
+                                 split_report_sections)
+
+REPORT = ("**RegHealth Intelligence Report**\n\n# 1. Executive Summary\nThe cap rises.\n\n"
+          "## 2. Key Changes\n- Cap: $34,465.34\n### 3. Stakeholders\nHospices")
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Count words instead of tiktoken tokens, so no encoding has to be downloaded
+    monkeypatch.setattr(summarizer, "count_tokens", lambda text: len(text.split()))
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    def set_budgets(final, group):
+        monkeypatch.setitem(config.config, "summarizer", {
+            **config.config.get("summarizer", {}),
+            "final_token_budget": final, "reduce_group_token_budget": group, "max_workers": 2
+        })
+    return set_budgets
+
+
+def make_summary(n, section="II. Provisions"):
+    return {"section_header": f"{section} > A. Item {n}", "topic": [f"topic {n}"],
+            "key_changes": [f"change {n} word word word word"], "quantitative_data": [f"{n} percent"],
+            "stakeholders_affected": [f"stakeholder {n}"]}
+
+
+def tokens(summaries):
+    return summarizer.count_tokens(summarizer._serialize(summaries))
+
+
+def test_plan_reduce_groups_respects_budget():
+    summaries = [make_summary(n) for n in range(10)]
+    size = tokens([summaries[0]])
+    groups = plan_reduce_groups(summaries, 3 * size)
+    assert [s for group in groups for s in group] == summaries
+    # The tenth summary would be left alone, so it joins the last group
+    assert [len(group) for group in groups] == [3, 3, 4]
+
+
+def test_plan_reduce_groups_splits_at_sections():
+    summaries = [make_summary(n, "II. Provisions") for n in range(3)] + \
+                [make_summary(n, "III. Collection") for n in range(3, 6)]
+    groups = plan_reduce_groups(summaries, 6 * tokens([summaries[0]]))
+    assert groups == [summaries[:3], summaries[3:]]
+
+
+def test_plan_reduce_groups_never_leaves_a_singleton():
+    summaries = [make_summary(n) for n in range(5)]
+    # Every summary is over budget on its own
+    groups = plan_reduce_groups(summaries, 1)
+    assert [len(group) for group in groups] == [2, 3]
+
+
+def test_reduce_summaries_within_budget_is_unchanged(budgets):
+    summaries = [make_summary(n) for n in range(3)]
+    budgets(final=tokens(summaries), group=100)
+    assert reduce_summaries(summaries) == summaries
+
+
+def test_reduce_summaries_trims_mechanical_merges(budgets, monkeypatch):
+    # Every LLM merge fails, so the levels only concatenate and never shrink
+    monkeypatch.setattr(summarizer, "merge_summaries",
+                        lambda summaries, limiter, max_retries: summarizer._merge_mechanically(summaries))
+    summaries = [make_summary(n) for n in range(20)]
+    final = tokens([summarizer._merge_mechanically(summaries)]) // 2
+    budgets(final=final, group=3 * tokens([summaries[0]]))
+    reduced = reduce_summaries(summaries)
+    assert len(reduced) == 1
+    assert tokens(reduced) <= final
+    # Stakeholders go first, quantitative data is kept whole
+    assert reduced[0]["quantitative_data"] == [f"{n} percent" for n in range(20)]
+    assert len(reduced[0]["stakeholders_affected"]) < 20
+
+
+def test_map_chunks_raises_on_failed_chunks(monkeypatch):
+    def analyze_pack(chunk_texts, limiter, max_retries):
+        if any("broken" in text for text in chunk_texts):
+            raise RuntimeError("rate limited")
+        return [{"topic": [text]} for text in chunk_texts]
+
+    monkeypatch.setattr(summarizer, "analyze_pack", analyze_pack)
+    monkeypatch.setitem(config.config, "summarizer", {**config.config.get("summarizer", {}), "pack_max_chunks": 1})
+    chunks = [{"text": "chunk one"}, {"text": "broken chunk"}, {"text": "chunk three"}]
+    with pytest.raises(ChunkAnalysisError) as info:
+        map_chunks(chunks, "hospice.xml", max_workers=2)
+    assert (info.value.failed, info.value.total) == (1, 3)
+    assert [s["topic"] for s in map_chunks([chunks[0], chunks[2]], "hospice.xml")] == [["chunk one"], ["chunk three"]]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(REPORT)])
+def test_split_report_sections_regroups_deltas(size):
+    deltas = [REPORT[i:i + size] for i in range(0, len(REPORT), size)]
+    sections = list(split_report_sections(deltas))
+    assert "".join(sections) == REPORT
+    # The banner before the first heading stays with the first section
+    assert [section_title(section) for section in sections] == ["1. Executive Summary", "2. Key Changes",
+                                                                 "3. Stakeholders"]
+    assert sections[0].startswith("**RegHealth Intelligence Report**")
+
+
+def test_split_report_sections_without_headings():
+    assert list(split_report_sections(["No headings\n", "at all"])) == ["No headings\nat all"]
+    assert list(split_report_sections([])) == []
+
+
+def fake_client(results):
+    content = json.dumps({"results": results})
+    create = lambda **kwargs: SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+@pytest.mark.parametrize("results, split", [
+    ([{"chunk": 2, "topic": ["b"]}, {"chunk": 1, "topic": ["a"]}], True),
+    ([{"chunk": 1, "topic": ["a"]}, {"chunk": 1, "topic": ["b"]}], False),
+    ([{"chunk": 1, "topic": ["a"]}, {"chunk": 3, "topic": ["b"]}], False),
+    ([{"chunk": "1", "topic": ["a"]}, {"chunk": 2, "topic": ["b"]}], False),
+    ([{"topic": ["a"]}, {"topic": ["b"]}], False),
+    ([{"chunk": 1, "topic": ["a"]}], False),
+])
+def test_analyze_pack_validates_numbering(monkeypatch, results, split):
+    monkeypatch.setattr(summarizer, "get_client", lambda: fake_client(results))
+    # A response that can't be split falls back to one request per chunk
+    monkeypatch.setattr(summarizer, "analyze_chunk", lambda text, limiter, max_retries: {"topic": [text], "alone": True})
+    extracted = analyze_pack(["a", "b"], RateLimiter(), max_retries=0)
+    if split:
+        assert extracted == [{"topic": ["a"]}, {"topic": ["b"]}]
+    else:
+        assert extracted == [{"topic": ["a"], "alone": True}, {"topic": ["b"], "alone": True}]
+
+
+def test_map_chunks_bounds_concurrency_and_keeps_order(monkeypatch):
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def analyze_pack(chunk_texts, limiter, max_retries):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        # Later chunks finish first
+        time.sleep(0.02 / int(chunk_texts[0].split()[1]))
+        with lock:
+            running[0] -= 1
+        return [{"topic": [text]} for text in chunk_texts]
+
+    monkeypatch.setattr(summarizer, "analyze_pack", analyze_pack)
+    monkeypatch.setitem(config.config, "summarizer", {**config.config.get("summarizer", {}), "pack_max_chunks": 1})
+    chunks = [{"text": f"chunk {n}", "section_header": f"S{n}"} for n in range(1, 13)] + [{"text": "  "}]
+    progress = []
+    summaries = map_chunks(chunks, "hospice.xml", max_workers=3, progress=lambda done, total: progress.append(done))
+    assert summaries == [{"section_header": f"S{n}", "topic": [f"chunk {n}"]} for n in range(1, 13)]
+    assert peak[0] <= 3
+    # Blank chunks are not sent
+    assert progress[0] == 0 and progress[-1] == 12 and progress == sorted(progress)
+
+
+def test_map_chunks_serves_unchanged_chunks_from_cache(monkeypatch, tmp_path):
+    sent = []
+
+    def analyze_pack(chunk_texts, limiter, max_retries):
+        sent.extend(chunk_texts)
+        return [{"topic": [text]} for text in chunk_texts]
+
+    monkeypatch.setattr(summarizer, "analyze_pack", analyze_pack)
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite"))
+    chunks = [{"text": "chunk one"}, {"text": "chunk two"}]
+    first = map_chunks(chunks, "hospice.xml", cache=cache)
+    assert sorted(sent) == ["chunk one", "chunk two"]
+
+    # Only the edited chunk misses
+    sent.clear()
+    assert map_chunks(chunks, "hospice.xml", cache=cache) == first
+    assert sent == []
+    map_chunks([chunks[0], {"text": "chunk two, edited"}], "hospice.xml", cache=cache)
+    assert sent == ["chunk two, edited"]
+
+    # Another model (or prompt) is a different key
+    sent.clear()
+    monkeypatch.setitem(config.config, "summarizer", {**config.config.get("summarizer", {}), "model": "other-model"})
+    map_chunks(chunks, "hospice.xml", cache=cache)
+    assert sorted(sent) == ["chunk one", "chunk two"]
+    cache.close()
+
+
+def test_preselect_chunks_takes_top_hits_per_topic(monkeypatch):
+    topics = len(TOPIC_ANCHORS)
+    dimension = topics + 1
+    anchors = np.eye(topics, dimension, dtype="float32")
+    monkeypatch.setattr(summarizer, "embed_topic_anchors", lambda: anchors)
+    # Chunk n of this document sits on topic n % topics, farther for larger n;
+    # another document's chunks sit right on the anchors
+    vectors, ids = [], []
+    for n in range(40):
+        vectors.append(anchors[n % topics] * (1 + n / 100) + np.eye(1, dimension, topics, dtype="float32")[0])
+        ids.append(n)
+    for n in range(topics):
+        vectors.append(anchors[n])
+        ids.append(1000 + n)
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+    index.add_with_ids(np.array(vectors, dtype="float32"), np.array(ids, dtype="int64"))
+
+    chunks = [{"id": n, "text": f"chunk {n}"} for n in range(40)]
+    kept = preselect_chunks(chunks, faiss_index=index, per_topic=2, max_chunks=topics + 1)
+    # Every topic's best hit first, then second hits (first topic first) until the cap
+    assert [chunk["id"] for chunk in kept] == list(range(topics)) + [topics]
+
+    assert preselect_chunks(chunks[:5], faiss_index=index, per_topic=2, max_chunks=10) == chunks[:5]
+    assert preselect_chunks([{"text": "no id"}] * 20, faiss_index=index, per_topic=2, max_chunks=10) == \
+        [{"text": "no id"}] * 20
@@ -0,0 +1,34 @@
+import sqlite3
+import threading
+
+from app.core.summary_jobs import DONE, RUNNING, SummaryJobQueue
+
+
+def insert_job(path, job_id, status, age_seconds):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO jobs (id, source_file, status, updated_at) VALUES (?, ?, ?, datetime('now', ?))",
+                 (job_id, f"{job_id}.xml", status, f"-{age_seconds} seconds"))
+    conn.commit()
+    conn.close()
+
+
+def test_reclaims_only_expired_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    finished = threading.Event()
+
+    def run_report(source_file, progress):
+        finished.set()
+        return f"report for {source_file}"
+
+    queue = SummaryJobQueue(path, run_report, resume_interrupted=False, lease_seconds=60)
+    insert_job(path, "dead", RUNNING, 600)
+    insert_job(path, "alive", RUNNING, 5)
+    assert queue.reclaim_expired() == ["dead"]
+    assert finished.wait(5)
+    queue.shutdown()
+
+    queue = SummaryJobQueue(path, run_report, resume_interrupted=False, lease_seconds=60)
+    assert queue.get("dead")["status"] == DONE
+    assert queue.get("dead")["report"] == "report for dead.xml"
+    assert queue.get("alive")["status"] == RUNNING
+    queue.shutdown()
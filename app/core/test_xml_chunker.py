@@ -0,0 +1,61 @@
+import gzip
+
+import pytest
+from app.core import xml_chunker
+from app.core.xml_chunker import XMLChunker
+
+DOCUMENT = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<RULE>\n'
+    '  <PREAMB><AGENCY TYPE="F">CMS</AGENCY><SUBJECT>Hospice — FY 2025</SUBJECT></PREAMB>\n'
+    '  <SUPLINF>\n'
+    '    <HD SOURCE="HD1">I. Background</HD>\n'
+    '    <P>The cap is $34,465.34 – up 2.9 percent.</P>\n'
+    '    <GPH SPAN="3" DEEP="640"/>\n'
+    '    <HD SOURCE="HD2" NOTE="a > b">A. Payment</HD>\n'
+    '    <P>See <E T="03">§ 418.309</E> for the cap.</P>\n'
+    '    <PRTPAGE P="62243"/>\n'
+    '  </SUPLINF >\n'
+    '</RULE>\n'
+).encode("utf-8")
+
+
+@pytest.fixture(params=["plain", "gzip"])
+def document_path(request, tmp_path):
+    if request.param == "gzip":
+        path = tmp_path / "2024_HOSPICE_final_2024-16910.xml.gz"
+        path.write_bytes(gzip.compress(DOCUMENT))
+    else:
+        path = tmp_path / "2024_HOSPICE_final_2024-16910.xml"
+        path.write_bytes(DOCUMENT)
+    return path
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1 << 16])
+def test_parse_with_offsets_spans(document_path, block_size, monkeypatch):
+    # Small blocks make tags straddle block boundaries
+    monkeypatch.setattr(xml_chunker, "COPY_BLOCK_SIZE", block_size)
+    root, spans = XMLChunker(sections_dir=None).parse_with_offsets(document_path)
+    elements = list(root.iter())
+    assert set(spans) == set(elements)
+    for elem in elements:
+        start, end = spans[elem]
+        source = DOCUMENT[start:end].decode("utf-8")
+        assert source.startswith(f"<{elem.tag}")
+        assert source.endswith("/>") or source.replace(" ", "").endswith(f"</{elem.tag}>")
+    paragraphs = [DOCUMENT[slice(*spans[p])].decode("utf-8") for p in root.iter("P")]
+    assert paragraphs == ["<P>The cap is $34,465.34 – up 2.9 percent.</P>",
+                          '<P>See <E T="03">§ 418.309</E> for the cap.</P>']
+    assert DOCUMENT[slice(*spans[root])] == DOCUMENT[DOCUMENT.index(b"<RULE>"):DOCUMENT.rindex(b">") + 1]
+
+
+def test_chunk_spans_cover_their_paragraphs(document_path):
+    chunker = XMLChunker(chunk_words=5, overlap_sentences=0, sections_dir=None)
+    root, spans = chunker.parse_with_offsets(document_path)
+    chunks, sections = chunker.chunk_with_sections(root, {}, spans)
+    assert [DOCUMENT[slice(*chunk["source_span"])].decode("utf-8") for chunk in chunks] == [
+        "<P>The cap is $34,465.34 – up 2.9 percent.</P>", '<P>See <E T="03">§ 418.309</E> for the cap.</P>'
+    ]
+    # A section runs from its heading to its last paragraph, and its parent at least as far
+    assert DOCUMENT[sections[1]["start"]:sections[1]["end"]].decode("utf-8").startswith('<HD SOURCE="HD2"')
+    assert sections[0]["end"] == sections[1]["end"] == chunks[1]["source_span"][1]
@@ -2,15 +2,25 @@
 xml_chunker.py
 
 Module for chunking XML documents into smaller pieces for processing.
+Compressed files (.xml.gz, .xml.zst) are decompressed as a stream straight
+into the parser, block by block. Next to the chunks, each document gets a sidecar section
+index (see section_index.py) with its section hierarchy and the byte span of
+every chunk in the source XML.
 """
+import argparse
 import os
 import re
 import json
 import hashlib
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional, Tuple
+from xml.parsers import expat
 import logging
+from .compression import COPY_BLOCK_SIZE, canonical_xml_name, is_xml_file, open_xml
+from .data_fetcher.manifest import file_sha256
+from .entity_index import extract_entities
+from .section_index import SECTION_INDEX_VERSION, save_section_index, section_index_path
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +31,10 @@ INPUT_DIR = Path("./data")
 CHUNK_WORDS = 500
 OVERLAP_SENTENCES = 1
 OUTPUT_CHUNKS = "./rag_data/chunks.json"
+SECTIONS_DIR = "./rag_data/sections"
+
+# Section depth of each HD SOURCE level; any other heading starts a new top-level section
+HEADING_DEPTHS = {"HD1": 0, "HD2": 1, "HD3": 2}
 
 class XMLChunker:
     """
@@ -31,10 +45,12 @@ class XMLChunker:
         chunk_words (int): Maximum words per chunk
         overlap_sentences (int): Number of sentences to overlap between chunks
         output_chunks (str): Path to save chunked data
+        sections_dir (str): Directory of the per-document section indexes (None to skip them)
     """
     
     def __init__(self, input_dir: str = "./data", chunk_words: int = 500, 
-                 overlap_sentences: int = 1, output_chunks: str = "./rag_data/chunks.json"):
+                 overlap_sentences: int = 1, output_chunks: str = "./rag_data/chunks.json",
+                 sections_dir: Optional[str] = SECTIONS_DIR):
         """
         Initialize XMLChunker.
         
@@ -43,11 +59,13 @@ class XMLChunker:
             chunk_words: Maximum words per chunk
             overlap_sentences: Number of sentences to overlap between chunks
             output_chunks: Path to save chunked data
+            sections_dir: Directory of the per-document section indexes (None to skip them)
         """
         self.input_dir = Path(input_dir)
         self.chunk_words = chunk_words
         self.overlap_sentences = overlap_sentences
         self.output_chunks = output_chunks
+        self.sections_dir = sections_dir
         logger.info(f"Initialized XMLChunker with input_dir: {self.input_dir.absolute()}")
 
     def clean_text(self, text: str) -> str:
@@ -86,66 +104,176 @@ class XMLChunker:
         meta["effective_date"] = self.clean_text(root.findtext(".//EFFDATE/P"))
         return meta
 
+    def parse_with_offsets(self, file_path: Path) -> Tuple[ET.Element, Dict[ET.Element, Tuple[int, int]]]:
+        """
+        Parse a document, recording the byte span of every element.
+
+        Spans are offsets into the (decompressed) XML bytes, from the start
+        tag's "<" to just past the end tag's ">". The file is fed to the
+        parser in blocks; only the bytes since the last tag are kept around
+        to locate that ">".
+
+        Returns:
+            (root, {element: (start, end)})
+        """
+        builder = ET.TreeBuilder()
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        spans = {}
+        starts = []
+        # Bytes fed so far from offset `window_start` on; tags not yet reported
+        # start at or after the last reported one, so earlier bytes are dropped
+        window = bytearray()
+        window_start = 0
+        last_tag = [0]
+        just_started = [False]
+
+        def start(tag, attrib):
+            last_tag[0] = parser.CurrentByteIndex
+            just_started[0] = True
+            starts.append(last_tag[0])
+            builder.start(tag, attrib)
+
+        def end(tag):
+            elem = builder.end(tag)
+            # Points at the end tag's "</", or just past an empty element's "/>"
+            index = last_tag[0] = parser.CurrentByteIndex
+            if just_started[0] and window[index - window_start - 2:index - window_start] == b"/>":
+                spans[elem] = (starts.pop(), index)
+            else:
+                spans[elem] = (starts.pop(), window.index(b">", index - window_start) + window_start + 1)
+            just_started[0] = False
+
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = builder.data
+        with open_xml(file_path) as f:
+            for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+                window += block
+                parser.Parse(block, False)
+                del window[:last_tag[0] - window_start]
+                window_start = last_tag[0]
+            parser.Parse(b"", True)
+        return builder.close(), spans
+
     def chunk_document(self, root: ET.Element, metadata: Dict) -> List[Dict]:
         """Chunk document into smaller pieces."""
+        return self.chunk_with_sections(root, metadata)[0]
+
+    def chunk_with_sections(self, root: ET.Element, metadata: Dict,
+                            spans: Optional[Dict[ET.Element, Tuple[int, int]]] = None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Chunk document into smaller pieces and collect its section hierarchy.
+
+        Each chunk records the id of the section it was closed in; with
+        `spans` (see parse_with_offsets) it also gets the byte span of its own
+        paragraphs as "source_span", and sections get the span from their
+        heading to their last paragraph.
+
+        Returns:
+            (chunks, sections)
+        """
         chunks = []
+        sections = []
         section_stack = []
+        section_ids = []
         current_text = []
+        current_span = []
         chunk_index = 0
         last_chunk_sentences = []
 
         def current_section():
             return " > ".join(section_stack)
 
+        def add_chunk(chunk_text):
+            if last_chunk_sentences:
+                chunk_text = " ".join(last_chunk_sentences) + " " + chunk_text
+            chunk_hash = hashlib.sha256(chunk_text.encode()).hexdigest()
+            section_id = section_ids[-1] if section_ids else None
+            chunk = {
+                "text": chunk_text,
+                "section_header": current_section(),
+                "chunk_index": chunk_index,
+                "hash": chunk_hash,
+                "section_id": section_id,
+                # CPT/HCPCS codes, CFR references and dollar amounts, for the entity index
+                "entities": extract_entities(chunk_text),
+                "metadata": metadata.copy()
+            }
+            if current_span:
+                chunk["source_span"] = list(current_span)
+            if section_id is not None:
+                sections[section_id]["chunks"].append(chunk_index)
+            chunks.append(chunk)
+            return chunk_text
+
         for elem in root.iter():
             if elem.tag == "HD":
                 text = self.clean_text(elem.text)
                 if not text:
                     continue
                 level = elem.attrib.get("SOURCE", "")
-                if level.startswith("HD1"):
-                    section_stack = [text]
-                elif level.startswith("HD2"):
-                    section_stack = section_stack[:1] + [text]
-                elif level.startswith("HD3"):
-                    section_stack = section_stack[:2] + [text]
-                else:
-                    section_stack = [text]
+                depth = next((d for prefix, d in HEADING_DEPTHS.items() if level.startswith(prefix)), 0)
+                section_stack = section_stack[:depth] + [text]
+                section_ids = section_ids[:depth] + [len(sections)]
+                span = spans.get(elem) if spans else None
+                sections.append({
+                    "id": section_ids[-1],
+                    "title": text,
+                    "level": level or None,
+                    "parent": section_ids[-2] if len(section_ids) > 1 else None,
+                    "path": current_section(),
+                    "start": span[0] if span else None,
+                    "end": span[1] if span else None,
+                    "chunks": []
+                })
             elif elem.tag == "P":
                 para = self.clean_text(elem.text)
                 if para:
+                    span = spans.get(elem) if spans else None
+                    if span:
+                        current_span = [current_span[0] if current_span else span[0], span[1]]
+                        # A section (with its ancestors) extends to its last paragraph
+                        for section_id in section_ids:
+                            sections[section_id]["end"] = span[1]
                     current_text.append(para)
                     word_count = sum(len(p.split()) for p in current_text)
                     if word_count >= self.chunk_words:
-                        chunk_text = " ".join(current_text)
-                        if last_chunk_sentences:
-                            chunk_text = " ".join(last_chunk_sentences) + " " + chunk_text
-                        chunk_hash = hashlib.sha256(chunk_text.encode()).hexdigest()
-                        chunks.append({
-                            "text": chunk_text,
-                            "section_header": current_section(),
-                            "chunk_index": chunk_index,
-                            "hash": chunk_hash,
-                            "metadata": metadata.copy()
-                        })
+                        chunk_text = add_chunk(" ".join(current_text))
                         last_chunk_sentences = chunk_text.split(". ")[:self.overlap_sentences]
                         current_text = []
+                        current_span = []
                         chunk_index += 1
 
         if current_text:
-            chunk_text = " ".join(current_text)
-            if last_chunk_sentences:
-                chunk_text = " ".join(last_chunk_sentences) + " " + chunk_text
-            chunk_hash = hashlib.sha256(chunk_text.encode()).hexdigest()
-            chunks.append({
-                "text": chunk_text,
-                "section_header": current_section(),
-                "chunk_index": chunk_index,
-                "hash": chunk_hash,
-                "metadata": metadata.copy()
-            })
+            add_chunk(" ".join(current_text))
 
-        return chunks
+        return chunks, sections
+
+    def build_section_index(self, file_path: Path, source_file: str, chunks: List[Dict],
+                            sections: List[Dict]) -> Dict:
+        """Sidecar section index of a chunked document (see section_index.py)."""
+        sidecar_dir = os.path.abspath(self.sections_dir)
+        return {
+            "version": SECTION_INDEX_VERSION,
+            "source_file": source_file,
+            # Relative to the sidecar, so the corpus and its indexes can be moved together
+            "path": os.path.relpath(Path(file_path).resolve(), sidecar_dir),
+            # Citations check these before seeking into the file
+            "size": os.path.getsize(file_path),
+            "mtime_ns": os.stat(file_path).st_mtime_ns,
+            "sha256": file_sha256(Path(file_path)),
+            "sections": sections,
+            "chunks": [
+                {
+                    "chunk_index": chunk["chunk_index"],
+                    "section_id": chunk["section_id"],
+                    "start": chunk.get("source_span", [None, None])[0],
+                    "end": chunk.get("source_span", [None, None])[1]
+                }
+                for chunk in chunks
+            ]
+        }
 
     def process_files(self) -> List[Dict]:
         """Process all XML files in input directory."""
@@ -153,7 +281,7 @@ class XMLChunker:
         processed_files = []
 
         logger.info(f"Searching for XML files in {self.input_dir.absolute()}")
-        xml_files = list(self.input_dir.rglob("*.xml"))
+        xml_files = self.find_xml_files()
         logger.info(f"Found {len(xml_files)} XML files")
 
         for file_path in xml_files:
@@ -164,27 +292,76 @@ class XMLChunker:
                 continue
             
             try:
-                logger.info(f"📄 Processing {file_path.name} from {relative_path.parent}...")
-                
-                inferred_meta = self.infer_metadata_from_filename(file_path.name)
-                root = ET.parse(file_path).getroot()
-                doc_meta = self.extract_preamb_metadata(root)
-                full_meta = {**inferred_meta, **doc_meta}
-                
-                full_meta["subfolder"] = str(relative_path.parent)
-                full_meta["full_path"] = str(file_path)
-                
-                chunks = self.chunk_document(root, full_meta)
+                chunks = self.process_file(file_path, str(relative_path.parent))
                 all_chunks.extend(chunks)
                 processed_files.append(file_path)
-                
-                logger.info(f"   ✅ Created {len(chunks)} chunks")
-                
             except Exception as e:
                 logger.error(f"   ❌ Error processing {file_path.name}: {e}")
 
         return all_chunks
 
+    def find_xml_files(self) -> List[Path]:
+        """
+        Find plain and compressed XML files under the input directory.
+
+        A document stored more than once (e.g. both .xml and .xml.zst) is
+        only returned once.
+        """
+        xml_files = {}
+        for file_path in sorted(self.input_dir.rglob("*")):
+            if is_xml_file(file_path):
+                xml_files.setdefault(file_path.parent / canonical_xml_name(file_path), file_path)
+        return list(xml_files.values())
+
+    def process_file(self, file_path: Path, subfolder: str) -> List[Dict]:
+        """Chunk a single XML file; raises on unreadable XML."""
+        logger.info(f"📄 Processing {file_path.name} from {subfolder}...")
+        
+        # Compressed and plain copies of a document share one source_file
+        inferred_meta = self.infer_metadata_from_filename(canonical_xml_name(file_path))
+        root, spans = self.parse_with_offsets(file_path)
+        doc_meta = self.extract_preamb_metadata(root)
+        full_meta = {**inferred_meta, **doc_meta}
+        
+        full_meta["subfolder"] = subfolder
+        full_meta["full_path"] = str(file_path)
+        
+        chunks, sections = self.chunk_with_sections(root, full_meta, spans)
+        if self.sections_dir:
+            save_section_index(
+                section_index_path(self.sections_dir, full_meta["source_file"]),
+                self.build_section_index(file_path, full_meta["source_file"], chunks, sections)
+            )
+        logger.info(f"   ✅ Created {len(chunks)} chunks in {len(sections)} sections")
+        return chunks
+
+    def update_chunks(self, file_paths: Iterable[str]) -> List[Dict]:
+        """
+        Re-chunk only the given files and merge them into the saved chunks.
+
+        Chunks of those documents already in the output file are replaced;
+        all other documents are kept as they are.
+        """
+        existing = []
+        if os.path.exists(self.output_chunks):
+            with open(self.output_chunks) as f:
+                existing = json.load(f)
+
+        input_root = self.input_dir.resolve()
+        updated = {}
+        for file_path in map(Path, file_paths):
+            try:
+                subfolder = str(file_path.resolve().parent.relative_to(input_root))
+            except ValueError:
+                subfolder = file_path.parent.name
+            try:
+                updated[canonical_xml_name(file_path)] = self.process_file(file_path, subfolder)
+            except Exception as e:
+                logger.error(f"   ❌ Error processing {file_path.name}: {e}")
+
+        kept = [chunk for chunk in existing if chunk["metadata"]["source_file"] not in updated]
+        return kept + [chunk for chunks in updated.values() for chunk in chunks]
+
     def save_chunks(self, chunks: List[Dict]) -> None:
         """Save chunks to output file."""
         os.makedirs(os.path.dirname(self.output_chunks), exist_ok=True)
@@ -194,7 +371,17 @@ class XMLChunker:
 
 # -------- MAIN BATCH RUNNER --------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunk regulation XML files")
+    parser.add_argument("--files", nargs="+",
+                        help="Only re-chunk these files, merging them into the existing chunks")
+    args = parser.parse_args()
+
     chunker = XMLChunker()
-    all_chunks = chunker.process_files()
-    chunker.save_chunks(all_chunks)
-    logger.info(f"✅ Processed {len(all_chunks)} chunks from {len(list(INPUT_DIR.rglob('*.xml')))} files.")
\ No newline at end of file
+    if args.files:
+        all_chunks = chunker.update_chunks(args.files)
+        chunker.save_chunks(all_chunks)
+        logger.info(f"✅ Re-chunked {len(args.files)} files; {len(all_chunks)} chunks in total.")
+    else:
+        all_chunks = chunker.process_files()
+        chunker.save_chunks(all_chunks)
+        logger.info(f"✅ Processed {len(all_chunks)} chunks from {len(chunker.find_xml_files())} files.")
\ No newline at end of file
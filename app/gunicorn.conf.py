@@ -0,0 +1,28 @@
+"""
+gunicorn.conf.py
+
+Production server settings (see app/wsgi.py):
+    gunicorn -c app/gunicorn.conf.py app.wsgi:app
+"""
+import gc
+from app.config import config as app_config
+
+bind = f"{app_config.api_host}:{app_config.api_port}"
+workers = app_config.server_workers
+
+# Threaded workers, so long-lived report streams don't hold a whole process
+worker_class = "gthread"
+threads = app_config.server_threads
+
+# Load the index once in the master and fork workers from it
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Re-enable GC and start the worker's own report store and job queue."""
+    gc.enable()
+    from app.wsgi import backend
+
+    # Only the first worker of a server run resumes jobs interrupted by a restart;
+    # jobs of a worker that dies later are taken over once their lease expires
+    backend.start_services(resume_jobs=worker.age == 1)
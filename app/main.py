@@ -2,16 +2,21 @@
 main.py
 
 Flask app entry point for RegHealth Navigator backend.
+
+The app binds immediately and loads the FAISS index in the background;
+/api/health answers liveness checks at once and /api/ready reports when
+the index is loaded. To profile startup imports:
+    python -X importtime -c "import app.main" 2> importtime.log
 """
-import sys
 import os
+import json
 import logging
-from typing import Dict, Any, Optional
-from flask import Flask, request, jsonify
+from typing import Dict, Any, Optional, Iterator
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from werkzeug.exceptions import BadRequest, HTTPException
-import yaml
-from .core.search import ChatSearchService
+from .core.backend import Backend, READY
+from .core.summary_jobs import DONE
 from .config import config
 from dotenv import load_dotenv
 
@@ -22,19 +27,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def create_app() -> Flask:
+# Endpoints answered while the backend is still loading
+HEALTH_ENDPOINTS = ("/api/health", "/api/ready")
+
+def create_app(preload: bool = False) -> Flask:
     """
     Create and configure the Flask application.
     
+    Args:
+        preload: Load the index and metadata before returning, leaving the
+            per-process services to Backend.start_services() (see wsgi.py);
+            by default everything is loaded in the background
+    
     Returns:
         Flask: Configured Flask application instance
     """
     # Load environment variables
     load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
-    print(f"API Key: {api_key[:5]}...{api_key[-5:]}")
     if not api_key:
         raise ValueError("OPENAI_API_KEY environment variable is not set")
+    print(f"API Key: {api_key[:5]}...{api_key[-5:]}")
 
     # Initialize Flask app
     app = Flask(__name__)
@@ -42,18 +55,19 @@ def create_app() -> Flask:
     # Configure CORS
     CORS(app, origins=config.cors_origins)
     
-    # Initialize services
-    chat_service = ChatSearchService(
-        openai_api_key=api_key,
-        faiss_index_path=config.faiss_index_path,
-        metadata_path=config.faiss_metadata_path
-    )
+    # Initialize services without blocking on the index load
+    backend = Backend(api_key)
+    if preload:
+        backend.load_index()
+    else:
+        backend.start()
+    app.extensions["backend"] = backend
     
     # Register error handlers
     register_error_handlers(app)
     
     # Register routes
-    register_routes(app, chat_service)
+    register_routes(app, backend)
     
     return app
 
@@ -77,14 +91,89 @@ def register_error_handlers(app: Flask) -> None:
     def handle_bad_request(error: BadRequest) -> tuple[Dict[str, str], int]:
         return jsonify({"error": str(error)}), 400
 
-def register_routes(app: Flask, chat_service: ChatSearchService) -> None:
+def job_response(job: Dict[str, Any], include_report: bool = True) -> Dict[str, Any]:
+    """
+    Serialize a summary job record for API responses.
+    
+    Args:
+        job: Job record from SummaryJobQueue
+        include_report: Whether to include the report text of finished jobs
+        
+    Returns:
+        Dict[str, Any]: JSON-serializable job description
+    """
+    response = {
+        "job_id": job["id"],
+        "source_file": job["source_file"],
+        "status": job["status"],
+        "progress": {"done": job["progress_done"], "total": job["progress_total"]},
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+    if include_report and job["status"] == DONE:
+        response["report"] = job["report"]
+    return response
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format one server-sent event.
+    
+    Args:
+        event: Event name
+        data: JSON-serializable event payload
+        
+    Returns:
+        str: Event in text/event-stream wire format
+    """
+    if event == "keepalive":
+        return ": keepalive\n\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def register_routes(app: Flask, backend: Backend) -> None:
     """
     Register routes for the Flask application.
     
     Args:
         app: Flask application instance
-        chat_service: ChatSearchService instance
+        backend: Backend holding the search service, report store and job queue
     """
+    @app.before_request
+    def require_ready() -> Optional[tuple[Dict[str, Any], int]]:
+        """Answer 503 on API calls until the backend has finished loading."""
+        if backend.ready and backend.status == READY:
+            return None
+        if request.method == "OPTIONS" or request.path in HEALTH_ENDPOINTS:
+            return None
+        return jsonify({"error": "Service is not ready", **backend.status_info()}), 503
+
+    @app.route("/api/health", methods=["GET"])
+    def health() -> tuple[Dict[str, str], int]:
+        """
+        Liveness check; answers as soon as the process is serving.
+        
+        Returns:
+            {
+                "status": "ok"
+            }
+        """
+        return jsonify({"status": "ok"})
+
+    @app.route("/api/ready", methods=["GET"])
+    def ready() -> tuple[Dict[str, Any], int]:
+        """
+        Readiness check; 200 once the index is loaded, 503 before that or if loading failed.
+        
+        Returns:
+            {
+                "status": "starting" | "ready" | "failed",
+                "phase": str,  # Startup phase in progress
+                "timings": dict,  # Seconds spent in each finished phase
+                "error": str  # Only when loading failed
+            }
+        """
+        return jsonify(backend.status_info()), 200 if backend.status == READY else 503
+
     def validate_json_request(required_fields: Optional[list[str]] = None) -> Dict[str, Any]:
         """
         Validate JSON request and required fields.
@@ -119,7 +208,11 @@ def register_routes(app: Flask, chat_service: ChatSearchService) -> None:
         
         Request body:
             {
-                "query": str  # The user's question
+                "query": str,  # The user's question
+                "section": {   # Optional, search only this section and its subsections
+                    "source_file": str,
+                    "section_id": int
+                }
             }
             
         Returns:
@@ -130,12 +223,210 @@ def register_routes(app: Flask, chat_service: ChatSearchService) -> None:
         try:
             data = validate_json_request(required_fields=["query"])
             query = data.get("query")
-            response = chat_service.ask_query(query)
+            section = data.get("section")
+            if section:
+                try:
+                    backend.chat_service.section_chunk_ids(section["source_file"], int(section["section_id"]))
+                except (KeyError, TypeError, ValueError, FileNotFoundError) as e:
+                    raise BadRequest(f"Invalid section: {e}")
+            response = backend.chat_service.ask_query(query, section=section)
             return jsonify({"response": response})
         except Exception as e:
             logger.error(f"Error in chat endpoint: {str(e)}")
             return jsonify({"error": str(e)}), 400
 
+    @app.route("/api/sections", methods=["GET"])
+    def sections() -> tuple[Dict[str, Any], int]:
+        """
+        Section hierarchy of a document, for scoping chat to a section.
+        
+        Query parameters:
+            source_file: Document to describe
+            
+        Returns:
+            {
+                "source_file": str,
+                "sections": [
+                    {
+                        "id": int,
+                        "title": str,
+                        "level": str,  # HD SOURCE attribute, e.g. "HD1"
+                        "parent": int | null,
+                        "path": str,  # Titles from the top-level section down
+                        "chunks": int  # Chunks of the section itself
+                    }
+                ]
+            }
+        """
+        source_file = request.args.get("source_file")
+        try:
+            index = backend.chat_service.get_section_index(source_file)
+        except (FileNotFoundError, TypeError):
+            return jsonify({"error": f"No section index for document: {source_file}"}), 404
+        return jsonify({
+            "source_file": source_file,
+            "sections": [
+                {
+                    "id": section["id"],
+                    "title": section["title"],
+                    "level": section["level"],
+                    "parent": section["parent"],
+                    "path": section["path"],
+                    "chunks": len(section["chunks"])
+                }
+                for section in index["sections"]
+            ]
+        })
+
+    @app.route("/api/citation/<int:chunk_id>", methods=["GET"])
+    def citation(chunk_id: int) -> tuple[Dict[str, Any], int]:
+        """
+        Exact source XML of a cited chunk (chunk_id from a chat source).
+        
+        Query parameters:
+            context: Optional, extra bytes of source before and after the chunk (max 65536)
+            
+        Returns:
+            {
+                "chunk_id": str,
+                "source_file": str,
+                "section_id": int | null,
+                "section_path": str,
+                "start": int,  # Byte span in the source XML
+                "end": int,
+                "xml": str
+            }
+        """
+        context = min(max(request.args.get("context", 0, type=int), 0), 65536)
+        try:
+            return jsonify(backend.chat_service.chunk_source(chunk_id, context=context))
+        except (KeyError, FileNotFoundError) as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+
+    @app.route("/api/summarize/list", methods=["GET"])
+    def summarize_list() -> tuple[Dict[str, Any], int]:
+        """
+        List documents that can be summarized, with their latest report job.
+        
+        Returns:
+            {
+                "documents": [
+                    {
+                        "source_file": str,
+                        "program": str,
+                        "rule_type": str,
+                        "year": int,
+                        "title": str,
+                        "chunks": int,
+                        "report_ready": bool,  # A current report is stored
+                        "job": dict | null  # Latest job, without report text
+                    }
+                ]
+            }
+        """
+        documents = []
+        for source_file, chunks in sorted(backend.chunks_by_source_file.items()):
+            metadata = chunks[0].get("metadata", {})
+            job = backend.job_queue.latest_for(source_file)
+            documents.append({
+                "source_file": source_file,
+                "program": metadata.get("program"),
+                "rule_type": metadata.get("rule_type"),
+                "year": metadata.get("year"),
+                "title": metadata.get("title"),
+                "chunks": len(chunks),
+                "report_ready": backend.stored_report(source_file) is not None,
+                "job": job_response(job, include_report=False) if job else None
+            })
+        return jsonify({"documents": documents})
+
+    @app.route("/api/summarize", methods=["POST"])
+    def summarize() -> tuple[Dict[str, Any], int]:
+        """
+        Start (or reuse) a background report job for a document.
+        
+        Request body:
+            {
+                "source_file": str,  # Document to summarize
+                "force": bool        # Optional, regenerate even if a report exists
+            }
+            
+        Returns:
+            Precomputed report (200) if one is current, otherwise a job
+            description; 202 while queued or running, 200 once done
+        """
+        try:
+            data = validate_json_request(required_fields=["source_file"])
+            source_file = data.get("source_file")
+            if source_file not in backend.chunks_by_source_file:
+                raise BadRequest(f"Unknown document: {source_file}")
+            force = bool(data.get("force", False))
+
+            # Precomputed reports are served straight from the report store
+            stored = None if force else backend.stored_report(source_file)
+            if stored:
+                return jsonify({
+                    "job_id": None,
+                    "source_file": source_file,
+                    "status": DONE,
+                    "precomputed": True,
+                    "report": stored["report"],
+                    "created_at": stored["created_at"]
+                })
+
+            # Every finished job lands in the report store, so a miss means any
+            # earlier finished job is stale: start a new one unless one is in flight
+            job = backend.job_queue.submit(source_file, force=True)
+            return jsonify(job_response(job)), 200 if job["status"] == DONE else 202
+        except Exception as e:
+            logger.error(f"Error in summarize endpoint: {str(e)}")
+            return jsonify({"error": str(e)}), 400
+
+    @app.route("/api/summarize/stream", methods=["GET"])
+    def summarize_stream() -> Response:
+        """
+        Stream a document's report as server-sent events, section by section.
+        
+        Query parameters:
+            source_file: Document to summarize
+            force: Optional, "true" to regenerate even if a report exists
+            
+        Events:
+            progress: {"done": int, "total": int}  # Chunks analyzed so far
+            section: {"title": str, "markdown": str}  # One report section
+            done: {"precomputed": bool}  # Report complete
+            error: {"error": str}  # Generation failed
+        """
+        source_file = request.args.get("source_file")
+        if source_file not in backend.chunks_by_source_file:
+            return jsonify({"error": f"Unknown document: {source_file}"}), 400
+        force = request.args.get("force", "false").lower() in ("1", "true", "yes")
+
+        def generate() -> Iterator[str]:
+            for event, data in backend.report_events(source_file, force):
+                yield sse_event(event, data)
+
+        return Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    @app.route("/api/summarize/<job_id>", methods=["GET"])
+    def summarize_status(job_id: str) -> tuple[Dict[str, Any], int]:
+        """
+        Get the status, per-chunk progress and (when done) the report of a job.
+        
+        Returns:
+            Job description, or 404 if the job id is unknown
+        """
+        job = backend.job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Unknown job: {job_id}"}), 404
+        return jsonify(job_response(job))
+
     @app.route("/api/simple-chat", methods=["POST"])
     def simple_chat() -> tuple[Dict[str, str], int]:
         """
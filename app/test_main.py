@@ -0,0 +1,43 @@
+import subprocess
+import sys
+import threading
+
+from app.core.backend import Backend
+from app.main import create_app
+
+HEAVY_MODULES = ("faiss", "numpy", "openai", "tiktoken", "app.core.search")
+
+
+def test_import_is_lazy():
+    # In a fresh interpreter: the test session has long imported these
+    check = f"import sys, app.main, app.core.summarizer; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    output = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_health_answers_while_loading(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def load_index(self):
+        with self._phase("load_index"):
+            started.set()
+            release.wait(5)
+            raise RuntimeError("index file missing")
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test-0000000000")
+    monkeypatch.setattr(Backend, "load_index", load_index)
+    app = create_app()
+    backend = app.extensions["backend"]
+    client = app.test_client()
+    assert started.wait(5)
+    assert client.get("/api/health").status_code == 200
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "starting" and response.get_json()["phase"] == "load_index"
+    assert client.get("/api/summarize/list").status_code == 503
+
+    release.set()
+    backend.wait(5)
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "failed" and "index file missing" in response.get_json()["error"]
@@ -0,0 +1,26 @@
+"""
+wsgi.py
+
+Production WSGI entry point for RegHealth Navigator backend, run from the
+repository root with the settings in app/gunicorn.conf.py:
+    gunicorn -c app/gunicorn.conf.py app.wsgi:app
+
+The gunicorn master imports this module once (preload_app) and loads the
+FAISS index and chunk metadata before forking, so the workers share those
+pages copy-on-write instead of each holding its own copy.
+"""
+import gc
+from .main import create_app
+
+# Collecting while loading would scatter freed holes through the shared heap;
+# the collector stays off until the loaded objects are frozen
+gc.disable()
+
+app = create_app(preload=True)
+backend = app.extensions["backend"]
+
+# Move everything loaded so far to the permanent generation, so collections
+# in the workers never write to (and thereby copy) the shared pages. This only
+# covers the collector: reading a metadata row still updates its reference
+# counts, so the pages of rows a worker touches are copied into that worker
+gc.freeze()
@@ -1,6 +1,10 @@
+import gzip
+import json
 import pytest
 from lxml import etree
-from xml_auto_headings_analysis import get_text, is_heading, count_tokens, build_section_tree
+from xml_auto_headings_analysis import (get_text, is_heading, count_tokens, build_section_tree, open_xml,
+                                        analyze_file, analyze_corpus)
+
 
 def test_get_text():
     elem = etree.Element('p')
@@ -11,6 +15,7 @@ def test_get_text():
     elem2 = etree.Element('p')
     assert get_text(elem2) == ''
 
+
 def test_is_heading():
     assert is_heading('CHAPTER I')
     assert is_heading('1. Introduction')
@@ -19,6 +24,7 @@ def test_is_heading():
     assert is_heading('Short Title')
     assert not is_heading('')
 
+
 def test_count_tokens():
     text = 'This is a test.'
     n = count_tokens(text)
@@ -26,6 +32,7 @@ def test_count_tokens():
     assert isinstance(n, int)
     assert count_tokens('') == 0
 
+
 def test_build_section_tree():
     xml = '''<root><HD>Title</HD><FP>Preface</FP><AMDPAR>Amendment</AMDPAR><FP>Another</FP></root>'''
     root = etree.fromstring(xml)
@@ -35,4 +42,46 @@ def test_build_section_tree():
     tags = [n['tag'] for n in tree]
     assert set(tags) == {'HD', 'FP', 'AMDPAR', 'FP'}
     for node in tree:
-        assert 'tag' in node and 'text' in node and 'children' in node 
\ No newline at end of file
+        assert 'tag' in node and 'text' in node and 'children' in node
+
+
+def test_open_xml_compressed(tmp_path):
+    xml = b'<root><HD>Title</HD></root>'
+    plain = tmp_path / 'doc.xml'
+    plain.write_bytes(xml)
+    gz = tmp_path / 'doc.xml.gz'
+    gz.write_bytes(gzip.compress(xml))
+    for path in (plain, gz):
+        with open_xml(str(path)) as f:
+            assert etree.parse(f).getroot()[0].text == 'Title'
+
+
+SECTIONED_XML = b"""<RULE><HD SOURCE="HED">Summary</HD><P>Intro text here.</P>
+<HD SOURCE="HD1">I. Background</HD><P>One two three four.</P><P>Five six.</P>
+<HD SOURCE="HD2">A. Payment</HD><P>Seven eight nine.</P></RULE>"""
+
+
+def test_analyze_file_sections(tmp_path):
+    xml_path = tmp_path / 'rule.xml'
+    xml_path.write_bytes(SECTIONED_XML)
+    stats = analyze_file(xml_path, encoding_name=None)
+    assert stats['tag_counts'] == {'HD': 3, 'P': 4, 'RULE': 1}
+    assert stats['words'] == 17
+    assert [(s['heading'], s['source'], s['tokens']) for s in stats['sections']] == [
+        ('Summary', 'HED', 3), ('I. Background', 'HD1', 6), ('A. Payment', 'HD2', 3)]
+
+
+def test_analyze_corpus(tmp_path):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'a' / 'rule.xml').write_bytes(SECTIONED_XML)
+    with gzip.open(tmp_path / 'other.xml.gz', 'wb') as f:
+        f.write(SECTIONED_XML)
+    (tmp_path / 'broken.xml').write_bytes(b'<RULE><P>')
+    (tmp_path / 'notes.txt').write_text('ignored')
+    stats = analyze_corpus(tmp_path, workers=2, encoding_name=None)
+    assert stats['files'] == 2
+    assert [e['file'] for e in stats['errors']] == [str(tmp_path / 'broken.xml')]
+    assert stats['total_tokens'] == 34
+    assert stats['tag_counts']['P'] == 8
+    assert stats['section_tokens']['count'] == 6
+    json.dumps(stats)
@@ -3,8 +3,12 @@ xml_auto_headings_analysis.py
 
 Script to analyze XML tags, print tag frequencies, sample contents, auto-infer likely title, heading, and paragraph tags, count total words/tokens, and build a section tree for structural tags (e.g., HD, FP, AMDPAR).
 
+Given a directory instead of a file, it analyzes every XML file under it in a process pool (one cached tokenizer per worker, streaming parse) and writes corpus-wide JSON stats: tag frequencies, tokens per tag and per section, heading tags and an embedding cost estimate.
+
 Usage:
     python scripts/xml_auto_headings_analysis.py data/2025-06008.xml
+    python scripts/xml_auto_headings_analysis.py data/2025-06008.xml.zst  # also .xml.gz
+    python scripts/xml_auto_headings_analysis.py data/ --output rag_data/corpus_stats.json --workers 8
 
 Data format for section tree:
     {
@@ -13,7 +17,14 @@ Data format for section tree:
         'children': [ ... ] # list of child nodes (same structure)
     }
 """
+import argparse
+import gzip
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from lxml import etree
 from collections import Counter, defaultdict
 import re
@@ -24,8 +35,24 @@ except ImportError:
     tiktoken = None
     print("Warning: tiktoken not installed, token count will be word count.")
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 SECTION_TAGS = {'HD', 'FP', 'AMDPAR'}  # 可根据实际需要扩展
 
+# Tag that starts a new section in corpus stats (its SOURCE attribute is HD1/HD2/HD3)
+SECTION_HEADING_TAG = 'HD'
+
+XML_SUFFIXES = ('.xml', '.xml.gz', '.xml.zst')
+
+# Same rate as the embedding cost summary of app/core/build_faiss.py (USD per 1K tokens)
+EMBEDDING_COST_PER_1K_TOKENS = 0.0001
+
+# Tokenizers created so far in this process, by encoding name
+_encodings = {}
+
 # Tag priority levels for section tree construction
 TAG_LEVELS = {
     'RULE': 0,
@@ -39,6 +66,18 @@ TAG_LEVELS = {
 # Helper to get tag level, default to 99 for unknown tags
 get_tag_level = lambda tag: TAG_LEVELS.get(tag, 99)
 
+def open_xml(xml_path):
+    """
+    Open a plain, .gz or .zst XML file for streaming binary reads.
+    """
+    if xml_path.endswith('.gz'):
+        return gzip.open(xml_path, 'rb')
+    if xml_path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError('zstandard not installed, cannot read .zst files.')
+        return zstandard.ZstdDecompressor().stream_reader(open(xml_path, 'rb'), closefd=True)
+    return open(xml_path, 'rb')
+
 def get_text(elem, max_words=8):
     """
     Get a short preview of element text.
@@ -64,17 +103,25 @@ def is_heading(text):
         return True
     return False
 
+def get_encoding(encoding_name):
+    """
+    Get a tiktoken encoder, created once per process and reused afterwards.
+    """
+    if encoding_name not in _encodings:
+        _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+    return _encodings[encoding_name]
+
 def count_tokens(text, encoding_name='cl100k_base'):
     """
     Count tokens using tiktoken if available, else fallback to word count.
+    With encoding_name=None, always count words.
     >>> count_tokens('This is a test.') > 0
     True
     """
     if not text:
         return 0
-    if tiktoken:
-        enc = tiktoken.get_encoding(encoding_name)
-        return len(enc.encode(text))
+    if tiktoken and encoding_name:
+        return len(get_encoding(encoding_name).encode_ordinary(text))
     else:
         return len(text.strip().split())
 
@@ -117,6 +164,198 @@ def print_section_tree(nodes, level=0, max_words=5, max_per_tag=3):
             print('  ' * level + f"- {node['tag']}: {text}")
             print_section_tree(node['children'], level+1, max_words, max_per_tag)
 
+def infer_title(tag_counter, tag_samples):
+    """
+    Likely title: first tag that appears only once and has no more than 15 words.
+    Returns (tag, text) or None.
+    """
+    for tag, count in tag_counter.items():
+        samples = tag_samples.get(tag)
+        if count == 1 and samples:
+            if len(samples[0].split()) <= 15:
+                return (tag, samples[0])
+    return None
+
+def infer_heading_tags(tag_counter, tag_samples):
+    """
+    Likely heading tags: appear 5-200 times with a sample that looks like a heading.
+    """
+    heading_tags = set()
+    for tag, samples in tag_samples.items():
+        if 5 <= tag_counter[tag] <= 200 and any(is_heading(s) for s in samples):
+            heading_tags.add(tag)
+    return sorted(heading_tags)
+
+def infer_paragraph_tags(tag_counter, tag_max_words):
+    """
+    Likely paragraph tags: appear more than 100 times, at least once with more than 10 words.
+    """
+    return [tag for tag, max_words in tag_max_words.items() if tag_counter[tag] > 100 and max_words > 10]
+
+def analyze_file(xml_path, encoding_name='cl100k_base', max_samples=3):
+    """
+    Collect the stats of one XML file in a single streaming pass.
+
+    Elements are freed as soon as they are closed, so memory stays flat
+    however large the document is. Tokens are counted per section, where a
+    section starts at each HD heading (text before the first one forms an
+    untitled section).
+
+    Returns:
+        dict with file, title, words, tokens, tag_counts, tag_words,
+        tag_tokens, tag_max_words, tag_samples, heading_tags,
+        paragraph_tags and sections ([{heading, source, words, tokens}])
+    """
+    tag_counter = Counter()
+    tag_words = Counter()
+    tag_tokens = Counter()
+    tag_max_words = {}
+    tag_samples = defaultdict(list)
+    sections = []
+    section = {'heading': None, 'source': None, 'words': 0, 'tokens': 0}
+
+    with open_xml(str(xml_path)) as f:
+        for _, elem in etree.iterparse(f, events=('end',), remove_comments=True, remove_pis=True):
+            tag = elem.tag
+            tag_counter[tag] += 1
+            if elem.text and elem.text.strip():
+                sample = get_text(elem, 12)
+                if len(tag_samples[tag]) < max_samples:
+                    tag_samples[tag].append(sample)
+                words = len(elem.text.strip().split())
+                tokens = count_tokens(elem.text, encoding_name)
+                tag_words[tag] += words
+                tag_tokens[tag] += tokens
+                tag_max_words[tag] = max(tag_max_words.get(tag, 0), words)
+                if tag == SECTION_HEADING_TAG:
+                    if section['heading'] is not None or section['words']:
+                        sections.append(section)
+                    section = {'heading': get_text(elem, 20), 'source': elem.get('SOURCE'), 'words': 0, 'tokens': 0}
+                else:
+                    section['words'] += words
+                    section['tokens'] += tokens
+            # Children were counted when they closed; drop them and any earlier siblings
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+    if section['heading'] is not None or section['words']:
+        sections.append(section)
+
+    title = infer_title(tag_counter, tag_samples)
+    return {
+        'file': str(xml_path),
+        'title': title[1] if title else None,
+        'words': sum(tag_words.values()),
+        'tokens': sum(tag_tokens.values()),
+        'tag_counts': dict(tag_counter),
+        'tag_words': dict(tag_words),
+        'tag_tokens': dict(tag_tokens),
+        'tag_max_words': tag_max_words,
+        'tag_samples': dict(tag_samples),
+        'heading_tags': infer_heading_tags(tag_counter, tag_samples),
+        'paragraph_tags': infer_paragraph_tags(tag_counter, tag_max_words),
+        'sections': sections
+    }
+
+def distribution(values):
+    """
+    Count, mean, median, 90th percentile and max of a list of numbers.
+    """
+    if not values:
+        return {'count': 0, 'mean': 0, 'p50': 0, 'p90': 0, 'max': 0}
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 1),
+        'p50': ordered[len(ordered) // 2],
+        'p90': ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        'max': ordered[-1]
+    }
+
+def summarize_corpus(results, encoding_name=None):
+    """
+    Merge per-file results of analyze_file into corpus-wide stats.
+    """
+    tag_counts = Counter()
+    tag_tokens = Counter()
+    heading_tags = Counter()
+    paragraph_tags = Counter()
+    section_tokens = []
+    section_tokens_by_source = defaultdict(list)
+    documents = []
+    for result in results:
+        tag_counts.update(result['tag_counts'])
+        tag_tokens.update(result['tag_tokens'])
+        heading_tags.update(result['heading_tags'])
+        paragraph_tags.update(result['paragraph_tags'])
+        for section in result['sections']:
+            section_tokens.append(section['tokens'])
+            section_tokens_by_source[section['source'] or 'none'].append(section['tokens'])
+        documents.append({
+            'file': result['file'],
+            'title': result['title'],
+            'words': result['words'],
+            'tokens': result['tokens'],
+            'sections': result['sections']
+        })
+    total_tokens = sum(doc['tokens'] for doc in documents)
+    return {
+        'files': len(documents),
+        'encoding': encoding_name,
+        'total_words': sum(doc['words'] for doc in documents),
+        'total_tokens': total_tokens,
+        'estimated_embedding_cost': round(total_tokens / 1000 * EMBEDDING_COST_PER_1K_TOKENS, 4),
+        'tag_counts': dict(tag_counts.most_common()),
+        'tag_tokens': dict(tag_tokens.most_common()),
+        # Tag -> number of files in which it was inferred as a heading / paragraph tag
+        'heading_tags': dict(heading_tags.most_common()),
+        'paragraph_tags': dict(paragraph_tags.most_common()),
+        'section_tokens': distribution(section_tokens),
+        'section_tokens_by_source': {source: distribution(tokens)
+                                     for source, tokens in sorted(section_tokens_by_source.items())},
+        'documents': documents
+    }
+
+def find_xml_files(directory):
+    """
+    Plain and compressed XML files under a directory, largest first so the
+    longest documents start early in the pool.
+    """
+    files = [path for path in Path(directory).rglob('*') if path.name.lower().endswith(XML_SUFFIXES)]
+    return sorted(files, key=lambda path: path.stat().st_size, reverse=True)
+
+def _init_worker(encoding_name):
+    # Load the tokenizer once per worker process instead of once per element
+    if tiktoken and encoding_name:
+        get_encoding(encoding_name)
+
+def _analyze_file_safe(args):
+    xml_path, encoding_name = args
+    try:
+        return analyze_file(xml_path, encoding_name)
+    except Exception as e:
+        return {'file': str(xml_path), 'error': str(e)}
+
+def analyze_corpus(directory, workers=None, encoding_name='cl100k_base'):
+    """
+    Analyze every XML file under `directory` in a process pool.
+
+    Returns:
+        Corpus stats (see summarize_corpus), plus the files that failed to
+        parse and the elapsed time
+    """
+    started = time.perf_counter()
+    if not tiktoken or not encoding_name:
+        encoding_name = None
+    files = find_xml_files(directory)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(encoding_name,)) as pool:
+        results = list(pool.map(_analyze_file_safe, [(path, encoding_name) for path in files]))
+    errors = [result for result in results if 'error' in result]
+    stats = summarize_corpus([result for result in results if 'error' not in result], encoding_name)
+    stats['errors'] = errors
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    return stats
+
 def main(xml_path):
     """
     Main analysis function.
@@ -124,7 +363,8 @@ def main(xml_path):
         xml_path (str): Path to XML file.
     """
     try:
-        tree = etree.parse(xml_path)
+        with open_xml(xml_path) as f:
+            tree = etree.parse(f)
     except Exception as e:
         print(f"Error parsing XML: {e}")
         sys.exit(1)
@@ -163,13 +403,7 @@ def main(xml_path):
     print()
 
     # Heuristic: likely title tag is the first tag with only one occurrence and short text
-    likely_title = None
-    for tag, count in tag_counter.items():
-        if count == 1 and tag_samples[tag]:
-            text = tag_samples[tag][0]
-            if len(text.split()) <= 15:
-                likely_title = (tag, text)
-                break
+    likely_title = infer_title(tag_counter, tag_samples)
     print('=== Likely Article Title ===')
     if likely_title:
         print(f'Tag: {likely_title[0]} | Content: {likely_title[1]}')
@@ -178,14 +412,7 @@ def main(xml_path):
     print()
 
     # Heuristic: likely heading tags are those with moderate frequency, short text, and heading-like features
-    heading_candidates = []
-    for tag, samples in tag_samples.items():
-        if 5 <= tag_counter[tag] <= 200:
-            for s in samples:
-                if is_heading(s):
-                    heading_candidates.append((tag, s))
-                    break
-    heading_tags = sorted(set([t for t, _ in heading_candidates]))
+    heading_tags = infer_heading_tags(tag_counter, tag_samples)
     print('=== Likely Heading Tags ===')
     for tag in heading_tags:
         print(f'- {tag} (count: {tag_counter[tag]})')
@@ -195,10 +422,7 @@ def main(xml_path):
     print()
 
     # Heuristic: likely paragraph tags are those with high frequency and long text
-    para_candidates = []
-    for tag, lens in tag_lengths.items():
-        if tag_counter[tag] > 100 and sum(l > 10 for l in lens) > 0:
-            para_candidates.append(tag)
+    para_candidates = infer_paragraph_tags(tag_counter, {tag: max(lens) for tag, lens in tag_lengths.items()})
     print('=== Likely Paragraph Tags ===')
     for tag in para_candidates:
         print(f'- {tag} (count: {tag_counter[tag]})')
@@ -227,8 +451,29 @@ def main(xml_path):
     else:
         print('No section structure found.')
 
+def corpus_main(directory, output=None, workers=None, encoding_name='cl100k_base'):
+    """
+    Corpus mode: analyze a directory and write the JSON stats to `output` (or stdout).
+    """
+    stats = analyze_corpus(directory, workers=workers, encoding_name=encoding_name)
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(stats, f, indent=2)
+        print(f"Analyzed {stats['files']} files ({stats['total_tokens']} tokens, "
+              f"{len(stats['errors'])} errors) in {stats['seconds']}s -> {output}")
+    else:
+        json.dump(stats, sys.stdout, indent=2)
+        print()
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print('Usage: python scripts/xml_auto_headings_analysis.py <xml_file>')
-        sys.exit(1)
-    main(sys.argv[1]) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Analyze the tag structure of one XML file or a whole corpus directory')
+    parser.add_argument('path', help='XML file (.xml, .xml.gz, .xml.zst), or a directory for corpus mode')
+    parser.add_argument('--output', '-o', help='Corpus mode: JSON stats file (default: stdout)')
+    parser.add_argument('--workers', type=int, default=None, help='Corpus mode: worker processes (default: CPU count)')
+    parser.add_argument('--encoding', default='cl100k_base', help='tiktoken encoding used to count tokens')
+    args = parser.parse_args()
+    if os.path.isdir(args.path):
+        corpus_main(args.path, output=args.output, workers=args.workers, encoding_name=args.encoding)
+    else:
+        main(args.path) 
\ No newline at end of file